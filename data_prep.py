@@ -5,6 +5,7 @@ import json
 import re
 import pandas as pd
 from pathlib import Path
+from src.code_parser import parse_code_file, BODY
 
 # Configuration des directions
 BASE_DIR = Path(__file__).resolve().parent
@@ -33,22 +34,23 @@ def stream_jorf_file(filepath):
                             "text": clean_text(text_content),
                             "meta": {"source": filepath.name, "type": "JORF"}
                         }
+    except Exception as e:
+        print(f"Erreur sur {filepath.name} : {e}")
 
 
 def stream_code_file(filepath):
-    """Générateur pour les fichiers Codes."""
-    current_article = "Inconnu"
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('**Art.'):
-                    current_article = line.replace('**', '').strip()
-                elif len(line) > 30 and not line.startswith('#'):
-                    yield {
-                        "text": clean_text(line),
-                        "meta": {"source": filepath.name, "type": "CODE", "context": current_article}
-                    }
+    """Générateur pour les fichiers Codes (lecture partagée avec le site : src/code_parser.py).
+    Seul le corps des articles est gardé : ni l'en-tête YAML, ni les titres, ni les en-têtes d'article."""
+    for rec in parse_code_file(filepath):
+        if rec['kind'] != BODY:
+            continue
+        text = rec['text'].strip()
+        if len(text) > 30:
+            yield {
+                "text": clean_text(text),
+                "meta": {"source": filepath.name, "type": "CODE",
+                         "context": f"Art. {rec['article']}" if rec['article'] else "Inconnu"}
+            }
 
 
 def main():
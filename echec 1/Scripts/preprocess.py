@@ -1,64 +1,125 @@
 import re
 import os
-import json
-import pandas as pd
+import csv
+import sys
+import hashlib
+from pathlib import Path
+
+import spacy
+from spacy.tokens import DocBin
+
+# 1. Regex Articles : Capte L.123, R123, L*123 ou 123 (quand précédé de Art.)
+# On autorise les astérisques facultatifs autour pour le Markdown
+RE_ART = re.compile(r"Art\.\s+([\*]*[L|R|D]?[\*]?[\s]*\d+[\-\d+]*)[\*]*")
+
+# 2. Regex Lois (pour le JORF) : Capte "loi n° 92-1376" ou "loi du 30 décembre 1992"
+RE_LOI = re.compile(r"(loi\s+n°\s+[\d\-]+|loi\s+du\s+\d+\s+\w+\s+\d{4})", re.IGNORECASE)
+
+MAX_CHARS = 1000
+
+
+def iter_paragraphs(file_path):
+    # Paragraphes d'un markdown (séparés par une ligne vide), lus ligne par ligne
+    para = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                para.append(line.rstrip('\n'))
+            elif para:
+                yield " ".join(para).strip()
+                para = []
+    if para:
+        yield " ".join(para).strip()
+
+
+def iter_csv_texts(file_path):
+    # Dernière colonne de chaque ligne du csv JORF (délimiteur '|'), sans charger le fichier
+    csv.field_size_limit(sys.maxsize)
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for row in csv.reader(f, delimiter='|'):
+            if row and row[-1]:
+                yield row[-1]
+
+
+def example(text, regex, label, group=0):
+    # (texte tronqué, entités) ou None si aucune entité ne tient dans le texte tronqué
+    text = text[:MAX_CHARS]
+    entities = [[m.start(group), m.end(group), label] for m in regex.finditer(text)]
+    return (text, {"entities": entities}) if entities else None
+
 
 def generate_robust_dataset(data_folder):
-    dataset = []
-    
-    # 1. Regex Articles : Capte L.123, R123, L*123 ou 123 (quand précédé de Art.)
-    # On autorise les astérisques facultatifs autour pour le Markdown
-    re_art = r"Art\.\s+([\*]*[L|R|D]?[\*]?[\s]*\d+[\-\d+]*)[\*]*"
-    
-    # 2. Regex Lois (pour le JORF) : Capte "loi n° 92-1376" ou "loi du 30 décembre 1992"
-    re_loi = r"(loi\s+n°\s+[\d\-]+|loi\s+du\s+\d+\s+\w+\s+\d{4})"
-
-    
+    """Générateur des exemples annotés : un paragraphe de code ou une ligne du JORF à la fois."""
     # On utilise os.walk pour descendre dans les sous-dossiers codes/ et jorf/
     for root, dirs, files in os.walk(data_folder):
-        for filename in files:
+        dirs.sort()
+        for filename in sorted(files):
             file_path = os.path.join(root, filename)
-            
+
             # --- TRAITEMENT DES CODES (MARKDOWN) ---
             if filename.endswith(".md"):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # On découpe par paragraphe
-                for para in content.split('\n\n'):
-                    clean_para = para.replace('\n', ' ').strip()
-                    if not clean_para: continue
-                    
-                    entities = []
-                    for match in re.finditer(re_art, clean_para):
-                        # On récupère le groupe 1 (le numéro pur)
-                        entities.append([match.start(1), match.end(1), "ID_ART"])
-                    
-                    if entities:
-                        dataset.append([clean_para[:1000], {"entities": entities}])
+                for para in iter_paragraphs(file_path):
+                    # On récupère le groupe 1 (le numéro pur)
+                    ex = example(para, RE_ART, "ID_ART", group=1)
+                    if ex: yield ex
 
             # --- TRAITEMENT DU JORF (CSV) ---
             elif filename.endswith(".csv"):
                 try:
-                    # On lit le CSV avec le délimiteur '|' (vu dans tes fichiers)
-                    df = pd.read_csv(file_path, sep='|', header=None, on_bad_lines='skip')
-                    # On analyse la colonne qui contient le texte (souvent l'index 5 ou 6)
-                    for text in df.iloc[:, -1].dropna().astype(str):
-                        entities = []
+                    for text in iter_csv_texts(file_path):
                         # On cherche les lois dans le JORF
-                        for match in re.finditer(re_loi, text, re.IGNORECASE):
-                            entities.append([match.start(), match.end(), "ID_LOI"])
-                        
-                        if entities:
-                            dataset.append([text[:1000], {"entities": entities}])
-    
+                        ex = example(text, RE_LOI, "ID_LOI")
+                        if ex: yield ex
+                except (OSError, csv.Error) as e:
+                    print(f"Erreur sur {filename} : {e}")
+
+
+def is_dev(text, dev_ratio):
+    # Répartition stable par hash du texte : un même texte va toujours dans la même partie
+    h = int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:8], 'big')
+    return h / 2**64 < dev_ratio
+
+
+def build_docbin_shards(data_folder, out_dir, shard_size=5000, dev_ratio=0.1):
+    """Écrit directement out_dir/train/*.spacy et out_dir/dev/*.spacy, par fichiers de shard_size exemples.
+
+    Seuls les deux DocBin en cours sont en mémoire. `spacy train` accepte ces dossiers
+    (--paths.train out_dir/train --paths.dev out_dir/dev)."""
+    nlp = spacy.blank("fr")
+    out_dir = Path(out_dir)
+    shards = {'train': DocBin(), 'dev': DocBin()}
+    written = {'train': 0, 'dev': 0}
+    counts = {'train': 0, 'dev': 0}
+
+    def flush(part):
+        (out_dir / part).mkdir(parents=True, exist_ok=True)
+        shards[part].to_disk(out_dir / part / f"{part}-{written[part]:05d}.spacy")
+        written[part] += 1
+        shards[part] = DocBin()
+
+    for text, annot in generate_robust_dataset(data_folder):
+        doc = nlp.make_doc(text)
+        ents = []
+        for start, end, label in annot["entities"]:
+            span = doc.char_span(start, end, label=label, alignment_mode="contract")
+            if span:
+                ents.append(span)
+        if not ents:
+            continue
+        doc.ents = spacy.util.filter_spans(ents)
+        part = 'dev' if is_dev(text, dev_ratio) else 'train'
+        shards[part].add(doc)
+        counts[part] += 1
+        if len(shards[part]) >= shard_size:
+            flush(part)
+
+    for part in shards:
+        if len(shards[part]):
+            flush(part)
+        print(f" {out_dir / part} : {counts[part]} exemples en {written[part]} fichiers.")
+    return counts
 
-    return dataset
 
 if __name__ == "__main__":
     DATA_PATH = "data"
-    final_data = generate_robust_dataset(DATA_PATH)
-    
-    with open("training_data.json", "w", encoding="utf-8") as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
-    
+    build_docbin_shards(DATA_PATH, "corpus")
@@ -1,39 +1,27 @@
-import spacy
-from spacy.tokens import DocBin
-import json
-import random
+import sys
+import subprocess
+from pathlib import Path
 
-def convert_and_split(json_file, train_path, dev_path, split_ratio=0.9):
-    nlp = spacy.blank("fr")
-    
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+# preprocess.py écrit déjà le corpus en DocBin, par fichiers de 5000 exemples :
+#   corpus/train/train-00000.spacy ...   corpus/dev/dev-00000.spacy ...
+# (séparation train/dev par hachage du texte, exemples sans entité écartés).
+# `spacy train` lit ces dossiers tels quels, un fichier après l'autre : on les lui passe directement
+# (--paths.train corpus/train --paths.dev corpus/dev), sans les regrouper en un seul fichier, ce qui
+# chargerait tout le corpus en mémoire.
 
-    # On mélange les données pour éviter les biais (ex: tous les codes au début)
-    random.shuffle(data)
-    
-    split_point = int(len(data) * split_ratio)
-    train_data = data[:split_point]
-    dev_data = data[split_point:]
-
-    for set_data, output_path in [(train_data, train_path), (dev_data, dev_path)]:
-        db = DocBin()
-        count = 0
-        for text, annot in set_data:
-            doc = nlp.make_doc(text)
-            ents = []
-            for start, end, label in annot["entities"]:
-                span = doc.char_span(start, end, label=label, alignment_mode="contract")
-                if span:
-                    ents.append(span)
-            
-            if ents:
-                doc.ents = ents
-                db.add(doc)
-                count += 1
-        db.to_disk(output_path)
-        print(f" Fichier {output_path} avec {count} exemples.")
+def train(corpus_dir, config_path, output_dir):
+    corpus_dir, config_path = Path(corpus_dir), Path(config_path)
+    for part in ("train", "dev"):
+        if not any((corpus_dir / part).glob(f"{part}-*.spacy")):
+            print(f" Aucun fichier dans {corpus_dir / part} : lancer preprocess.py d'abord.")
+            return 1
+    if not config_path.exists():
+        # Configuration par défaut d'un NER français
+        subprocess.run([sys.executable, "-m", "spacy", "init", "config", str(config_path),
+                        "--lang", "fr", "--pipeline", "ner"], check=True)
+    return subprocess.run([sys.executable, "-m", "spacy", "train", str(config_path),
+                           "--paths.train", str(corpus_dir / "train"), "--paths.dev", str(corpus_dir / "dev"),
+                           "--output", str(output_dir)]).returncode
 
 if __name__ == "__main__":
-    # On limite à 100 000 exemples
-    convert_and_split("training_data.json", "train.spacy", "dev.spacy")
\ No newline at end of file
+    sys.exit(train("corpus", "config.cfg", "model"))
@@ -6,9 +6,12 @@ Construction du dataset annoté
 import re
 import json
 from pathlib import Path
+import sys
 import pandas as pd
 from collections import defaultdict
 import random
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.code_parser import parse_code_file, BODY
 
 class AnnotationBuilder:
     """Construit un dataset avec annotations structurées"""
@@ -37,15 +40,17 @@ class AnnotationBuilder:
         """Extrait les articles d'un fichier code (Markdown)"""
         examples = []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # Lecture partagée avec le site (src/code_parser.py) : on regroupe le corps de chaque
+        # article, en s'arrêtant aux 4 premiers paragraphes comme avant
+        bodies = {}
+        for rec in parse_code_file(file_path):
+            if rec['kind'] == BODY and rec['article'] and re.fullmatch(r'[LRD]?[\d\-]+', rec['article']):
+                paras = bodies.setdefault(rec['article'], [])
+                if len(paras) < 4:
+                    paras.append(rec['text'].strip())
         
-        # Pattern: **Art. 123-1**\n\n[Contenu sur 2-3 lignes]
-        article_pattern = r'\*\*Art\.\s+([LRD]?[\d\-]+(?:\-\d+)?)\*\*\n\n((?:[^\n]*\n?){1,4})'
-        
-        for match in re.finditer(article_pattern, content):
-            article_num = match.group(1)
-            context = match.group(2).replace('\n', ' ').strip()
+        for article_num, paras in bodies.items():
+            context = ' '.join(paras)
             
             # Limiter la longueur pour ne pas surcharger le modèle
             if len(context) > 300:
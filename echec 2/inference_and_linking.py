@@ -5,6 +5,7 @@ Génération des hyperliens
 import spacy
 from pathlib import Path
 import re
+import bisect
 import pandas as pd
 from tqdm import tqdm
 import json
@@ -13,8 +14,13 @@ from collections import defaultdict
 class LegalReferenceLinker:
     """Détecte les références juridiques et crée les hyperliens"""
     
-    def __init__(self, model_path="./output/model-trained-v2"):
-        
+    def __init__(self, model_path="./output/model-trained-v2", batch_size=64, n_process=1, max_chars=100000):
+        # Modèle NER (facultatif : sans lui, seules les regexps produisent des liens)
+        self.nlp = spacy.load(model_path) if Path(model_path).exists() else None
+        self.batch_size = batch_size
+        self.n_process = n_process
+        # Les textes plus longs sont découpés aux fins de ligne avant de passer dans le modèle
+        self.max_chars = max_chars
         
         # Patterns pour extraire le contexte avec regex
         self.code_pattern = r'(?:code|Code)\s+(?:(?:du|de|des)\s+)?([a-zA-Zàâäéèêëïîôö\s\-]+?)(?:\s+(?:français|général|de\s+))?(?=\s|,|\.|\)|$)'
@@ -57,126 +63,148 @@ class LegalReferenceLinker:
     
     def process_text(self, text, filename=""):
         """Traite un texte et génère les hyperliens"""
-        if not text or len(text) < 10:
-            return text
+        return self.process_texts([text], filename)[0]
+    
+    def process_texts(self, texts, filename=""):
+        """Traite une série de textes (paragraphes, sections, lignes du JORF) en un seul flux.
         
-        # Limiter à 900K caractères (pour rester sous la limite de 1M de spacy)
-        if len(text) > 900000:
-            text = text[:900000]
+        Le modèle reçoit tous les morceaux via nlp.pipe (lots de batch_size, n_process processus) ;
+        aucun texte n'est tronqué : un texte trop long est découpé aux fins de ligne et les positions
+        des entités sont recalées sur le texte complet."""
+        results = []
+        for text, ents in zip(texts, self._model_entities(texts)):
+            if not text or len(text) < 10:
+                results.append(text)
+                continue
+            try:
+                results.append(self._link(text, ents))
+            except Exception as e:
+                # Le texte reste sans liens ; l'erreur est signalée comme celles des fichiers
+                tqdm.write(f" Erreur  {filename}: {e}")
+                results.append(text)
+        return results
+    
+    def detect_texts(self, texts, with_links=False):
+        """Détections retenues pour chaque texte, sans html : [(début, fin, label)], ou
+        [(début, fin, label, lien html)] avec with_links"""
+        return [[(start, end, label, link) if with_links else (start, end, label)
+                 for start, end, link, label in self._detect(text, ents)]
+                if text and len(text) >= 10 else []
+                for text, ents in zip(texts, self._model_entities(texts))]
+    
+    def _model_entities(self, texts):
+        """Entités du modèle NER pour chaque texte, en positions sur le texte complet"""
+        pieces, owners = [], []
+        for i, text in enumerate(texts):
+            if text and len(text) >= 10:
+                for offset, piece in self._segments(text):
+                    pieces.append(piece)
+                    owners.append((i, offset))
         
-        try:
-            # === ÉTAPE 0: Détecter les articles par regex (le modèle les rate!) ===
-            result_text = text
-            
-            # Pattern pour articles: L. 123, L.123-1, R. 444, D. 555-1, etc.
-            article_pattern = r'\b([LRD])\.?\s*(\d+(?:\-\d+)?)\b'
-            article_matches = []
-            
-            for match in re.finditer(article_pattern, result_text):
-                start = match.start()
-                end = match.end()
-                entity_text = result_text[start:end]
-                num = entity_text.replace(" ", "").replace(".", "")
-                
-                # Extraire le code du contexte
-                code = self.extract_code_context(result_text, start)
-                link = f'<a data="fr_code_article:{code}/{num}">{entity_text}</a>'
-                article_matches.append((start, end, link))
-                self.stats["ARTICLE_NUM"] += 1
-            
-            # Appliquer les remplacements d'articles (en reverse)
-            for start, end, link in reversed(article_matches):
-                result_text = result_text[:start] + link + result_text[end:]
-            
-            # === ÉTAPE 1: Détecter les noms de codes avec regex ===
-            code_matches = []
-            code_name_pattern = r'\bcode\s+(?:du|de|des)?\s+([a-zA-Zàâäéèêëïîôö\s\-]+?)(?=\s+\w+|\s*$|,|\.|\))'
-            for match in re.finditer(code_name_pattern, result_text, re.IGNORECASE):
-                code_text = match.group(0)
-                code_name = match.group(1).strip()
-                # Vérifier que ça fait sens
-                if len(code_name) > 2 and len(code_name) < 100:
-                    code_slug = self.slugify_code(code_name)
-                    link = f'<a data="fr_code:{code_slug}">{code_text}</a>'
-                    code_matches.append((match.start(), match.end(), link))
-                    self.stats["CODE_NAME"] += 1
-            
-            # Appliquer les remplacements de code (en reverse pour pas perdre les indices)
-            for start, end, link in reversed(code_matches):
-                result_text = result_text[:start] + link + result_text[end:]
-            
-            # === ÉTAPE 2: Détecter les noms de loi avec regex ===
-            loi_matches = []
-            # Chercher "loi portant", "loi relative", "loi instituant", etc. suivi du titre
-            loi_name_pattern = r'\bloi\s+(?:portant|relative|instituant|visant|abrogeant|modifiant)\s+([a-zA-Zàâäéèêëïîôö\s\-]+?)(?=\s+du\s+\d|\s*$|,|\.|loi\s+n°)'
-            for match in re.finditer(loi_name_pattern, result_text, re.IGNORECASE):
-                loi_text = match.group(0)
-                loi_name = match.group(1).strip()
-                if len(loi_name) > 2 and len(loi_name) < 200:
-                    loi_slug = re.sub(r'[^\w\s]', '', loi_name).replace(' ', '_')[:50]
-                    link = f'<span class="ref-loi-name">{loi_text}</span>'
-                    loi_matches.append((match.start(), match.end(), link))
-                    self.stats["LOI_NAME"] += 1
-            
-            # Appliquer les remplacements de loi (en reverse)
-            for start, end, link in reversed(loi_matches):
-                result_text = result_text[:start] + link + result_text[end:]
-            
-            # === ÉTAPE 3: Inférence avec le modèle NER ===
-            # Le modèle reste utile pour les alinéas
-            doc = self.nlp(result_text)
+        model_ents = [[] for _ in texts]
+        if self.nlp is not None and pieces:
+            other_pipes = [p for p in self.nlp.pipe_names if p != "ner"]
+            docs = self.nlp.pipe(pieces, batch_size=self.batch_size, n_process=self.n_process, disable=other_pipes)
+            for (i, offset), doc in zip(owners, docs):
+                model_ents[i].extend((offset + e.start_char, offset + e.end_char, e.label_) for e in doc.ents)
+        return model_ents
+    
+    def _segments(self, text):
+        """(position, morceau) de longueur au plus max_chars, coupés après un saut de ligne si possible"""
+        start = 0
+        while len(text) - start > self.max_chars:
+            cut = text.rfind("\n", start, start + self.max_chars)
+            cut = cut + 1 if cut > start else start + self.max_chars
+            yield start, text[start:cut]
+            start = cut
+        yield start, text[start:]
+    
+    def _link(self, text, model_ents):
+        """Liens d'un texte : le html est assemblé en un seul passage à partir des détections"""
+        parts, pos = [], 0
+        for start, end, link, _ in self._detect(text, model_ents):
+            parts.append(text[pos:start])
+            parts.append(link)
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts)
+    
+    def _detect(self, text, model_ents):
+        """Détections d'un texte, triées par position : toutes portent sur le texte d'origine. Une
+        détection qui chevauche une détection prioritaire (articles, puis codes, lois, puis modèle)
+        est ignorée."""
+        matches = []
+        
+        # === ÉTAPE 0: Détecter les articles par regex (le modèle les rate!) ===
+        # Pattern pour articles: L. 123, L.123-1, R. 444, D. 555-1, etc.
+        article_pattern = r'\b([LRD])\.?\s*(\d+(?:\-\d+)?)\b'
+        for match in re.finditer(article_pattern, text):
+            start, end = match.span()
+            entity_text = text[start:end]
+            num = entity_text.replace(" ", "").replace(".", "")
             
-            # Trier les entités par position (inverse pour pas mélanger les indices)
-            entities = sorted(doc.ents, key=lambda x: x.start_char, reverse=True)
+            # Extraire le code du contexte
+            code = self.extract_code_context(text, start)
+            matches.append((start, end, f'<a data="fr_code_article:{code}/{num}">{entity_text}</a>', "ARTICLE_NUM"))
+        
+        # === ÉTAPE 1: Détecter les noms de codes avec regex ===
+        code_name_pattern = r'\bcode\s+(?:du|de|des)?\s+([a-zA-Zàâäéèêëïîôö\s\-]+?)(?=\s+\w+|\s*$|,|\.|\))'
+        for match in re.finditer(code_name_pattern, text, re.IGNORECASE):
+            code_text = match.group(0)
+            code_name = match.group(1).strip()
+            # Vérifier que ça fait sens
+            if len(code_name) > 2 and len(code_name) < 100:
+                code_slug = self.slugify_code(code_name)
+                matches.append((match.start(), match.end(), f'<a data="fr_code:{code_slug}">{code_text}</a>', "CODE_NAME"))
+        
+        # === ÉTAPE 2: Détecter les noms de loi avec regex ===
+        # Chercher "loi portant", "loi relative", "loi instituant", etc. suivi du titre
+        loi_name_pattern = r'\bloi\s+(?:portant|relative|instituant|visant|abrogeant|modifiant)\s+([a-zA-Zàâäéèêëïîôö\s\-]+?)(?=\s+du\s+\d|\s*$|,|\.|loi\s+n°)'
+        for match in re.finditer(loi_name_pattern, text, re.IGNORECASE):
+            loi_text = match.group(0)
+            loi_name = match.group(1).strip()
+            if len(loi_name) > 2 and len(loi_name) < 200:
+                matches.append((match.start(), match.end(), f'<span class="ref-loi-name">{loi_text}</span>', "LOI_NAME"))
+        
+        # === ÉTAPE 3: Entités du modèle NER ===
+        # Le modèle reste utile pour les alinéas
+        for start, end, label in model_ents:
+            entity_text = text[start:end]
             
-            for ent in entities:
-                start = ent.start_char
-                end = ent.end_char
-                label = ent.label_
-                entity_text = result_text[start:end]
-                
-                # Ignorer si c'est déjà dans un lien
-                if '<a' in result_text[max(0, start-10):start] or '<span' in result_text[max(0, start-10):start]:
+            # Générer le lien HTML selon le type d'entité
+            if label == "ALINEA_NUM":
+                # Ne pas confondre "Chapitre IV" / numérotation de chapitres
+                # avec un véritable alinéa. Filtrer si le contexte contient
+                # 'chapitre' ou 'chap.' ou si l'entité ressemble à un
+                # numéro romain (souvent utilisé pour chapitres).
+                window = text[max(0, start-20):min(len(text), end+20)].lower()
+                ent_stripped = entity_text.strip()
+                if 'chapitre' in window or 'chap.' in window:
                     continue
-                
-                # Générer le lien HTML selon le type d'entité
-                if label == "ALINEA_NUM":
-                    # Ne pas confondre "Chapitre IV" / numérotation de chapitres
-                    # avec un véritable alinéa. Filtrer si le contexte contient
-                    # 'chapitre' ou 'chap.' ou si l'entité ressemble à un
-                    # numéro romain (souvent utilisé pour chapitres).
-                    window = result_text[max(0, start-20):min(len(result_text), end+20)].lower()
-                    ent_stripped = entity_text.strip()
-                    if 'chapitre' in window or 'chap.' in window:
-                        continue
-                    if re.match(r'^[ivxlcdmIVXLCDM]+\.?$', ent_stripped):
-                        continue
-                    # L'alinéa doit aussi souvent être explicitement mentionné
-                    # ("alinéa", "1er alinéa", "2ème alinéa"). Si le modèle
-                    # a labellisé sans ce mot, vérifier la proximité.
-                    context_has_alinea = 'alin' in window or 'alinéa' in window
-                    if not context_has_alinea:
-                        # si l'entité contient un tiret entre chiffres (ex: 112-4),
-                        # il s'agit d'un article fragmenté (article L.112-4), pas d'un alinéa
-                        if re.search(r'\d+-\d+', ent_stripped):
-                            continue
-                    link = f'<span class="ref-alinea">{entity_text}</span>'
-                    self.stats["ALINEA_NUM"] += 1
-                
-                elif label == "LOI_NUM":
-                    link = f'<a data="fr_loi:{entity_text}">{entity_text}</a>'
-                    self.stats["LOI_NUM"] += 1
-                
-                else:
+                if re.match(r'^[ivxlcdmIVXLCDM]+\.?$', ent_stripped):
                     continue
-                
-                # Remplacer dans le texte (en inverse pour pas mélanger les indices)
-                result_text = result_text[:start] + link + result_text[end:]
+                # L'alinéa doit aussi souvent être explicitement mentionné
+                # ("alinéa", "1er alinéa", "2ème alinéa"). Si le modèle
+                # a labellisé sans ce mot, vérifier la proximité.
+                context_has_alinea = 'alin' in window or 'alinéa' in window
+                if not context_has_alinea:
+                    # si l'entité contient un tiret entre chiffres (ex: 112-4),
+                    # il s'agit d'un article fragmenté (article L.112-4), pas d'un alinéa
+                    if re.search(r'\d+-\d+', ent_stripped):
+                        continue
+                matches.append((start, end, f'<span class="ref-alinea">{entity_text}</span>', "ALINEA_NUM"))
             
-            return result_text
+            elif label == "LOI_NUM":
+                matches.append((start, end, f'<a data="fr_loi:{entity_text}">{entity_text}</a>', "LOI_NUM"))
         
-        except Exception as e:
-            return text
+        kept = []   # détections retenues, triées par position (elles ne se chevauchent pas)
+        for start, end, link, label in matches:
+            i = bisect.bisect_left(kept, (start,))
+            if (i > 0 and kept[i - 1][1] > start) or (i < len(kept) and kept[i][0] < end):
+                continue
+            kept.insert(i, (start, end, link, label))
+            self.stats[label] += 1
+        return kept
     
     def process_codes(self, sample_size=5):
         """Traite les fichiers codes (Markdown)"""
@@ -216,18 +244,9 @@ class LegalReferenceLinker:
                 # Définir fichier courant pour fallback
                 self.current_file = file_path.name
                 
-                # Découper par sections (## ou ###) pour eviter les textes trop longs
+                # Découper par sections (## ou ###), traitées ensemble par le modèle
                 chunks = re.split(r'\n#+\s+', content)
-                processed_chunks = []
-                
-                for chunk in chunks:
-                    if len(chunk) > 900000:
-                        # Si encore trop long, découper par paragraphes
-                        sub_chunks = chunk.split('\n\n')
-                        for sub_chunk in sub_chunks:
-                            processed_chunks.append(self.process_text(sub_chunk, file_path.name))
-                    else:
-                        processed_chunks.append(self.process_text(chunk, file_path.name))
+                processed_chunks = self.process_texts(chunks, file_path.name)
                 
                 # Reconstruire avec les séparateurs
                 processed = '\n## '.join(processed_chunks)
@@ -256,17 +275,15 @@ class LegalReferenceLinker:
                 df = pd.read_csv(file_path, sep='|', header=None, 
                                on_bad_lines='skip', nrows=500)  # Limiter pour le test
                 
-                # Traiter chaque ligne
+                # Généralement la dernière colonne contient le texte principal ;
+                # toutes les lignes passent dans le modèle en un seul flux
+                rows = [list(row) for row in df.values if len(row) > 0]
+                texts = [str(row[-1]) if pd.notna(row[-1]) else "" for row in rows]
                 processed_rows = []
-                for row in tqdm(df.values, desc=f"  {file_path.name}", leave=False):
-                    # Généralement la dernière colonne contient le texte principal
-                    if len(row) > 0:
-                        text = str(row[-1]) if pd.notna(row[-1]) else ""
-                        processed_text = self.process_text(text, file_path.name)
-                        # Remplacer le texte dans la ligne
-                        row = list(row)
-                        row[-1] = processed_text
-                        processed_rows.append(row)
+                for row, processed_text in zip(rows, self.process_texts(texts, file_path.name)):
+                    # Remplacer le texte dans la ligne
+                    row[-1] = processed_text
+                    processed_rows.append(row)
                 
                 # Sauvegarder en CSV
                 output_file = output_path / file_path.name
@@ -5,9 +5,12 @@ Ce script entraîne ou fine-tune un modèle spaCy sur les données annotées.
 """
 
 import spacy
+from spacy.tokens import DocBin
 from spacy.training import Example
-from spacy.util import minibatch, compounding
+from spacy.util import minibatch, compounding, filter_spans
 import json
+import time
+import hashlib
 from pathlib import Path
 import random
 from datetime import datetime
@@ -36,74 +39,80 @@ class NERTrainer:
         with open(preferred, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-       
+        # Format de annotation_builder.save_dataset ({"data": [[texte, {"entities": ...}], ...]}) ou liste brute
+        self.training_data = data["data"] if isinstance(data, dict) else data
         return self.training_data
     
-    def prepare_training_examples(self):
-        """Convertit les données JSON en format spacy Example"""
-        examples = []
+    def dataset_hash(self):
+        """Empreinte du dataset, des labels et de la version de spacy : elle nomme le DocBin en cache"""
+        h = hashlib.sha1()
+        h.update(json.dumps([spacy.__version__, self.nlp.lang, sorted(self.entity_types)]).encode('utf-8'))
+        for text, annotations in self.training_data:
+            h.update(json.dumps([text, annotations.get("entities", [])], ensure_ascii=False).encode('utf-8'))
+        return h.hexdigest()[:16]
+    
+    def prepare_training_examples(self, cache_dir="./output/docbin"):
+        """Aligne les annotations sur la tokenisation une seule fois et les sérialise en DocBin.
+        
+        Le fichier est nommé d'après dataset_hash() : tant que les données ne changent pas,
+        les exécutions suivantes relisent directement les documents alignés."""
+        cache_path = Path(cache_dir) / f"{self.dataset_hash()}.spacy"
+        if cache_path.exists():
+            t0 = time.perf_counter()
+            docs = list(DocBin().from_disk(cache_path).get_docs(self.nlp.vocab))
+            print(f"   📦 {len(docs)} exemples alignés relus depuis {cache_path} ({time.perf_counter() - t0:.1f}s)")
+            return docs
+        
+        t0 = time.perf_counter()
+        docs = []
         errors = 0
         
         for text, annotations in self.training_data:
             try:
-                # Créer le doc prédiction (vide)
-                doc_pred = self.nlp.make_doc(text)
+                doc_ref = self.nlp.make_doc(text)
                 
-                # Filtrer et valider les entités
-                valid_entities = []
+                # Filtrer et valider les entités, puis les aligner sur les tokens
+                spans = []
                 for start_char, end_char, label in annotations.get("entities", []):
-                    # Valider les positions
-                    if not (0 <= start_char < end_char <= len(text)):
+                    # Valider les positions, le texte et le label
+                    if not (0 <= start_char < end_char <= len(text)) or not text[start_char:end_char].strip():
                         errors += 1
                         continue
-                    
-                    # Vérifier que le texte n'est pas vide
-                    span_text = text[start_char:end_char].strip()
-                    if not span_text:
+                    if label not in self.entity_types:
                         errors += 1
                         continue
                     
-                    # Label doit être dans notre liste de labels
-                    if label not in self.entity_types:
+                    # Alignement strict, sinon on réduit l'entité aux tokens qu'elle contient entièrement
+                    span = doc_ref.char_span(start_char, end_char, label=label, alignment_mode="strict")
+                    if span is None:
+                        span = doc_ref.char_span(start_char, end_char, label=label, alignment_mode="contract")
+                    if span is None:
                         errors += 1
                         continue
-                    
-                    valid_entities.append((start_char, end_char, label))
+                    spans.append(span)
                 
                 # Créer l'exemple seulement s'il y a des entités valides
-                if valid_entities:
-                    # Créer l'Example correctement: from_dict s'attend à des annotations raw
-                    # On lui passe le doc des prédictions (vide) et les annotations gold
-                    try:
-                        example = Example.from_dict(doc_pred, {"entities": valid_entities})
-                        examples.append(example)
-                    except ValueError as e:
-                        # Si y'a un problème d'alignement, essayer avec char_span
-                        doc_ref = self.nlp.make_doc(text)
-                        has_ents = False
-                        ents = []
-                        
-                        for start, end, label in valid_entities:
-                            span = doc_ref.char_span(start, end, label=label, alignment_mode="strict")
-                            if span is None:
-                                span = doc_ref.char_span(start, end, label=label, alignment_mode="contract")
-                            if span:
-                                ents.append(span)
-                                has_ents = True
-                        
-                        if has_ents:
-                            doc_ref.ents = ents
-                            example = Example(doc_pred, doc_ref)
-                            examples.append(example)
-                        else:
-                            errors += 1
+                if spans:
+                    doc_ref.ents = filter_spans(spans)
+                    docs.append(doc_ref)
                 
             except Exception as e:
                 errors += 1
                 if errors <= 3:
                     print(f"    Erreur: {type(e).__name__}: {e}")
-
-                return examples
+        
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        DocBin(attrs=["ENT_IOB", "ENT_TYPE"], docs=docs).to_disk(cache_path)
+        print(f"   📦 {len(docs)} exemples alignés ({errors} entités rejetées) en {time.perf_counter() - t0:.1f}s -> {cache_path}")
+        return docs
+    
+    def iter_examples(self, docs, shuffle=True):
+        """Flux d'Example construits au fil de l'eau à partir des documents de référence"""
+        order = list(range(len(docs)))
+        if shuffle:
+            random.shuffle(order)
+        for i in order:
+            yield Example(self.nlp.make_doc(docs[i].text), docs[i])
     
     def initialize_model(self, use_existing=False, model_path="./output/model-best"):
         """Initialise ou charge un modèle spacy"""
@@ -128,31 +137,29 @@ class NERTrainer:
         
         return self.nlp
     
-    def train(self, n_iterations=30, batch_size=8, drop_rate=0.5):
-        """Entraîne le modèle sur les données"""
+    def train(self, n_iterations=30, batch_size=(4.0, 32.0, 1.001), drop_rate=0.5):
+        """Entraîne le modèle sur les données.
         
-   
+        batch_size : (début, fin, facteur) des tailles de lots croissantes (spacy.util.compounding),
+        ou un entier pour des lots de taille fixe."""
         
-        # Préparer les données
-        training_examples = self.prepare_training_examples()
-    
+        # Préparer les données (DocBin en cache dès la deuxième exécution)
+        docs = self.prepare_training_examples()
         
         # Split: 80% train, 20% dev
-        random.shuffle(training_examples)
-        split = int(len(training_examples) * 0.8)
-        train_examples = training_examples[:split]
-        dev_examples = training_examples[split:]
+        random.shuffle(docs)
+        split = int(len(docs) * 0.8)
+        train_docs = docs[:split]
+        dev_docs = docs[split:]
         
-        print(f"Données: {len(train_examples)} train + {len(dev_examples)} dev")
+        print(f"Données: {len(train_docs)} train + {len(dev_docs)} dev")
         
         # Configuration du pipeline
-        ner = self.nlp.get_pipe("ner")
         other_pipes = [pipe for pipe in self.nlp.pipe_names if pipe != "ner"]
         
         # === ÉTAPE CRUCIALE: Initialiser le modèle ===
         # Cela créé toutes les transitions nécessaires pour le NER
-        self.nlp.initialize(lambda: train_examples[:200])
-           
+        self.nlp.initialize(lambda: self.iter_examples(train_docs[:200], shuffle=False))
         
         # Désactiver les autres pipelines pendant l'entraînement
         with self.nlp.disable_pipes(*other_pipes):
@@ -160,16 +167,15 @@ class NERTrainer:
             
             # Boucle d'entraînement
             for iteration in range(n_iterations):
-                random.shuffle(train_examples)
                 losses = {}
                 batch_count = 0
                 batch_errors = 0
+                words = 0
+                t0 = time.perf_counter()
                 
-                # Mini-batches
-                for batch_start in range(0, len(train_examples), batch_size):
-                    batch_end = min(batch_start + batch_size, len(train_examples))
-                    batch = train_examples[batch_start:batch_end]
-                    
+                # Mini-batches de taille croissante, lus au fil de l'eau
+                sizes = compounding(*batch_size) if isinstance(batch_size, tuple) else batch_size
+                for batch in minibatch(self.iter_examples(train_docs), size=sizes):
                     try:
                         self.nlp.update(
                             batch,
@@ -178,18 +184,20 @@ class NERTrainer:
                             losses=losses
                         )
                         batch_count += 1
+                        words += sum(len(eg.reference) for eg in batch)
                     except Exception as e:
                         batch_errors += 1
                         if batch_errors <= 2:
                             print(f"      ⚠️ Erreur batch: {str(e)[:80]}")
                 
-                # Afficher la perte tous les 5 iterations
-                if (iteration + 1) % 5 == 0 or iteration == 0:
-                    loss_value = losses.get('ner', 0.0) / batch_count if batch_count > 0 else 0
-                    print(f"   Iteration {iteration+1:2d}: Loss={loss_value:.4f} ({batch_count} batches ok, {batch_errors} erreurs)")
+                elapsed = time.perf_counter() - t0
+                loss_value = losses.get('ner', 0.0) / batch_count if batch_count > 0 else 0
+                print(f"   Iteration {iteration+1:2d}: Loss={loss_value:.4f} ({batch_count} batches ok, {batch_errors} erreurs) "
+                      f"- {elapsed:.1f}s, {words / elapsed if elapsed else 0:.0f} mots/s")
         
         return self.nlp
     
+    def test_model(self, test_sentences=None):
         """Teste le modèle sur quelques phrases"""
         
         if test_sentences is None:
@@ -0,0 +1,131 @@
+# Identifiants d'articles structurés et index trié des articles existants de chaque code.
+#
+# Un identifiant comme "L. 111-2", "L111-2" ou "209 quater" est découpé en
+#   préfixe (L, R, D, A ou rien), composantes numériques (111, 2), rang du suffixe latin (quater = 4)
+# ce qui donne un ordre total : on peut alors retrouver par dichotomie les articles réellement
+# présents entre les deux bornes d'une plage "articles L. 111-2 à L. 111-5".
+
+import re
+import bisect
+from functools import total_ordering
+
+from src.code_parser import parse_code_file, ARTICLE
+
+LATIN_RANKS = {'bis': 2, 'ter': 3, 'quater': 4, 'quinquies': 5, 'sexies': 6, 'septies': 7,
+               'octies': 8, 'nonies': 9, 'decies': 10, 'undecies': 11}
+PREFIX_ORDER = {'': 0, 'A': 1, 'D': 2, 'L': 3, 'R': 4}
+
+RE_ARTICLE_ID = re.compile(
+    r"(?i)^\s*(?P<prefix>[LDRA*])?(?P<dot>\.)?\s*(?P<nums>\d+(?:\s*[.-]\s*\d+)*)"
+    r"(?:\s*(?P<suffix>" + "|".join(sorted(LATIN_RANKS, key=len, reverse=True)) + r"))?\s*\.?\s*$")
+
+
+@total_ordering
+class ArticleId:
+    """Identifiant d'article analysé, comparable et hachable."""
+    __slots__ = ('prefix', 'dot', 'nums', 'rank')
+
+    def __init__(self, prefix, nums, rank=0, dot=False):
+        self.prefix = prefix
+        self.nums = nums
+        self.rank = rank
+        self.dot = dot
+
+    @classmethod
+    def parse(cls, text):
+        """Renvoie un ArticleId, ou None si le texte n'a pas la forme d'un numéro d'article."""
+        m = RE_ARTICLE_ID.match(re.sub(r"(?i)\b1er\b", "1", text.replace('\xa0', ' ')))
+        if not m:
+            return None
+        prefix = (m.group('prefix') or '').upper().replace('*', '')
+        nums = tuple(int(n) for n in re.split(r"\s*[.-]\s*", m.group('nums')))
+        rank = LATIN_RANKS[m.group('suffix').lower()] if m.group('suffix') else 0
+        return cls(prefix, nums, rank, bool(m.group('dot')))
+
+    @property
+    def key(self):
+        return (PREFIX_ORDER.get(self.prefix, 9), self.nums, self.rank)
+
+    def format(self, dot=None):
+        # Même forme que LegalEngine._norm : "L.111-2" (ou "L111-2" sans point), suffixe latin en "-N"
+        dot = self.dot if dot is None else dot
+        body = "-".join(str(n) for n in self.nums) + (f"-{self.rank}" if self.rank else "")
+        return self.prefix + ("." if dot and self.prefix else "") + body
+
+    def __eq__(self, other):
+        return isinstance(other, ArticleId) and self.key == other.key
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"ArticleId({self.format()!r})"
+
+
+class ArticleIndex:
+    """Index trié, par code, des articles qui existent dans les fichiers markdown.
+
+    `files` associe un identifiant de code (slug) au fichier markdown correspondant. Chaque code
+    n'est lu qu'au premier besoin, en un seul passage sur ses en-têtes d'article.
+    """
+
+    def __init__(self, files):
+        self.files = dict(files)
+        self._keys = {}
+        self._ids = {}
+        self._sets = {}
+
+    def _load(self, code):
+        if code not in self._keys:
+            ids = []
+            path = self.files.get(code)
+            if path is not None:
+                for rec in parse_code_file(path):
+                    if rec['kind'] == ARTICLE:
+                        aid = ArticleId.parse(rec['num'])
+                        if aid is not None:
+                            ids.append(aid)
+            ids = sorted(set(ids))
+            self._ids[code] = ids
+            self._keys[code] = [a.key for a in ids]
+            self._sets[code] = set(self._keys[code])
+        return self._keys[code], self._ids[code]
+
+    def __contains__(self, item):
+        # Test en O(1) sur l'ensemble des clés du code
+        code, article = item
+        aid = ArticleId.parse(article) if isinstance(article, str) else article
+        if aid is None:
+            return False
+        self._load(code)
+        return aid.key in self._sets[code]
+
+    def between(self, code, start, end, limit=500):
+        """Articles existants strictement entre `start` et `end` (chaînes ou ArticleId).
+
+        Coût en O(log n + taille de la plage). Renvoie une liste vide si les bornes ne sont pas
+        comparables (préfixes différents, ordre inversé) ou si la plage dépasse `limit` articles.
+        """
+        a = ArticleId.parse(start) if isinstance(start, str) else start
+        b = ArticleId.parse(end) if isinstance(end, str) else end
+        if a is None or b is None or a.prefix != b.prefix or not a < b:
+            return []
+        keys, ids = self._load(code)
+        lo = bisect.bisect_right(keys, a.key)
+        hi = bisect.bisect_left(keys, b.key)
+        if hi - lo > limit:
+            return []
+        return ids[lo:hi]
+
+    def span(self, code, first, last):
+        """Articles existants de `first` à `last` inclus : les membres d'une plage, relus à partir des
+        deux bornes que le html en garde (attribut data-range)."""
+        a = ArticleId.parse(first) if isinstance(first, str) else first
+        b = ArticleId.parse(last) if isinstance(last, str) else last
+        if a is None or b is None:
+            return []
+        keys, ids = self._load(code)
+        return ids[bisect.bisect_left(keys, a.key):bisect.bisect_right(keys, b.key)]
@@ -0,0 +1,198 @@
+# Rapport de ressources d'un build (data/html/rapport_build.json) et comparaison de deux rapports.
+#
+# Pour chaque fichier d'entrée, le build note : temps réel et temps CPU, octets lus et écrits,
+# paragraphes rendus et liens produits, pic RSS du processus qui l'a traité et, avec
+# --trace-memory, pic tracemalloc pendant le fichier (désactivé par défaut : tracemalloc ralentit
+# nettement l'extraction). Un fichier découpé en morceaux (--chunk-mb) indique aussi leur nombre
+# et le temps CPU de son assemblage dans le processus principal, ainsi que ses lignes passées par
+# le détecteur simplifié (budget de correspondances dépassé) : leur nombre et les SLOW_LINES plus
+# lentes. Le rapport reprend les totaux (fichiers/s, octets/s, CPU / temps réel), le pic RSS du
+# build (processus principal et workers), les fichiers et les lignes les plus lents. Il est le même en série et avec --jobs ; avec --shard i/N,
+# chaque part écrit rapport_build-i-N.json et --merge les réunit dans rapport_build.json
+# (merge_reports : les parts tournent en même temps sur N machines, le temps réel est celui de la
+# plus longue, les temps CPU s'additionnent).
+#
+# Comparaison de deux rapports (régressions, fichiers de la longue traîne) :
+#   python src/build_report.py data/html/rapport_avant.json data/html/rapport_build.json --threshold 1.2
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:     # Windows : pas de getrusage, pas de pic RSS
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.code_parser import BODY
+
+SLOWEST = 10
+SLOW_LINES = 20
+
+
+class FileStats:
+    """Paragraphes et liens d'un fichier, collectés pendant son rendu (rec vaut None pour une ligne du JORF)."""
+
+    def __init__(self):
+        self.paragraphs = 0
+        self.links = 0
+
+    def add(self, rec, frag=None):
+        if rec is None or rec['kind'] == BODY:
+            self.paragraphs += 1
+            self.links += frag.count('<a data="')
+
+
+def keep_slowest(lines, n=SLOW_LINES):
+    # Les n lignes les plus lentes (dictionnaires avec 'seconds'), de la plus lente à la plus rapide
+    return sorted(lines, key=lambda l: -l['seconds'])[:n]
+
+
+def rss_peak_mb(children=False):
+    # Pic de mémoire résidente du processus (ou de ses enfants terminés), en Mo
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def build_report(files, wall, main_cpu, jobs, cache=None):
+    # files : entrées par fichier (dans l'ordre des fichiers), main_cpu : temps CPU du processus
+    # principal -> rapport complet
+    rss = [x for x in (rss_peak_mb(), rss_peak_mb(children=True)) if x is not None]
+    traced = [f['tracemalloc_peak_mb'] for f in files if f.get('tracemalloc_peak_mb') is not None]
+    # En série, le temps CPU des fichiers est déjà compté dans celui du processus principal, comme
+    # l'assemblage des fichiers découpés en morceaux (--chunk-mb) en parallèle
+    cpu = main_cpu + (sum(f['cpu_seconds'] - f.get('assembly_cpu_seconds', 0) for f in files) if jobs > 1 else 0)
+    return summarize(files, wall, cpu, jobs, rss, traced, cache)
+
+
+def merge_reports(reports, order):
+    # Rapports des parts d'un build --shard -> rapport du build entier, fichiers dans l'ordre `order`
+    by_file = {f['file']: f for r in reports for f in r['per_file']}
+    files = [by_file[key] for key in order if key in by_file]
+    rss = [r['rss_peak_mb'] for r in reports if r['rss_peak_mb'] is not None]
+    traced = [r['tracemalloc_peak_mb'] for r in reports if r['tracemalloc_peak_mb'] is not None]
+    caches = [r['cache'] for r in reports if r['cache'] is not None]
+    cache = {k: sum(c[k] for c in caches) for k in caches[0]} if caches else None
+    report = summarize(files, max(r['seconds'] for r in reports), sum(r['cpu_seconds'] for r in reports),
+                       max(r['jobs'] for r in reports), rss, traced, cache)
+    report['shards'] = len(reports)
+    return report
+
+
+def summarize(files, wall, cpu, jobs, rss, traced, cache):
+    bytes_in, bytes_out = sum(f['bytes_in'] for f in files), sum(f['bytes_out'] for f in files)
+    return {
+        'jobs': jobs,
+        'files': len(files),
+        'seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_per_wall': round(cpu / wall, 2) if wall else None,
+        'files_per_s': round(len(files) / wall, 2) if wall else None,
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'bytes_in_per_s': round(bytes_in / wall) if wall else None,
+        'paragraphs': sum(f['paragraphs'] for f in files),
+        'links': sum(f['links'] for f in files),
+        'rss_peak_mb': max(rss) if rss else None,
+        'tracemalloc_peak_mb': max(traced) if traced else None,
+        'cache': cache,
+        'slowest': [f['file'] for f in sorted(files, key=lambda f: -f['seconds'])[:SLOWEST]],
+        'budget_lines': sum(f.get('budget_lines', 0) for f in files),
+        'slow_lines': keep_slowest(l for f in files for l in f.get('slow_lines', ())),
+        'per_file': files,
+    }
+
+
+def write_build_report(path, report):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fout:
+        json.dump(report, fout, ensure_ascii=False, indent=1)
+
+
+def format_report(report):
+    # Résumé d'une ligne, suivi des fichiers les plus lents
+    mb = lambda n: f"{n / 2**20:.1f} Mo"
+    lines = [f"⏱️ {report['files']} fichiers en {report['seconds']:.1f}s ({report['files_per_s']} fichiers/s, "
+             f"{mb(report['bytes_in_per_s'] or 0)}/s lus, CPU {report['cpu_per_wall']}x le temps réel, "
+             f"pic RSS {report['rss_peak_mb']} Mo)"]
+    by_name = {f['file']: f for f in report['per_file']}
+    for name in report['slowest'][:5]:
+        f = by_name[name]
+        lines.append(f"   {name} : {f['seconds']:.1f}s, {mb(f['bytes_in'])}, {f['paragraphs']} paragraphes")
+    if report.get('budget_lines'):
+        lines.append(f"⚠️ {report['budget_lines']} lignes passées par le détecteur simplifié, dont les plus lentes :")
+        for l in report['slow_lines'][:5]:
+            lines.append(f"   {l['source']} : {l['length']} caractères, {l['seconds']:.2f}s — {l['text'][:60]!r}")
+    return "\n".join(lines)
+
+
+# Comparaison de deux rapports
+
+TOTALS = ['seconds', 'cpu_seconds', 'files_per_s', 'bytes_in_per_s', 'rss_peak_mb', 'tracemalloc_peak_mb',
+          'bytes_in', 'bytes_out', 'paragraphs', 'links']
+
+
+def ratio(old, new):
+    return new / old if old else None
+
+
+def diff_reports(old, new, threshold=1.2, min_seconds=0.5):
+    # (totaux [(clé, avant, après, rapport)], fichiers plus lents, plus rapides, apparus, disparus)
+    totals = [(k, old.get(k), new.get(k), ratio(old.get(k), new.get(k)) if old.get(k) is not None and new.get(k) is not None else None)
+              for k in TOTALS]
+    old_files = {f['file']: f for f in old['per_file']}
+    new_files = {f['file']: f for f in new['per_file']}
+    slower, faster = [], []
+    for name in old_files.keys() & new_files.keys():
+        a, b = old_files[name]['seconds'], new_files[name]['seconds']
+        # Les fichiers très rapides ne sont pas comparés : leur temps est surtout du bruit
+        if max(a, b) < min_seconds:
+            continue
+        r = ratio(a, b)
+        if r is None or r >= threshold:
+            slower.append((name, a, b, r))
+        elif r <= 1 / threshold:
+            faster.append((name, a, b, r))
+    slower.sort(key=lambda x: -(x[2] - x[1]))
+    faster.sort(key=lambda x: x[2] - x[1])
+    return (totals, slower, faster, sorted(new_files.keys() - old_files.keys()), sorted(old_files.keys() - new_files.keys()))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare deux rapports de build (rapport_build.json).")
+    parser.add_argument("old", type=Path, help="rapport de référence")
+    parser.add_argument("new", type=Path, help="nouveau rapport")
+    parser.add_argument("--threshold", type=float, default=1.2, help="rapport de temps à partir duquel un fichier est signalé")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="ignorer les fichiers plus rapides que cela dans les deux rapports")
+    parser.add_argument("--top", type=int, default=20, help="fichiers affichés par catégorie")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    old, new = (json.loads(p.read_text(encoding='utf-8')) for p in (args.old, args.new))
+    totals, slower, faster, added, removed = diff_reports(old, new, args.threshold, args.min_seconds)
+    print(f"{'':<22} {'avant':>14} {'après':>14} {'rapport':>8}")
+    for key, a, b, r in totals:
+        if a is None and b is None:
+            continue
+        print(f"{key:<22} {a if a is not None else '-':>14} {b if b is not None else '-':>14} {f'{r:.2f}' if r is not None else '-':>8}")
+    for title, rows in (("⚠️ Plus lents", slower), ("✅ Plus rapides", faster)):
+        if rows:
+            print(f"{title} (seuil {args.threshold}x) :")
+            for name, a, b, r in rows[:args.top]:
+                print(f"   {name} : {a:.2f}s -> {b:.2f}s ({f'{r:.2f}x' if r is not None else 'nouveau temps'})")
+    if added:
+        print(f"📄 Nouveaux fichiers : {', '.join(added[:args.top])}")
+    if removed:
+        print(f"📄 Fichiers absents : {', '.join(removed[:args.top])}")
+    return len(slower)
+
+
+if __name__ == "__main__":
+    main()
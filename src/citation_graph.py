@@ -0,0 +1,209 @@
+# Graphe des citations construit pendant le build du site.
+#
+# Un noeud est une cible normalisée, écrite comme l'attribut data des liens :
+#   fr_code_article:civil/L111-1, fr_code:code/civil, fr_loi:loi/..., fr_livre:...
+# plus les sources qui ne sont pas des liens : l'article d'un code dans lequel se trouve la
+# citation, ou l'année du JORF (jorf:2010). Les numéros d'articles sont ramenés à la forme des
+# en-têtes du markdown ("L. 111-1" et "L111-1" donnent le même noeud). Un lien de plage ("articles
+# L. 111-2 à L. 111-9") cite aussi chacun des articles existants entre les bornes : l'attribut
+# data-range n'en garde que le premier et le dernier, les autres sont relus dans l'ArticleIndex.
+#
+# Les noeuds sont des entiers ; les arêtes sont stockées dans des array('I') (4 octets par arête)
+# puis rangées en CSR (compressed sparse row) : indptr[i]:indptr[i+1] délimite, dans indices,
+# les voisins du noeud i. La mémoire reste proportionnelle au nombre d'arêtes, sans dict de listes.
+#
+# Fichiers exportés (dossier data/graph par défaut) :
+#   nodes.txt      un nom de noeud par ligne (l'id est le numéro de ligne, à partir de 0)
+#   indptr.bin     CSR des citations sortantes, entiers non signés 32 bits (ordre de la machine)
+#   indices.bin
+#   most_cited.tsv articles les plus cités : rang, score PageRank, citations reçues, noeud
+
+import re
+from array import array
+from pathlib import Path
+
+from src.article_ids import ArticleId
+
+RE_LINK_DATA = re.compile(r'<a data="([^"]+)"(?: data-range="([^"]+)")?')
+ARTICLE_KINDS = ('fr_code_article:', 'fr_loi_article:')
+
+
+def article_node(kind, slug, article):
+    # "fr_code_article", "civil", "L.111-1" -> "fr_code_article:civil/L111-1"
+    aid = ArticleId.parse(article)
+    return f"{kind}:{slug}/{aid.format(dot=False) if aid is not None else article}"
+
+
+def normalize_target(data):
+    # Attribut data d'un lien -> nom de noeud
+    if data.startswith(ARTICLE_KINDS):
+        kind, _, rest = data.partition(':')
+        slug, _, article = rest.partition('/')
+        return article_node(kind, slug, article)
+    return data
+
+
+class GraphBuilder:
+    """Accumule les arêtes (source -> cible) pendant le build, avec des ids entiers."""
+
+    def __init__(self, index=None):
+        # index : ArticleIndex pour développer les plages (sans index, seule la borne finale est citée)
+        self.index = index
+        self.ids = {}
+        self.names = []
+        self.src = array('I')
+        self.dst = array('I')
+
+    def node(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def add_html(self, source, html):
+        # Ajoute une arête de `source` vers chaque lien du fragment html
+        s = None
+        for data, bounds in RE_LINK_DATA.findall(html):
+            if s is None:
+                s = self.node(source)
+            targets = [normalize_target(data)]
+            if bounds and self.index is not None:
+                kind, _, rest = data.partition(':')
+                slug = rest.partition('/')[0]
+                targets += [f"{kind}:{slug}/{aid.format(dot=False)}" for aid in self.index.span(slug, *bounds.split())]
+            for name in targets:
+                t = self.node(name)
+                if t != s:
+                    self.src.append(s)
+                    self.dst.append(t)
+
+    def state(self):
+        # Forme compacte, envoyée par les processus du build au processus principal
+        return self.names, self.src, self.dst
+
+    def merge(self, state):
+        names, src, dst = state
+        remap = array('I', (self.node(n) for n in names))
+        self.src.extend(remap[s] for s in src)
+        self.dst.extend(remap[d] for d in dst)
+
+    def to_graph(self):
+        return CitationGraph(self.names, *csr(len(self.names), self.src, self.dst))
+
+
+def csr(n, src, dst):
+    # Tri par comptage des arêtes selon leur source : O(noeuds + arêtes)
+    indptr = array('I', [0]) * (n + 1)
+    for s in src:
+        indptr[s + 1] += 1
+    for i in range(n):
+        indptr[i + 1] += indptr[i]
+    fill = array('I', indptr[:-1])
+    indices = array('I', [0]) * len(dst)
+    for s, d in zip(src, dst):
+        indices[fill[s]] = d
+        fill[s] += 1
+    return indptr, indices
+
+
+class CitationGraph:
+    """Graphe en CSR : citations sortantes (indptr, indices) et, calculées au premier besoin, entrantes."""
+
+    def __init__(self, names, indptr, indices):
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+        self._ids = None
+        self._in = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        if self._ids is None:
+            self._ids = {n: i for i, n in enumerate(self.names)}
+        return self._ids.get(name)
+
+    def _incoming(self):
+        if self._in is None:
+            src = array('I')
+            for i in range(len(self.names)):
+                src.extend([i] * (self.indptr[i + 1] - self.indptr[i]))
+            self._in = csr(len(self.names), self.indices, src)
+        return self._in
+
+    def out_degree(self, i):
+        return self.indptr[i + 1] - self.indptr[i]
+
+    def in_degree(self, i):
+        indptr, _ = self._incoming()
+        return indptr[i + 1] - indptr[i]
+
+    def neighbours(self, i):
+        # Noeuds cités par i (une fois par citation)
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def citers(self, i):
+        # Noeuds qui citent i
+        indptr, indices = self._incoming()
+        return indices[indptr[i]:indptr[i + 1]]
+
+    def pagerank(self, damping=0.85, iterations=50, tol=1e-9):
+        # Itération de la puissance sur le CSR ; le score des noeuds sans citation sortante est
+        # redistribué uniformément.
+        n = len(self.names)
+        if not n:
+            return []
+        indptr, indices = self.indptr, self.indices
+        rank = [1.0 / n] * n
+        for _ in range(iterations):
+            new = [0.0] * n
+            dangling = 0.0
+            for i in range(n):
+                deg = indptr[i + 1] - indptr[i]
+                if deg == 0:
+                    dangling += rank[i]
+                    continue
+                share = rank[i] / deg
+                for j in indices[indptr[i]:indptr[i + 1]]:
+                    new[j] += share
+            base = (1.0 - damping + damping * dangling) / n
+            new = [base + damping * r for r in new]
+            delta = sum(abs(a - b) for a, b in zip(new, rank))
+            rank = new
+            if delta < tol:
+                break
+        return rank
+
+    def most_cited(self, limit=100, kinds=ARTICLE_KINDS):
+        # [(noeud, score, citations reçues)] des articles les mieux classés par PageRank
+        rank = self.pagerank()
+        nodes = [i for i, name in enumerate(self.names) if name.startswith(kinds)]
+        nodes.sort(key=lambda i: (-rank[i], self.names[i]))
+        return [(self.names[i], rank[i], self.in_degree(i)) for i in nodes[:limit]]
+
+    def save(self, out_dir, top=1000):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with open(out_dir / "nodes.txt", 'w', encoding='utf-8') as fout:
+            fout.writelines(name + "\n" for name in self.names)
+        with open(out_dir / "indptr.bin", 'wb') as fout:
+            self.indptr.tofile(fout)
+        with open(out_dir / "indices.bin", 'wb') as fout:
+            self.indices.tofile(fout)
+        with open(out_dir / "most_cited.tsv", 'w', encoding='utf-8') as fout:
+            fout.write("rang\tscore\tcitations\tarticle\n")
+            for r, (name, score, deg) in enumerate(self.most_cited(top), 1):
+                fout.write(f"{r}\t{score:.6g}\t{deg}\t{name}\n")
+
+    @classmethod
+    def load(cls, in_dir):
+        in_dir = Path(in_dir)
+        names = (in_dir / "nodes.txt").read_text(encoding='utf-8').splitlines()
+        indptr, indices = array('I'), array('I')
+        with open(in_dir / "indptr.bin", 'rb') as fin:
+            indptr.frombytes(fin.read())
+        with open(in_dir / "indices.bin", 'rb') as fin:
+            indices.frombytes(fin.read())
+        return cls(names, indptr, indices)
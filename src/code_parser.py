@@ -0,0 +1,81 @@
+# Lecture en un seul passage des fichiers markdown de codes (data/codes/*.md).
+#
+# Structure d'un fichier :
+#   ---                      <- en-tête YAML (title, date)
+#   title: Code civil
+#   date: 2024-01-15
+#   ---
+#   ## Titre préliminaire    <- titres, le nombre de # donne le niveau
+#   **Art. 1**               <- en-tête d'article
+#   Les lois et ...          <- paragraphes du corps de l'article
+#
+# parse_code_file produit des enregistrements typés (dictionnaires) avec la position en octets
+# du début de ligne, pour que le site, data_prep et les constructeurs de jeux de données
+# partagent la même lecture au lieu de refaire chacun leurs regexps.
+
+import re
+
+RE_ARTICLE_HEADER = re.compile(r"^\*\*Art\.\s*(?P<num>[^*]+?)\s*\*\*\s*$")
+
+# Types d'enregistrements
+FRONTMATTER = 'frontmatter'  # {'data': {'title': ..., 'date': ...}}
+HEADING = 'heading'          # {'level': 2, 'title': ..., 'path': (titres parents..., titre)}
+ARTICLE = 'article'          # {'num': 'L111-1', 'path': ...}
+BODY = 'body'                # {'article': 'L111-1' ou None, 'path': ...}
+
+
+def parse_code_file(path, buffering=-1):
+    """Générateur d'enregistrements pour un fichier de code.
+
+    Chaque enregistrement contient 'kind', 'offset' (octet de début de ligne), 'line' (numéro
+    de ligne, à partir de 1) et 'text' (ligne brute, fin de ligne comprise) en plus des champs
+    propres à son type. Les lignes vides ne produisent rien. `buffering` est la taille du tampon
+    de lecture (celle par défaut de open() si -1).
+    """
+    headings = []          # [(niveau, titre)] du titre courant et de ses parents
+    article = None
+    offset = 0
+    frontmatter = None     # dict en cours de lecture, None hors en-tête
+    with open(path, 'rb', buffering=buffering) as fin:
+        for lineno, raw in enumerate(fin, 1):
+            start, offset = offset, offset + len(raw)
+            text = raw.decode('utf-8')
+            stripped = text.strip()
+
+            if lineno == 1 and stripped == '---':
+                frontmatter = {}
+                continue
+            if frontmatter is not None:
+                if stripped == '---':
+                    yield {'kind': FRONTMATTER, 'offset': 0, 'line': 1, 'text': '', 'data': frontmatter}
+                    frontmatter = None
+                elif ':' in stripped:
+                    key, value = stripped.split(':', 1)
+                    frontmatter[key.strip()] = value.strip()
+                continue
+
+            if text.startswith('#'):
+                level = len(text) - len(text.lstrip('#'))
+                title = text.strip('# \r\n')
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, title))
+                article = None
+                yield {'kind': HEADING, 'offset': start, 'line': lineno, 'text': text,
+                       'level': level, 'title': title, 'path': tuple(t for _, t in headings)}
+                continue
+            if not stripped:
+                continue
+
+            m = RE_ARTICLE_HEADER.match(stripped)
+            if m:
+                article = m.group('num')
+                yield {'kind': ARTICLE, 'offset': start, 'line': lineno, 'text': text,
+                       'num': article, 'path': tuple(t for _, t in headings)}
+            else:
+                yield {'kind': BODY, 'offset': start, 'line': lineno, 'text': text,
+                       'article': article, 'path': tuple(t for _, t in headings)}
+
+    # En-tête jamais refermé : on le rend quand même
+    if frontmatter is not None:
+        yield {'kind': FRONTMATTER, 'offset': 0, 'line': 1, 'text': '', 'data': frontmatter}
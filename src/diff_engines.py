@@ -0,0 +1,375 @@
+# Test différentiel : un moteur de référence figé et un moteur candidat sur tout le corpus.
+#   python src/diff_engines.py --jobs 4
+#   python src/diff_engines.py --reference-rev v1 --candidate src.fast_engine:LegalEngine --jorf-only
+#   python src/diff_engines.py --corpus data/processed/corpus_brut.jsonl --jobs 8
+#
+# Par défaut, la référence est LegalEngine tel qu'il est dans le commit HEAD (src/ est extrait
+# dans data/diff/ref-<sha>/ puis importé à part) et le candidat est LegalEngine de l'arbre de
+# travail : on vérifie qu'une optimisation en cours ne change aucun lien. --reference-rev ""
+# compare deux classes de l'arbre de travail (--reference et --candidate, "module:Classe"). Le
+# module d'un moteur fournit aussi inject_links ; DocumentContext, extract_windowed et le compteur
+# budget_exceeded (ou slow_lines) sont facultatifs (une révision antérieure, ex. --reference-rev a0aee32, n'a que extract(text, meta) :
+# chaque paragraphe y est extrait seul, d'un seul tenant).
+#
+# Chaque paragraphe est extrait par les deux moteurs, dans les mêmes conditions que le site
+# (contexte du document, extraction fenêtrée pour le JORF) ; on compare les entités, puis le html
+# produit par inject_links. Les différences sont classées :
+#   absente        entité de la référence sans équivalent (même span, même tag) chez le candidat
+#   ajoutée        entité du candidat sans équivalent dans la référence
+#   champ:<clé>    même span et même tag, valeur différente (article, code, livre, range...)
+#   html           mêmes entités, html différent
+#   budget         un des moteurs a dépassé LINE_MATCH_BUDGET (détecteur simplifié) : non compté
+#                  comme une vraie différence, la ligne est seulement signalée
+#
+# Une tâche par fichier (ou bloc du corpus), en parallèle avec --jobs. Le résultat de chaque tâche
+# est écrit dans <out>/results/<nom>.json dès qu'elle finit : une exécution interrompue reprend
+# là où elle s'était arrêtée (les tâches dont l'entrée n'a pas changé ne sont pas refaites ;
+# --fresh efface les résultats). L'identité d'une exécution comprend l'empreinte de chaque moteur
+# (LegalEngine.fingerprint(), source du module et des modules du paquet qu'il importe, cf. engine_fingerprint) : modifier le code d'un
+# des moteurs entre deux exécutions fait recalculer les résultats, même à spec et révision égales. <out>/rapport.json reprend, pour chaque fichier, la première
+# ligne et la première entité qui diffèrent, et le décompte des différences par type.
+
+import io
+import ast
+import hashlib
+import inspect
+import sys
+import json
+import time
+import tarfile
+import argparse
+import importlib
+import subprocess
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_DIR))
+import src.generate_full_site as site
+from src.generate_full_site import BASE_DIR, select_inputs, parse_years, iter_jorf_texts
+from src.code_parser import parse_code_file, HEADING, BODY
+from src.extract_jsonl import entity_record, corpus_chunks, iter_corpus_entries, extract_entry
+
+DIR_DIFF = BASE_DIR / "data" / "diff"
+DEFAULT_ENGINE = "src.generate_full_site:LegalEngine"
+
+
+def freeze_revision(rev, out_dir=DIR_DIFF):
+    # Extrait src/ tel qu'il est dans la révision `rev` ; renvoie (sha, dossier racine)
+    sha = subprocess.run(["git", "rev-parse", "--verify", rev + "^{commit}"], cwd=REPO_DIR,
+                         capture_output=True, text=True, check=True).stdout.strip()
+    root = out_dir / f"ref-{sha[:12]}"
+    if not (root / "src").exists():
+        archive = subprocess.run(["git", "archive", "--format=tar", sha, "src"], cwd=REPO_DIR,
+                                 capture_output=True, check=True).stdout
+        tmp = out_dir / f"ref-{sha[:12]}.tmp"
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tmp)
+        tmp.rename(root)
+    return sha, root
+
+
+def load_engine(spec, root=None):
+    # "module:Classe" -> (module, classe). Avec `root`, le module et tout son paquet sont importés
+    # depuis cette copie figée, sans remplacer les modules déjà chargés depuis le dépôt.
+    module_name, _, cls_name = spec.partition(':')
+    if root is None:
+        module = importlib.import_module(module_name)
+        return module, getattr(module, cls_name)
+    pkg = module_name.split('.')[0]
+    owned = lambda k: k == pkg or k.startswith(pkg + '.')
+    live = {k: sys.modules.pop(k) for k in list(sys.modules) if owned(k)}
+    sys.path.insert(0, str(root))
+    importlib.invalidate_caches()
+    try:
+        module = importlib.import_module(module_name)
+    finally:
+        sys.path.remove(str(root))
+        for k in [k for k in sys.modules if owned(k)]:
+            del sys.modules[k]
+        sys.modules.update(live)
+    # Les données restent celles du dépôt (la copie figée ne contient que src/)
+    for name in dir(site):
+        if (name == 'BASE_DIR' or name.startswith('DIR_')) and hasattr(module, name):
+            setattr(module, name, getattr(site, name))
+    return module, getattr(module, cls_name)
+
+
+def module_sources(module):
+    # Fichier du module et, de proche en proche, ceux des modules de son paquet qu'il importe (lus
+    # dans ses sources à lui : une référence figée importe les siens depuis sa copie, où
+    # inspect.getmodule() retrouverait ceux du dépôt). Les modules hors du paquet ne comptent pas.
+    path = Path(inspect.getfile(module))
+    if not module.__package__:
+        return [path]
+    pkg = module.__name__.split('.')[0]
+    root = path.parents[module.__name__.count('.')]
+    seen, todo = set(), [(module.__name__, path)]
+    while todo:
+        name, f = todo.pop()
+        if f in seen:
+            continue
+        seen.add(f)
+        package = name.rpartition('.')[0]
+        for node in ast.walk(ast.parse(f.read_bytes())):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    parent = package.rsplit('.', node.level - 1)[0] if node.level > 1 else package
+                    base = f"{parent}.{base}" if base else parent
+                names = [base] + [f"{base}.{a.name}" for a in node.names]
+            else:
+                continue
+            for imported in names:
+                if imported.split('.')[0] != pkg:
+                    continue
+                target = root.joinpath(*imported.split('.')).with_suffix(".py")
+                if target.exists():
+                    todo.append((imported, target))
+    return sorted(seen)
+
+
+def engine_fingerprint(module, engine):
+    # Empreinte d'un moteur : son fingerprint() s'il en a un, plus les sources de son module et des
+    # modules du paquet qu'il importe (module_sources)
+    h = hashlib.sha1()
+    if hasattr(engine, 'fingerprint'):
+        h.update(engine.fingerprint().encode('utf-8'))
+    for f in module_sources(module):
+        h.update(f"{f.name}:".encode('utf-8'))
+        h.update(f.read_bytes())
+    return h.hexdigest()
+
+
+class Side:
+    """Un moteur et le module qui l'accompagne (inject_links, DocumentContext s'il existe)."""
+
+    def __init__(self, spec, root=None):
+        self.module, cls = load_engine(spec, root)
+        self.engine = cls()
+        self.fingerprint = engine_fingerprint(self.module, self.engine)
+        # Moteur antérieur au contexte du document ou à l'extraction fenêtrée : extract(text, meta) seul
+        self.context_cls = getattr(self.module, 'DocumentContext', None)
+        self.windowed = hasattr(self.engine, 'extract_windowed')
+        self.context = None
+
+    def new_context(self):
+        self.context = self.context_cls() if self.context_cls is not None else None
+
+    def see_heading(self, title):
+        if self.context is not None:
+            self.context.see_heading(title)
+
+    def budget_exceeded(self):
+        # Lignes passées par le détecteur simplifié ; avant le compteur, slow_lines les gardait toutes
+        if hasattr(self.engine, 'budget_exceeded'):
+            return self.engine.budget_exceeded
+        return len(getattr(self.engine, 'slow_lines', ()))
+
+    def run(self, text, meta):
+        # (entités, html, détecteur simplifié utilisé ?)
+        slow = self.budget_exceeded()
+        if self.context is not None:
+            meta = dict(meta, context=self.context)
+        ents = extract_entry(self.engine, text, meta) if self.windowed else self.engine.extract(text, dict(meta))
+        html = self.module.inject_links(text, ents)
+        return [entity_record(e) for e in ents], html, self.budget_exceeded() > slow
+
+
+def classify(ref, cand):
+    # [(type, entité de référence, entité candidate)] triés par position
+    key = lambda e: (tuple(e['span']), e['tag'])
+    ref_by, cand_by = {key(e): e for e in ref}, {key(e): e for e in cand}
+    diffs = []
+    for k in sorted(ref_by.keys() | cand_by.keys()):
+        r, c = ref_by.get(k), cand_by.get(k)
+        if c is None:
+            diffs.append(("absente", r, None))
+        elif r is None:
+            diffs.append(("ajoutée", None, c))
+        else:
+            diffs.extend((f"champ:{f}", r, c) for f in sorted(r.keys() | c.keys()) if r.get(f) != c.get(f))
+    return diffs
+
+
+def iter_units(kind, args):
+    # (numéro de ligne, texte, meta, nouveau contexte ?, titre de section ou None)
+    if kind == 'CODE':
+        f = args[0]
+        meta = {'source': f.name, 'type': 'CODE'}
+        yield None, None, meta, True, None
+        for rec in parse_code_file(f):
+            if rec['kind'] == HEADING:
+                yield None, None, meta, False, rec['title']
+            elif rec['kind'] == BODY:
+                yield rec['line'], rec['text'], meta, False, None
+    elif kind == 'JORF':
+        meta = {'source': args[0].name, 'type': 'JORF'}
+        for line, text in enumerate(iter_jorf_texts(args[0]), 1):
+            yield line, text, meta, True, None
+    else:
+        # Le découpage en contextes est celui de extract_jsonl : un nouvel objet contexte = nouveau document
+        previous = None
+        for line, text, meta in iter_corpus_entries(*args):
+            context = meta.pop('context')
+            yield line, text, meta, context is not previous, None
+            previous = context
+
+
+def input_signature(kind, args):
+    # Ce qui identifie l'entrée d'une tâche, pour la reprise
+    st = args[0].stat()
+    return [str(args[0]), st.st_size, st.st_mtime_ns, *args[1:]]
+
+
+# Moteurs propres à chaque processus (créés une fois par worker)
+_WORKER = {}
+
+def init_worker(reference, candidate, reference_root=None):
+    _WORKER['sides'] = (Side(reference, reference_root), Side(candidate))
+    _WORKER['fingerprints'] = {'reference': _WORKER['sides'][0].fingerprint, 'candidate': _WORKER['sides'][1].fingerprint}
+
+def compare_one(name, kind, args):
+    ref, cand = _WORKER['sides']
+    t0 = time.perf_counter()
+    kinds, first, paragraphs, differing, budget = Counter(), None, 0, 0, []
+    for line, text, meta, fresh, heading in iter_units(kind, args):
+        if fresh:
+            ref.new_context(); cand.new_context()
+        if heading is not None:
+            ref.see_heading(heading); cand.see_heading(heading)
+        if text is None:
+            continue
+        if kind == 'JORF':
+            # Chaque ligne du JORF a son propre contexte (render_jorf_text)
+            ref.new_context(); cand.new_context()
+        paragraphs += 1
+        r_ents, r_html, r_slow = ref.run(text, meta)
+        c_ents, c_html, c_slow = cand.run(text, meta)
+        if r_ents == c_ents and r_html == c_html:
+            continue
+        if r_slow or c_slow:
+            kinds["budget"] += 1
+            budget.append(line)
+            continue
+        diffs = classify(r_ents, c_ents) or [("html", None, None)]
+        differing += 1
+        kinds.update(k for k, _, _ in diffs)
+        if first is None:
+            k, r, c = diffs[0]
+            first = {'line': line, 'text': text[:300], 'type': k, 'reference': r, 'candidate': c}
+            if k == "html":
+                first.update(reference=r_html[:500], candidate=c_html[:500])
+    return {'name': name, 'input': input_signature(kind, args), 'fingerprints': _WORKER['fingerprints'], 'paragraphs': paragraphs,
+            'differing': differing, 'kinds': dict(kinds), 'first': first, 'budget_lines': budget[:20],
+            'seconds': round(time.perf_counter() - t0, 3)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare un moteur candidat à un moteur de référence figé, paragraphe par paragraphe.")
+    parser.add_argument("--reference", default=DEFAULT_ENGINE, metavar="MODULE:CLASSE", help="moteur de référence")
+    parser.add_argument("--reference-rev", default="HEAD", metavar="RÉVISION",
+                        help="révision git d'où importer la référence (\"\" : arbre de travail)")
+    parser.add_argument("--candidate", default=DEFAULT_ENGINE, metavar="MODULE:CLASSE", help="moteur candidat (arbre de travail)")
+    parser.add_argument("--corpus", type=Path, help="comparer sur corpus_brut.jsonl au lieu des codes et du JORF")
+    parser.add_argument("--codes", nargs="+", metavar="NOM", help="noms de fichiers de codes sans extension (ex: civil penal)")
+    parser.add_argument("--years", type=parse_years, metavar="ANNÉES", help="années du JORF : 2010, 2010-2015 ou 2008,2010-2012")
+    parser.add_argument("--glob", dest="pattern", metavar="MOTIF", help="motif sur le nom de fichier (ex: 'jorf_201*')")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--codes-only", action="store_true", help="ne traiter que les codes")
+    group.add_argument("--jorf-only", action="store_true", help="ne traiter que le JORF")
+    parser.add_argument("--out", type=Path, default=DIR_DIFF, help="dossier des résultats")
+    parser.add_argument("--fresh", action="store_true", help="ignorer les résultats d'une exécution précédente")
+    parser.add_argument("--jobs", type=int, default=1, help="nombre de processus")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.corpus:
+        if not args.corpus.exists():
+            print(f"Corpus introuvable : {args.corpus}")
+            return
+        tasks = [(f"corpus_{i:05d}", 'CORPUS', (args.corpus, *chunk)) for i, chunk in enumerate(corpus_chunks(args.corpus))]
+    else:
+        code_files, jorf_files = select_inputs(set(args.codes or ()), args.years,
+                                               args.pattern, args.codes_only, args.jorf_only)
+        tasks = [(f.stem, 'CODE', (f,)) for f in code_files] + [(f.stem, 'JORF', (f,)) for _, f in jorf_files]
+    if not tasks:
+        print("Aucun fichier ne correspond aux sélecteurs.")
+        return
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    sha, root = freeze_revision(args.reference_rev, args.out) if args.reference_rev else (None, None)
+    # Les moteurs sont chargés ici pour leurs empreintes (et servent tels quels sans --jobs)
+    worker_args = (args.reference, args.candidate, root)
+    init_worker(*worker_args)
+    run = {'reference': args.reference, 'reference_rev': sha, 'candidate': args.candidate,
+           'fingerprints': _WORKER['fingerprints']}
+    results_dir = args.out / "results"
+    run_path = args.out / "run.json"
+    previous = json.loads(run_path.read_text(encoding='utf-8')) if run_path.exists() else None
+    if args.fresh or previous != run:
+        if previous is not None and not args.fresh:
+            print("⚠️ Moteurs différents de l'exécution précédente : ses résultats sont ignorés.")
+        for old in results_dir.glob("*.json"):
+            old.unlink()
+    results_dir.mkdir(parents=True, exist_ok=True)
+    run_path.write_text(json.dumps(run, ensure_ascii=False, indent=1), encoding='utf-8')
+
+    results, todo = {}, []
+    for name, kind, a in tasks:
+        path = results_dir / f"{name}.json"
+        if path.exists():
+            res = json.loads(path.read_text(encoding='utf-8'))
+            if res['input'] == input_signature(kind, a) and res.get('fingerprints') == run['fingerprints']:
+                results[name] = res
+                continue
+        todo.append((name, kind, a))
+    if results:
+        print(f"🔁 {len(results)} tâches reprises de l'exécution précédente, {len(todo)} restantes.")
+    print(f"🔎 Référence : {args.reference}" + (f" @ {sha[:12]}" if sha else "") + f" — candidat : {args.candidate}")
+
+    def done(res):
+        with open(results_dir / f"{res['name']}.json", 'w', encoding='utf-8') as fout:
+            json.dump(res, fout, ensure_ascii=False)
+        results[res['name']] = res
+        mark = "✅" if not res['differing'] else "⚠️"
+        print(f"{mark} {res['name']} : {res['paragraphs']} paragraphes, {res['differing']} différents ({res['seconds']:.1f}s)")
+
+    t0 = time.perf_counter()
+    if args.jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=worker_args) as pool:
+            for fut in as_completed([pool.submit(compare_one, *t) for t in todo]):
+                done(fut.result())
+    else:
+        for t in todo:
+            done(compare_one(*t))
+
+    # Rapport dans l'ordre des tâches
+    ordered = [results[name] for name, _, _ in tasks]
+    kinds = Counter()
+    for res in ordered:
+        kinds.update(res['kinds'])
+    report = {**run, 'paragraphs': sum(r['paragraphs'] for r in ordered),
+              'differing': sum(r['differing'] for r in ordered), 'kinds': dict(kinds.most_common()),
+              'files': [{k: r[k] for k in ('name', 'paragraphs', 'differing', 'kinds', 'first', 'budget_lines')}
+                        for r in ordered if r['differing'] or r['budget_lines']]}
+    with open(args.out / "rapport.json", 'w', encoding='utf-8') as fout:
+        json.dump(report, fout, ensure_ascii=False, indent=1)
+
+    for f in report['files']:
+        first = f['first']
+        if first:
+            print(f"🔍 {f['name']} ligne {first['line']} ({first['type']}) : {first['reference']} -> {first['candidate']}")
+    summary = ", ".join(f"{k} {n}" for k, n in kinds.most_common()) or "aucune"
+    print(f"📄 {report['differing']} paragraphes différents sur {report['paragraphs']} ({summary}) "
+          f"en {time.perf_counter() - t0:.1f}s — {args.out / 'rapport.json'}")
+    return report['differing']
+
+
+if __name__ == "__main__":
+    main()
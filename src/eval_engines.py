@@ -0,0 +1,211 @@
+# Évaluation des moteurs d'extraction sur un jeu annoté : précision/rappel/F1 et débit, dans un
+# même tableau.
+#   python src/eval_engines.py
+#   python src/eval_engines.py --engines legal ner --model "echec 2/output/model-trained-v2" --repeat 20
+#   python src/eval_engines.py --gold training_data.json --match exact
+#
+# Chaque moteur est vu à travers la même interface : spans(texts) -> [[(début, fin, tag, lié)], ...],
+# avec des tags communs (ART, CODE, LOI, ALINEA). "legal" est LegalEngine, "ner" est
+# LegalReferenceLinker (echec 2/inference_and_linking.py). `lié` indique si l'entité devient un lien
+# utilisable : pour LegalEngine, une entité retenue par linked_entities, pour le moteur ner, une
+# détection rendue en <a data> dont la cible n'est pas "inconnu".
+#
+# Deux étapes sont évaluées séparément :
+#   détection  toutes les entités trouvées, y compris un article dont le code reste INCONNU ;
+#   liaison    seulement celles qui deviennent des liens. Un article détecté mais non relié compte
+#              donc comme juste en détection et comme manqué en liaison.
+#
+# Jeux annotés acceptés :
+#   - annotation_examples.json (data_explorer.py) : les "complete_refs", dont les articles et
+#     lois listés sont recherchés dans le texte ;
+#   - le format d'entraînement spaCy [[texte, {"entities": [[début, fin, label], ...]}], ...]
+#     (annotation_builder.py).
+# Seuls les tags présents dans le jeu annoté sont évalués. Les moteurs n'ont pas la même
+# convention de bornes ("article L. 111-1 " pour LegalEngine, "L. 111-1" dans le jeu) : par défaut
+# une prédiction est juste si elle chevauche une annotation du même tag (--match exact : mêmes
+# bornes, aux espaces près).
+#
+# Le débit (lignes/s) est mesuré sur --repeat passes sans tracemalloc ; le pic mémoire est mesuré
+# sur une passe séparée (tracemalloc, allocations Python et numpy).
+
+import re
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.generate_full_site import LegalEngine, DocumentContext, BASE_DIR, linked_entities
+from src.extract_jsonl import extract_entry
+
+DIR_ECHEC2 = BASE_DIR / "echec 2"
+
+# Labels des jeux annotés et des modèles -> tags communs
+LABEL_TAGS = {
+    'ARTICLE_NUM': 'ART', 'ID_ART': 'ART',
+    'CODE_NAME': 'CODE',
+    'LOI_NAME': 'LOI', 'LOI_NUM': 'LOI', 'ID_LOI': 'LOI',
+    'ALINEA_NUM': 'ALINEA',
+}
+
+
+def load_gold(path):
+    # [(texte, [(début, fin, tag)])]
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    gold = []
+    if isinstance(data, dict):
+        for ref in data.get('complete_refs', []):
+            text, spans = ref['text'], set()
+            for tag, key in (('ART', 'articles'), ('LOI', 'lois')):
+                for value in set(ref.get(key) or ()):
+                    spans.update((m.start(), m.end(), tag) for m in re.finditer(re.escape(value), text))
+            gold.append((text, sorted(spans)))
+    else:
+        for text, annot in data:
+            gold.append((text, sorted((s, e, LABEL_TAGS.get(label, label)) for s, e, label in annot['entities'])))
+    return gold
+
+
+class LegalEngineAdapter:
+    name = "legal"
+
+    def __init__(self, args):
+        self.engine = LegalEngine()
+
+    def spans(self, texts):
+        out = []
+        for text in texts:
+            # Chaque texte est traité comme une ligne du JORF (extraction fenêtrée, contexte propre)
+            ents = extract_entry(self.engine, text, {'type': 'JORF', 'context': DocumentContext()})
+            linked = {id(e) for e, _ in linked_entities(ents)}
+            out.append([(*e['span'], e['tag'], id(e) in linked) for e in ents])
+        return out
+
+
+class NerLinkerAdapter:
+    name = "ner"
+
+    def __init__(self, args):
+        sys.path.insert(0, str(DIR_ECHEC2))
+        from inference_and_linking import LegalReferenceLinker
+        self.linker = LegalReferenceLinker(str(args.model), batch_size=args.batch_size)
+        if self.linker.nlp is None:
+            print(f"⚠️ Modèle introuvable ({args.model}) : le moteur ner n'utilise que ses regexps.")
+
+    def spans(self, texts):
+        return [[(s, e, LABEL_TAGS.get(label, label), link.startswith('<a data=') and 'inconnu' not in link)
+                 for s, e, label, link in found]
+                for found in self.linker.detect_texts(texts, with_links=True)]
+
+
+ENGINES = {a.name: a for a in (LegalEngineAdapter, NerLinkerAdapter)}
+STAGES = ('détection', 'liaison')
+
+
+def strip_span(text, start, end):
+    # Bornes sans les espaces de début et de fin
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def score(gold, predicted, tags, match="overlap", linked_only=False):
+    # {tag: [vrais positifs, prédictions, annotations]} ; une annotation est appariée au plus une fois.
+    # Avec linked_only, seules les prédictions qui deviennent des liens comptent (étape liaison).
+    counts = {tag: [0, 0, 0] for tag in tags}
+    for (text, gold_spans), pred_spans in zip(gold, predicted):
+        pred_spans = [(*strip_span(text, s, e), tag) for s, e, tag, linked in pred_spans
+                      if tag in counts and (linked or not linked_only)]
+        gold_spans = [(*strip_span(text, s, e), tag) for s, e, tag in gold_spans]
+        used = set()
+        for s, e, tag in pred_spans:
+            counts[tag][1] += 1
+            for i, (gs, ge, gtag) in enumerate(gold_spans):
+                if i in used or gtag != tag:
+                    continue
+                if (gs, ge) == (s, e) if match == "exact" else (gs < e and s < ge):
+                    used.add(i)
+                    counts[tag][0] += 1
+                    break
+        for _, _, tag in gold_spans:
+            counts[tag][2] += 1
+    return counts
+
+
+def prf(tp, n_pred, n_gold):
+    p = tp / n_pred if n_pred else 0.0
+    r = tp / n_gold if n_gold else 0.0
+    return p, r, (2 * p * r / (p + r) if p + r else 0.0)
+
+
+def evaluate(adapter, gold, tags, repeat=5, match="overlap"):
+    texts = [text for text, _ in gold]
+    predicted = adapter.spans(texts)    # passe de chauffe (chargements paresseux, caches)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        adapter.spans(texts)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    adapter.spans(texts)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'counts': {stage: score(gold, predicted, tags, match, linked_only=stage == 'liaison') for stage in STAGES},
+            'lines_per_s': len(texts) * repeat / elapsed if elapsed else 0.0,
+            'peak_mb': peak / 2**20}
+
+
+def print_table(results, tags):
+    print(f"{'moteur':<8} {'étape':<10} {'tag':<8} {'P':>6} {'R':>6} {'F1':>6} {'vp/préd/annot':>15} {'lignes/s':>10} {'pic Mo':>8}")
+    for name, res in results.items():
+        for k, stage in enumerate(STAGES):
+            rows = [(tag, res['counts'][stage][tag]) for tag in tags]
+            rows.append(("total", [sum(c[i] for _, c in rows) for i in range(3)]))
+            for j, (tag, (tp, n_pred, n_gold)) in enumerate(rows):
+                p, r, f1 = prf(tp, n_pred, n_gold)
+                first = k == 0 and j == 0
+                perf = f"{res['lines_per_s']:>10.0f} {res['peak_mb']:>8.1f}" if first else ""
+                print(f"{name if first else '':<8} {stage if j == 0 else '':<10} {tag:<8} {p:>6.3f} {r:>6.3f} {f1:>6.3f} "
+                      f"{f'{tp}/{n_pred}/{n_gold}':>15} {perf}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare les moteurs d'extraction sur un jeu annoté (P/R/F1, débit, mémoire).")
+    parser.add_argument("--gold", type=Path, default=DIR_ECHEC2 / "annotation_examples.json", help="jeu annoté (json)")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=["legal"], help="moteurs à évaluer")
+    parser.add_argument("--model", type=Path, default=DIR_ECHEC2 / "output" / "model-trained-v2", help="modèle spaCy du moteur ner")
+    parser.add_argument("--batch-size", type=int, default=64, help="taille des lots nlp.pipe du moteur ner")
+    parser.add_argument("--match", choices=["overlap", "exact"], default="overlap", help="appariement des spans")
+    parser.add_argument("--repeat", type=int, default=5, help="passes chronométrées pour le débit")
+    parser.add_argument("--json", type=Path, help="écrire aussi les résultats dans ce fichier")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.gold.exists():
+        print(f"Jeu annoté introuvable : {args.gold}")
+        return
+    gold = load_gold(args.gold)
+    tags = sorted({tag for _, spans in gold for _, _, tag in spans})
+    print(f"📄 {len(gold)} textes, {sum(len(s) for _, s in gold)} annotations ({', '.join(tags)}) dans {args.gold.name}")
+
+    results = {}
+    for name in args.engines:
+        t0 = time.perf_counter()
+        adapter = ENGINES[name](args)
+        print(f"✅ Moteur {name} chargé en {time.perf_counter() - t0:.1f}s")
+        results[name] = evaluate(adapter, gold, tags, max(1, args.repeat), args.match)
+    print_table(results, tags)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fout:
+            json.dump({'gold': str(args.gold), 'match': args.match, 'results': results}, fout, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# Extraction seule : les entités de LegalEngine sont écrites en JSONL, sans générer de html.
+#   python src/extract_jsonl.py --out data/entities --jobs 4
+#   python src/extract_jsonl.py --codes civil --out data/entities
+#   python src/extract_jsonl.py --corpus data/processed/corpus_brut.jsonl --out data/entities --jobs 4
+#
+# Un enregistrement par paragraphe (corps d'article pour un code, ligne retenue pour le JORF,
+# ligne du corpus) :
+#   {"source": "civil.md", "type": "CODE", "line": 12, "article": "1240",
+#    "entities": [{"tag": "ART", "article": "1241", "code": "civil", "livre": "INCONNU", "parent_tag": null, "span": [10, 22]}]}
+# "line" est le numéro de ligne du markdown, le rang du texte dans le csv du JORF ou le numéro de
+# ligne dans corpus_brut.jsonl. L'extraction est la même que celle du site (contexte du document,
+# mode fenêtré pour les longues lignes du JORF), à une différence près pour le corpus : il ne garde
+# que le texte des paragraphes, sans les titres, donc le contexte d'un code n'y est pas remis à zéro
+# à chaque titre (DocumentContext.see_heading) mais seulement quand la source change. Une référence
+# peut donc y être reprise au-delà d'un titre, là où le site la perdrait.
+#
+# Chaque tâche (un fichier source, ou un bloc de lignes du corpus) écrit ses propres fichiers
+# <nom>-00000.jsonl, <nom>-00001.jsonl... d'au plus --shard-records enregistrements : les
+# processus n'écrivent jamais dans le même fichier. manifest.json liste les fichiers produits.
+# Les blocs du corpus ne sont coupés qu'entre deux documents (corpus_chunks) : les entités ne
+# dépendent pas de la taille des blocs.
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.generate_full_site import (LegalEngine, DocumentContext, BASE_DIR, iter_jorf_texts,
+                                    select_inputs, parse_years)
+from src.code_parser import parse_code_file, HEADING, BODY
+
+DIR_ENTITIES = BASE_DIR / "data" / "entities"
+CORPUS_CHUNK_LINES = 20000
+
+
+def entity_record(e):
+    # Entité du moteur -> dictionnaire JSON compact (span en liste, clés internes retirées)
+    rec = {k: v for k, v in e.items() if k != 'span'}
+    rec['span'] = list(e['span'])
+    return rec
+
+
+def iter_code_paragraphs(f, engine):
+    meta = {'source': f.name, 'type': 'CODE', 'context': DocumentContext()}
+    for rec in parse_code_file(f):
+        if rec['kind'] == HEADING:
+            meta['context'].see_heading(rec['title'])
+        elif rec['kind'] == BODY:
+            ents = engine.extract(rec['text'], meta)
+            yield {'source': f.name, 'type': 'CODE', 'line': rec['line'], 'article': rec['article'],
+                   'entities': [entity_record(e) for e in ents]}
+
+
+def iter_jorf_paragraphs(f, engine):
+    meta = {'source': f.name, 'type': 'JORF'}
+    for line, text in enumerate(iter_jorf_texts(f), 1):
+        # Chaque ligne du JORF est un texte distinct : elle a son propre contexte.
+        ents = engine.extract_windowed(text, dict(meta, context=DocumentContext()))
+        yield {'source': f.name, 'type': 'JORF', 'line': line, 'entities': [entity_record(e) for e in ents]}
+
+
+def document_key(entry):
+    # Lignes qui partagent un contexte (même code) -> même clé ; None pour une ligne du JORF, seule dans le sien
+    meta = entry.get('meta') or {}
+    return ('CODE', meta.get('source')) if meta.get('type') == 'CODE' else None
+
+
+def corpus_chunks(path, lines_per_chunk=CORPUS_CHUNK_LINES):
+    # Découpe corpus_brut.jsonl en blocs d'au moins lines_per_chunk lignes : [(octet de début, octet
+    # de fin, numéro de la 1re ligne)]. Un bloc plein n'est coupé qu'avant une ligne qui commence un
+    # nouveau document : les lignes d'un même code restent dans le même bloc, et le contexte qu'elles
+    # partagent est le même quelle que soit la taille des blocs. Seules les lignes lues au-delà du
+    # seuil sont décodées.
+    chunks, start, first, n, pos, size, last = [], 0, 1, 0, 0, 0, None
+    with open(path, 'rb') as fin:
+        for raw in fin:
+            if size >= lines_per_chunk:
+                key = document_key(json.loads(raw))
+                if key is None or key != last:
+                    chunks.append((start, pos, first))
+                    start, first, size = pos, n + 1, 0
+                last = key
+            pos += len(raw)
+            n += 1
+            size += 1
+            if size == lines_per_chunk:
+                last = document_key(json.loads(raw))
+    if pos > start:
+        chunks.append((start, pos, first))
+    return chunks
+
+
+def iter_corpus_entries(path, start, end, first_line):
+    # (numéro de ligne, texte, meta) pour les lignes d'un bloc de corpus_brut.jsonl.
+    # Les lignes d'un même code se suivent dans le corpus : elles partagent le contexte du document
+    # tant que la source ne change pas (faute de titres, voir l'en-tête). Un bloc commence toujours
+    # au début d'un document (corpus_chunks). Chaque ligne du JORF a son propre contexte, comme sur le site.
+    context, source = None, None
+    with open(path, 'rb') as fin:
+        fin.seek(start)
+        line = first_line
+        while fin.tell() < end:
+            raw = fin.readline()
+            if not raw:
+                break
+            entry = json.loads(raw)
+            meta = dict(entry.get('meta') or {})
+            if meta.get('type') == 'CODE':
+                if meta.get('source') != source:
+                    context, source = DocumentContext(), meta.get('source')
+                meta['context'] = context
+            else:
+                source = None
+                meta['context'] = DocumentContext()
+            yield line, entry['text'], meta
+            line += 1
+
+
+def iter_source_entries(kind, f):
+    # (numéro de ligne, texte, meta) des paragraphes d'un code ou d'un csv du JORF, tels que le site
+    # les rend : corps des articles avec un contexte remis à zéro à chaque titre, texte retenu de
+    # chaque ligne du JORF (iter_jorf_texts) avec son propre contexte.
+    if kind == 'CODE':
+        meta = {'source': f.name, 'type': 'CODE', 'context': DocumentContext()}
+        for rec in parse_code_file(f):
+            if rec['kind'] == HEADING:
+                meta['context'].see_heading(rec['title'])
+            elif rec['kind'] == BODY:
+                yield rec['line'], rec['text'], meta
+    else:
+        for line, text in enumerate(iter_jorf_texts(f), 1):
+            yield line, text, {'source': f.name, 'type': 'JORF', 'context': DocumentContext()}
+
+
+def extract_entry(engine, text, meta):
+    # Même appel que le site : extraction simple pour un code, fenêtrée pour le JORF
+    if meta.get('type') == 'CODE':
+        return engine.extract(text, meta)
+    return engine.extract_windowed(text, meta)
+
+
+def iter_corpus_paragraphs(path, start, end, first_line, engine):
+    for line, text, meta in iter_corpus_entries(path, start, end, first_line):
+        ents = extract_entry(engine, text, meta)
+        yield {'source': meta.get('source'), 'type': meta.get('type'), 'line': line,
+               'entities': [entity_record(e) for e in ents]}
+
+
+class ShardWriter:
+    # Écrit les enregistrements dans <nom>-00000.jsonl, <nom>-00001.jsonl... (au plus max_records par fichier)
+    def __init__(self, out_dir, name, max_records):
+        self.out_dir = out_dir
+        self.name = name
+        self.max_records = max_records
+        self.shards = []    # [(nom de fichier, nombre d'enregistrements)]
+        self._fout = None
+        self._count = 0
+
+    def write(self, rec):
+        if self._fout is None or (self.max_records and self._count >= self.max_records):
+            self._next()
+        self._fout.write(json.dumps(rec, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._count += 1
+
+    def _next(self):
+        self._close_current()
+        path = self.out_dir / f"{self.name}-{len(self.shards):05d}.jsonl"
+        self._fout = open(path, 'w', encoding='utf-8')
+        self.shards.append([path.name, 0])
+        self._count = 0
+
+    def _close_current(self):
+        if self._fout is not None:
+            self._fout.close()
+            self.shards[-1][1] = self._count
+            self._fout = None
+
+    def close(self):
+        self._close_current()
+        return [tuple(s) for s in self.shards]
+
+
+# Moteur propre à chaque processus (créé une fois par worker)
+_WORKER = {}
+
+def init_worker():
+    _WORKER['engine'] = LegalEngine()
+
+def extract_one(name, kind, args, out_dir, shard_records):
+    # Une tâche : extrait un fichier (ou un bloc du corpus) et renvoie les fichiers écrits.
+    engine = _WORKER['engine']
+    if kind == 'CODE':
+        records = iter_code_paragraphs(args[0], engine)
+    elif kind == 'JORF':
+        records = iter_jorf_paragraphs(args[0], engine)
+    else:
+        records = iter_corpus_paragraphs(*args, engine)
+    writer = ShardWriter(out_dir, name, shard_records)
+    for rec in records:
+        writer.write(rec)
+    return name, writer.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extrait les entités juridiques en JSONL, sans html.")
+    parser.add_argument("--corpus", type=Path, help="lire corpus_brut.jsonl (data_prep.py) au lieu des codes et du JORF")
+    parser.add_argument("--codes", nargs="+", metavar="NOM", help="noms de fichiers de codes sans extension (ex: civil penal)")
+    parser.add_argument("--years", type=parse_years, metavar="ANNÉES", help="années du JORF : 2010, 2010-2015 ou 2008,2010-2012")
+    parser.add_argument("--glob", dest="pattern", metavar="MOTIF", help="motif sur le nom de fichier (ex: 'jorf_201*')")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--codes-only", action="store_true", help="ne traiter que les codes")
+    group.add_argument("--jorf-only", action="store_true", help="ne traiter que le JORF")
+    parser.add_argument("--out", type=Path, default=DIR_ENTITIES, help="dossier de sortie des fichiers jsonl")
+    parser.add_argument("--shard-records", type=int, default=100000, help="enregistrements maximum par fichier (0 : sans limite)")
+    parser.add_argument("--jobs", type=int, default=1, help="nombre de processus")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.corpus:
+        if not args.corpus.exists():
+            print(f"Corpus introuvable : {args.corpus}")
+            return
+        tasks = [(f"corpus_{i:05d}", 'CORPUS', (args.corpus, *chunk)) for i, chunk in enumerate(corpus_chunks(args.corpus))]
+    else:
+        code_files, jorf_files = select_inputs(set(args.codes or ()), args.years,
+                                               args.pattern, args.codes_only, args.jorf_only)
+        tasks = [(f.stem, 'CODE', (f,)) for f in code_files] + [(f.stem, 'JORF', (f,)) for _, f in jorf_files]
+    if not tasks:
+        print("Aucun fichier ne correspond aux sélecteurs.")
+        return
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+
+    def done(name, shards):
+        manifest[name] = shards
+        print(f"✅ {name} : {sum(n for _, n in shards)} paragraphes.")
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker) as pool:
+            futs = [pool.submit(extract_one, name, kind, a, args.out, args.shard_records) for name, kind, a in tasks]
+            for fut in as_completed(futs):
+                done(*fut.result())
+    else:
+        init_worker()
+        for name, kind, a in tasks:
+            done(*extract_one(name, kind, a, args.out, args.shard_records))
+
+    # Manifeste dans l'ordre des tâches (indépendant de l'ordre de fin des processus)
+    files = [{'file': fname, 'records': n} for name, _, _ in tasks for fname, n in manifest[name]]
+    with open(args.out / "manifest.json", 'w', encoding='utf-8') as fout:
+        json.dump({'files': files, 'records': sum(f['records'] for f in files)}, fout, ensure_ascii=False, indent=1)
+    print(f"📄 {len(files)} fichiers jsonl dans {args.out}")
+
+
+if __name__ == "__main__":
+    main()
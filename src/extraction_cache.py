@@ -0,0 +1,127 @@
+# Cache des fragments html déjà liés, partagé entre les exécutions et entre paragraphes identiques.
+#
+# Les codes et le JORF répètent beaucoup de paragraphes ("Vu le code...", formules types) :
+# on les indexe par hash de (empreinte du moteur, portée, texte). L'empreinte change dès que les
+# regexps ou le code du moteur changent, ce qui invalide tout le cache sans avoir à le vider.
+#
+# Deux niveaux :
+# - un LRU en mémoire, borné en nombre de caractères ;
+# - une base sqlite sur disque, bornée en octets (les entrées les moins récemment utilisées
+#   sont supprimées). sqlite gère le verrouillage : plusieurs processus de build peuvent
+#   lire et écrire la même base en parallèle.
+
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ExtractionCache:
+    def __init__(self, fingerprint, path=None, memory_chars=32 * 1024 * 1024, disk_bytes=512 * 1024 * 1024):
+        self.fingerprint = fingerprint.encode('utf-8')
+        self.memory_chars = memory_chars
+        self.disk_bytes = disk_bytes
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._pending = []      # écritures en attente, envoyées par lots
+        self._touched = set()   # clés lues sur disque dont la date d'accès est à rafraîchir
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), timeout=60, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS fragments (key BLOB PRIMARY KEY, value TEXT, size INTEGER, atime REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS fragments_atime ON fragments(atime)")
+            self._db.commit()
+
+    def key(self, scope, text):
+        h = hashlib.sha1(self.fingerprint)
+        h.update(b'\0' + scope.encode('utf-8') + b'\0')
+        h.update(text.encode('utf-8'))
+        return h.digest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return value
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM fragments WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.hits_disk += 1
+                    self._touched.add(key)
+                    self._remember(key, row[0])
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._pending.append((key, value, len(value.encode('utf-8')), time.time()))
+                if len(self._pending) >= 1000:
+                    self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        return {'hits_memory': self.hits_memory, 'hits_disk': self.hits_disk, 'misses': self.misses}
+
+    def _remember(self, key, value):
+        if key in self._memory:
+            return
+        self._memory[key] = value
+        self._memory_size += len(value)
+        while self._memory_size > self.memory_chars and self._memory:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    def _flush_locked(self):
+        if self._db is None or (not self._pending and not self._touched):
+            return
+        now = time.time()
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO fragments VALUES (?, ?, ?, ?)", self._pending)
+            self._db.executemany("UPDATE fragments SET atime = ? WHERE key = ?", [(now, k) for k in self._touched])
+            self._pending, self._touched = [], set()
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+            if total > self.disk_bytes:
+                self._evict(total)
+
+    def _evict(self, total):
+        # Supprime les entrées les plus anciennes jusqu'à revenir à 90 % de la taille maximale
+        target = total - int(self.disk_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM fragments ORDER BY atime"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self._db.executemany("DELETE FROM fragments WHERE key = ?", doomed)
+
+
+def format_stats(stats):
+    # stats : dictionnaire (ou somme de dictionnaires) renvoyé par ExtractionCache.stats()
+    hits = stats['hits_memory'] + stats['hits_disk']
+    total = hits + stats['misses']
+    rate = 100 * hits / total if total else 0
+    return (f"Cache : {rate:.1f} % de paragraphes déjà connus "
+            f"({stats['hits_memory']} en mémoire, {stats['hits_disk']} sur disque, {stats['misses']} extraits)")
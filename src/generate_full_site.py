@@ -1,8 +1,29 @@
 import re
 import os
+import sys
 import csv
+import json
+import time
+import bisect
+import inspect
+import hashlib
+import argparse
+import fnmatch
+import tracemalloc
 import unicodedata
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.extraction_cache import ExtractionCache, format_stats
+from src.code_parser import parse_code_file, FRONTMATTER, HEADING, ARTICLE, BODY
+from src.article_ids import ArticleIndex
+from src.citation_graph import GraphBuilder, article_node
+from src.link_check import LinkChecker, write_report
+from src.search_index import SearchShard, write_catalog, SEARCH_PAGE
+from src.previews import PreviewSink, write_preview_catalog, preview_key, PREVIEW_SCRIPT
+from src.build_report import FileStats, keep_slowest, rss_peak_mb, build_report, merge_reports, write_build_report, format_report
+from src.pipeline import prefetch, PageWriter, READ_BUFFER
 
 # 1. Configuration pour obtenir les fichiers html avec un peu de css
 
@@ -10,6 +31,19 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DIR_CODES = BASE_DIR / "data" / "codes"
 DIR_JORF = BASE_DIR / "data" / "jorf_2023_1990"
 DIR_OUTPUT = BASE_DIR / "data" / "html"
+DIR_CACHE = BASE_DIR / "data" / "cache"
+DIR_GRAPH = BASE_DIR / "data" / "graph"
+
+# Nombre maximal de correspondances (lois, mentions et numéros d'articles) examinées pour une ligne
+# avant de basculer sur le détecteur simplifié. Chaque correspondance coûte un temps borné : le budget
+# borne donc le temps d'une ligne, sans que le résultat dépende de la charge de la machine.
+LINE_MATCH_BUDGET = 20000
+
+# Mode fenêtré pour les très longues lignes JORF : au-delà de WINDOW_SIZE caractères, le texte est
+# découpé en segments qui se chevauchent de WINDOW_OVERLAP caractères. Le chevauchement doit couvrir
+# les fenêtres de contexte de extract (150, 120 et 600 caractères).
+WINDOW_SIZE = 5000
+WINDOW_OVERLAP = 800
 
 HTML_HEADER = """<!DOCTYPE html>
 <html lang="fr">
@@ -28,15 +62,85 @@ HTML_HEADER = """<!DOCTYPE html>
             padding: 5px 10px; font-size: 11px; border-radius: 4px; margin-top: -30px;
             white-space: nowrap; box-shadow: 0 2px 5px rgba(0,0,0,0.2); z-index: 1000;
         }
+        a[data-preview]:hover::after { content: attr(data-preview); white-space: normal; width: 420px; font-weight: normal; line-height: 1.4; }
+        .article { margin-top: 25px; color: #2c3e50; }
+        .article:target { background: #eaf6ff; }
         .jorf-article { background: white; padding: 20px; margin-bottom: 15px; border-radius: 5px; border-left: 4px solid #2ecc71; box-shadow: 0 1px 3px rgba(0,0,0,0.1); }
     </style>
 </head>
 <body><div class="container">"""
 
-HTML_FOOTER = """</div></body></html>"""
+HTML_FOOTER = PREVIEW_SCRIPT + """</div></body></html>"""
 
 # 2. Définition des regexps
 
+class LineBudgetExceeded(Exception):
+    """Levée quand une ligne dépasse LINE_MATCH_BUDGET pendant l'extraction."""
+
+# Loi identifiée sans ambiguïté : par une année ou un numéro
+RE_LOI_PRECISE = re.compile(r"(?i)\b(?:19|20)\d{2}\b|\bn[°o]\s*\d")
+
+class DocumentContext:
+    """Contexte porté d'une ligne à l'autre d'un même document.
+
+    Retient le dernier code, la dernière loi et le dernier livre rencontrés ainsi que le titre
+    courant. Chaque entité le met à jour en O(1) : on ne relit jamais le texte précédent et on
+    ne garde pas le document en mémoire. Un titre de section remet le contexte à zéro.
+    """
+    __slots__ = ('code', 'code_tag', 'loi', 'livre', 'recent', 'heading')
+
+    def __init__(self):
+        self.code = self.code_tag = self.loi = self.livre = self.recent = self.heading = None
+
+    def copy(self):
+        c = DocumentContext()
+        for k in self.__slots__:
+            setattr(c, k, getattr(self, k))
+        return c
+
+    def see_heading(self, heading):
+        self.code = self.code_tag = self.loi = self.livre = self.recent = None
+        self.heading = heading
+
+    def observe(self, e):
+        tag = e['tag']
+        if tag == 'CODE':
+            self.code, self.code_tag, self.livre, self.recent = e['val'], 'CODE', None, 'CODE'
+        elif tag == 'LOI':
+            self.loi, self.recent = e['val'], 'LOI'
+        elif tag == 'LIVRE':
+            self.livre = e['val']
+        elif tag == 'ART' and e['code'] != "INCONNU":
+            if e.get('parent_tag') == 'LOI':
+                self.loi, self.recent = e['code'], 'LOI'
+            else:
+                self.code, self.code_tag, self.recent = e['code'], e.get('parent_tag'), 'CODE'
+                if e['livre'] != "INCONNU": self.livre = e['livre']
+
+    def resolve(self, kind=None):
+        # (code, livre, parent_tag) pour une anaphore "du même <kind>", ou pour la dernière référence
+        # si kind est None. Dans ce second cas, une loi n'est retenue que si elle est identifiée par
+        # un numéro ou une date ("loi n° 89-1008", pas "convention contraire").
+        if kind is None:
+            kind = 'loi' if self.recent == 'LOI' and self.loi and RE_LOI_PRECISE.search(self.loi) else 'code'
+        if kind == 'code':
+            return (self.code or "INCONNU", self.livre or "INCONNU", self.code_tag) if self.code else ("INCONNU", "INCONNU", None)
+        return (self.loi, "INCONNU", 'LOI') if self.loi else ("INCONNU", "INCONNU", None)
+
+    def key(self):
+        # Ce qui, dans le contexte, peut changer le résultat d'une ligne (pour le cache)
+        return "|".join(x or "" for x in (self.code, self.code_tag, self.loi, self.livre, self.recent))
+
+    def restore(self, key):
+        self.code, self.code_tag, self.loi, self.livre, self.recent = (x or None for x in key.split("|"))
+
+def seen_at(e):
+    # Ordre dans lequel le contexte du document voit les entités : un article à son début, un
+    # parent (code, loi, livre) à sa fin, une fois lu en entier ; à position égale, le parent d'abord.
+    if e['tag'] == 'ART':
+        return e['span'][0], 1
+    return e['span'][1], 0
+
 class LegalEngine:
     def __init__(self):
         self.latin_map = {'premier' : '1', 'bis':'-2','ter':'-3','quater':'-4','quinquies':'-5','sexies':'-6','septies':'-7','octies':'-8','nonies':'-9','decies':'-10', 'undecies':'11'}
@@ -51,13 +155,15 @@ class LegalEngine:
         
         # Regex Code
         fuzzy_names = [self._fuzzy(n) for n in code_names]
-        fuzzy_names.sort(key=len, reverse=True)
+        # ordre total (longueur puis texte) : la regexp, et donc l'empreinte du moteur, ne dépend pas de l'ordre du set
+        fuzzy_names.sort(key=lambda n: (-len(n), n))
         self.re_code = re.compile(r"(?i)\bcode\s+(?:général\s+)?(?:(?:des?|du|de\s+la|de\s+l['’])\s+|d['’]\s*)?(?P<val>" + "|".join(fuzzy_names) + r")\b")
         
         # Regex Sources (Lois, conventions, décrets...)
         # Le mot accord a été enlevé car il apparait dans trop de contextes différents
         # On accepte des dates plus variées (ex: "des 3 et 20 septembre 1792")
         # seulement si le type est précédé d'un espace ou du début de ligne
+        # La borne {1,200} sans motif derrière garde un coût linéaire (pas de retour arrière possible)
         self.re_source = re.compile(
             r"(?i)(?<!\S)(?P<type>loi|décret|ordonnance|arrêté|circulaire|convention|charte|traité)\s+"
             r"(?P<val>[^,;\n\.]{1,200})"
@@ -70,12 +176,62 @@ class LegalEngine:
         # Reconnaît les nombres préfixés par "article(s)"/"art." ou par des lettres types (L, D, R, A)
         # Autorise les séparateurs: virgule, point-virgule, 'et', 'à', 'au' (avec ou sans espaces)
         # Autorise également les suffixes latins (bis, ter, quater, ...), attachés ou séparés par un espace
+        # Les quantificateurs possessifs (*+, ++) empêchent le retour arrière sur les longues suites
+        # d'espaces ou de numéros : le temps de scan reste linéaire en la longueur de la ligne.
+        # (l'ancien "(?:-\d+)*" était déjà couvert par "(?:[\.-]\d+)*" et doublait les découpages possibles)
         suffix_keys = sorted(self.latin_map.keys(), key=len, reverse=True)
         suffix_group = r"(?:" + "|".join(re.escape(k) for k in suffix_keys) + r")?"
-        item = r"(?:[LDR]\.?|A\.?|\*)?\s*\d+(?:[\.-]\d+)*(?:-\d+)*(?:\s*" + suffix_group + r")?"
-        self.re_art = re.compile(r"(?i)\b(?:articles?|art\.)\s+(?P<num>" + item + r"(?:\s*(?:,|;|et|à|au)\s*" + item + r")*)")
+        item = r"(?:[LDR]\.?|A\.?|\*)?\s*+\d++(?:[\.-]\d++)*+\s*+" + suffix_group
+        self.re_art = re.compile(r"(?i)\b(?:articles?|art\.)\s+(?P<num>" + item + r"(?:\s*+(?:,|;|et|à|au)\s*+" + item + r")*+)")
+        self.re_art_item = re.compile(r"(?:[LDR]\.?|A\.?|\*)?\s*+\d++(?:[\.-]\d++)*+")
+        self.re_enum_sep = re.compile(r"(?i)\b(?:,|;|et|à|au)\b")
+
+        # Détecteur de secours pour les lignes qui dépassent LINE_MATCH_BUDGET : un seul numéro par mention
+        self.re_art_simple = re.compile(r"(?i)\b(?:articles?|art\.)\s+(?P<num>(?:[LDR]\.?|A\.?|\*)?\s*+\d++(?:[\.-]\d++)*+)")
+
+        self.re_anaphora = re.compile(r"(?i)(?:du|au|le|ce|de\s+la)\s+m[êe]me\s+(?P<kind>code|loi|décret|ordonnance|convention)")
+        # Déterminant juste avant une mention d'article : "l'article 5" cite, "Art. 5." en début de ligne est un intitulé
+        self.re_citing = re.compile(r"(?i)\b(?:l['’]|les|des|aux?|du|dudit|ledit)\s*$")
+        # Code ou loi nommé juste après une mention d'article ("article 5 du code rural", "de la loi du...")
+        self.re_enum_gap = re.compile(r"(?i)\s*(?:,|;|et|ou|à|au)\s*")
+        self.re_named_parent = re.compile(r"(?i)\s*(?:du|des|de\s+la|de\s+l['’]|d['’])\s*(?:code|loi|décret|ordonnance|arrêté|circulaire|convention|charte|traité)\b")
+        self.re_year = re.compile(r"\b(19|20)\d{2}\b")
+        self.re_loi_num = re.compile(r"(?i)n[°o]?\s*\d+")
+
+        # Regexps de _norm, compilées une seule fois car _norm est appelée pour chaque article
+        self.re_1er = re.compile(r'\b1er\b', re.IGNORECASE)
+        self.re_norm_suffix = re.compile(r'(?i)(?P<num>\d+)\s*(?P<suf>' + '|'.join(re.escape(k) for k in suffix_keys) + r')\b')
+        self.re_latin_words = [(re.compile(r'\b' + re.escape(k) + r'\b', re.IGNORECASE), vs) for k, vs in self.latin_map.items()]
 
-        self.re_anaphora = re.compile(r"(?i)(?:du|au|le|ce|de\s+la)\s+m[êe]me\s+(?:code|loi|décret|ordonnance|convention)")
+        # Lignes ayant dépassé le budget : leur nombre, et les SLOW_LINES plus lentes (source, début du
+        # texte, longueur, secondes d'extraction) ; build_one les remet à zéro à chaque fichier
+        self.budget_exceeded = 0
+        self.slow_lines = []
+
+        # Articles existants de chaque code (chargés au premier besoin), pour développer les plages
+        self.article_index = ArticleIndex(code_files())
+
+    def fingerprint(self):
+        # Empreinte du moteur pour le cache : change dès que les regexps, la liste des codes,
+        # le code de l'extraction, du contexte du document, des identifiants d'articles (plages
+        # développées dans data-range) ou celui du rendu html changent.
+        h = hashlib.sha1()
+        for part in (inspect.getsource(LegalEngine), inspect.getsource(DocumentContext), RE_LOI_PRECISE.pattern,
+                     inspect.getsource(inject_links), inspect.getsource(slugify),
+                     inspect.getsource(link_target), inspect.getsource(linked_entities),
+                     inspect.getsource(render_code_line), inspect.getsource(render_jorf_text),
+                     inspect.getsource(render_code_record), inspect.getsource(preview_key),
+                     inspect.getsource(inspect.getmodule(ArticleIndex)), inspect.getsource(inspect.getmodule(parse_code_file)),
+                     self.re_code.pattern, str(WINDOW_SIZE), str(WINDOW_OVERLAP), str(LINE_MATCH_BUDGET)):
+            h.update(part.encode('utf-8'))
+        # Les plages développées dépendent du contenu des codes : un markdown modifié invalide le cache.
+        # On hache le contenu (et pas la date) pour que le cache survive à un checkout ou à une copie.
+        for slug, f in sorted(self.article_index.files.items()):
+            h.update(f"{slug}:".encode('utf-8'))
+            with open(f, 'rb') as fin:
+                for block in iter(lambda: fin.read(READ_BUFFER), b""):
+                    h.update(block)
+        return h.hexdigest()
 
     def _fuzzy(self, text):
         s = {'a':'[aàâä]','e':'[eéèêë]','i':'[iîï]','o':'[oôö]','u':'[uùûü]','c':'[cç]','y':'[yÿ]'}
@@ -86,21 +242,136 @@ class LegalEngine:
         """Détecte si un texte est une année pure (ex: 1996)"""
         return re.fullmatch(r"19\d{2}|20\d{2}", text.strip()) is not None
 
-    def extract(self, text, meta=None):
+    def extract(self, text, meta=None, core_start=0):
+        # Les regexps ne peuvent pas être interrompues : le budget est décompté entre deux correspondances.
+        # S'il est dépassé, la ligne est journalisée puis traitée par le détecteur simplifié.
+        # Les entités qui commencent avant `core_start` ne mettent pas à jour le contexte du document.
+        t0 = time.perf_counter()
+        try:
+            return self._extract_full(text, meta, LINE_MATCH_BUDGET, core_start)
+        except LineBudgetExceeded:
+            source = meta.get('source') if meta else None
+            print(f"⚠️ Ligne trop dense ({len(text)} caractères, {source}) : détecteur simplifié utilisé.")
+            ents = self._extract_simple(text, meta)
+            self.budget_exceeded += 1
+            self.slow_lines = keep_slowest(self.slow_lines + [{'source': source, 'text': text[:200], 'length': len(text),
+                                                               'seconds': round(time.perf_counter() - t0, 3)}])
+            return ents
+
+    def extract_windowed(self, text, meta=None, size=None, overlap=None):
+        # Découpe un texte très long en segments (coupés en fin de phrase) extraits séparément.
+        # Chaque segment possède un "coeur" [début, fin) et déborde de `overlap` caractères de chaque côté
+        # pour garder le contexte ; on ne garde que les entités qui commencent dans le coeur, ce qui
+        # déduplique les chevauchements. Les spans sont ensuite recalés sur le texte d'origine.
+        # Le contexte du document passe d'un segment au suivant : chaque segment part d'une copie
+        # du contexte, que le débordement à gauche ne fait pas avancer (le segment précédent l'a déjà
+        # fait), puis le contexte est mis à jour avec les entités définitives du coeur, comme le fait
+        # l'extraction d'un seul tenant. Le résultat est celui de extract sur tout le texte :
+        # ce que l'extraction d'une entité regarde après elle (parent à 120 caractères, anaphore à 150,
+        # propagation arrière à 600) tient dans le débordement, et aucune coupure ni aucun bord de
+        # segment ne tombe dans une correspondance de re_art ou de re_source : une énumération de
+        # centaines d'articles, plus longue que le débordement, reste entière dans un seul coeur.
+        size = size or WINDOW_SIZE
+        overlap = WINDOW_OVERLAP if overlap is None else overlap
+        if len(text) <= size:
+            return self.extract(text, meta)
+
+        meta = dict(meta or {})
+        context = meta.get('context') or DocumentContext()
+        starts, ends = self._match_spans(text)
+
+        def outside(pos, forward):
+            # Position hors des correspondances : fin (forward) ou début de celle qui contient `pos`
+            j = bisect.bisect_left(starts, pos) - 1
+            if j >= 0 and ends[j] > pos:
+                return ends[j] if forward else starts[j]
+            return pos
+
+        res = []
+        for core_start, core_end in self._window_cuts(text, size, lambda pos: outside(pos, True)):
+            seg_start = outside(max(0, core_start - overlap), False)
+            seg_end = outside(min(len(text), core_end + overlap), True)
+            meta['context'] = context.copy()
+            core = []
+            for e in self.extract(text[seg_start:seg_end], meta, core_start - seg_start):
+                start, end = e['span']
+                if not (core_start <= start + seg_start < core_end):
+                    continue
+                e['span'] = (start + seg_start, end + seg_start)
+                core.append(e)
+            for e in sorted(core, key=seen_at):
+                context.observe(e)
+            res.extend(core)
+        res.sort(key=lambda x: x['span'][0])
+        return res
+
+    def _window_cuts(self, text, size, snap=None):
+        # Bornes des coeurs de segments : on coupe à la dernière fin de phrase avant `size`,
+        # à défaut au dernier espace, à défaut au milieu d'un mot. `snap` repousse une coupure
+        # tombée dans une correspondance jusqu'à la fin de celle-ci.
+        cuts, start, n = [], 0, len(text)
+        while n - start > size:
+            limit = start + size
+            cut = max(text.rfind('. ', start, limit), text.rfind('; ', start, limit))
+            if cut <= start + size // 2:
+                cut = text.rfind(' ', start + size // 2, limit)
+            cut = cut + 1 if cut > start else limit
+            if snap is not None:
+                cut = snap(cut)
+            if cut >= n:
+                break
+            cuts.append((start, cut))
+            start = cut
+        cuts.append((start, n))
+        return cuts
+
+    def _match_spans(self, text):
+        # Réunion des correspondances de re_art et de re_source, en intervalles disjoints triés
+        # (débuts, fins) : un seul passage de chaque regexp sur tout le texte, en temps linéaire.
+        spans = sorted([m.span() for m in self.re_art.finditer(text)] + [m.span() for m in self.re_source.finditer(text)])
+        starts, ends = [], []
+        for a, b in spans:
+            if ends and a < ends[-1]:
+                ends[-1] = max(ends[-1], b)
+            else:
+                starts.append(a)
+                ends.append(b)
+        return starts, ends
+
+    def _extract_simple(self, text, meta=None):
+        # Détecteur de secours : codes et articles isolés, rattachés au code le plus proche qui précède
+        # (ou au code du fichier). Pas de lois ni de livres, mais un coût strictement linéaire.
+        codes = [{'tag': 'CODE', 'val': m.group('val'), 'span': m.span(), 'code': None} for m in self.re_code.finditer(text)]
+        file_code = "INCONNU"
+        if meta and meta.get('type') == 'CODE':
+            file_code = meta['source'].replace('.md','').replace('code','').strip('_')
+        res, i, last_code = [], 0, None
+        for m in self.re_art_simple.finditer(text):
+            while i < len(codes) and codes[i]['span'][1] <= m.start():
+                last_code = codes[i]['val']; i += 1
+            res.append({'tag': 'ART', 'article': self._norm(m.group('num').strip()), 'code': last_code or file_code,
+                        'livre': 'INCONNU', 'span': m.span(), 'parent_tag': 'CODE' if last_code else None})
+        res += codes
+        res.sort(key=lambda x: x['span'][0])
+        return res
+
+    def _extract_full(self, text, meta, budget, core_start=0):
         # 1. DÉTECTION BRUTE
         codes = [{'tag': 'CODE', 'val': m.group('val'), 'span': m.span(), 'code': None} for m in self.re_code.finditer(text)]
         
         # Filtrage des lois/conventions (on tronque la valeur après la date ou le numéro si présent)
         lois = []
         for m in self.re_source.finditer(text):
+            budget -= 1
+            if budget < 0: raise LineBudgetExceeded()
             raw_val = m.group('val').strip()
             # si année présente, tronquer après l'année
-            ym = re.search(r"\b(19|20)\d{2}\b", raw_val)
+            ym = self.re_year.search(raw_val)
             if ym:
                 val = raw_val[:ym.end()]
                 rel_end = ym.end()
             else:
-                nm = re.search(r"n[°o]?\s*\d+", raw_val, flags=re.IGNORECASE)
+                nm = self.re_loi_num.search(raw_val)
                 if nm:
                     val = raw_val[:nm.end()]
                     rel_end = nm.end()
@@ -123,96 +394,216 @@ class LegalEngine:
             lois.append({'tag': 'LOI', 'val': f"{m.group('type').title()} {val}", 'span': span, 'code': None})
             
         livres = [{'tag': 'LIVRE', 'val': m.group('val'), 'span': m.span(), 'code': 'INCONNU'} for m in self.re_livre.finditer(text)]
+
+        # Marqueurs d'anaphore ("du même code") : un seul passage par ligne, positions triées
+        anaphora_starts, anaphora = [], []
+        for m in self.re_anaphora.finditer(text):
+            anaphora_starts.append(m.start())
+            anaphora.append((m.end(), m.group('kind').lower()))
         
         # Filtrage des articles (on ignore les chiffres isolés)
         articles = []
         for m in self.re_art.finditer(text):
+            budget -= 1
+            if budget < 0: raise LineBudgetExceeded()
             num = m.group('num').strip()
             if self._is_year(num) and "art" not in text[max(0, m.start()-10):m.start()].lower():
                 continue
 
             # si énumération (séparateurs , ; ou mots 'et','à','au'), créer des entrées séparées avec spans précis
-            if re.search(r"\b(?:,|;|et|à|au)\b", num, flags=re.IGNORECASE):
-                subtext = num
-                for sm in re.finditer(r"(?:[LDR]\.?|A\.?|\*)?\s*\d+(?:[\.-]\d+)*", subtext):
+            if self.re_enum_sep.search(num):
+                # position de l'énumération dans la mention, calculée une seule fois par mention
+                rel_pos = m.group(0).lower().find(m.group('num').lower())
+                if rel_pos < 0:
+                    rel_pos = m.group(0).find(m.group('num'))
+                prev_end = None
+                for sm in self.re_art_item.finditer(num):
                     sub_num = sm.group(0).strip()
-                    rel_pos = m.group(0).lower().find(m.group('num').lower())
-                    if rel_pos >= 0:
-                        abs_start = m.start() + rel_pos + sm.start()
-                    else:
-                        abs_start = m.start() + m.group(0).find(m.group('num')) + sm.start()
+                    abs_start = m.start() + rel_pos + sm.start()
                     abs_end = abs_start + len(sm.group(0))
-                    articles.append({'tag': 'ART', 'val': sub_num, 'span': (abs_start, abs_end), 'code': 'INCONNU', 'livre': 'INCONNU'})
+                    art = {'tag': 'ART', 'val': sub_num, 'span': (abs_start, abs_end), 'code': 'INCONNU', 'livre': 'INCONNU'}
+                    # "L. 111-2 à L. 111-5" : l'élément après 'à'/'au' ferme une plage ouverte par le précédent
+                    if prev_end is not None and num[prev_end:sm.start()].strip().lower() in ('à', 'au'):
+                        art['range_start'] = len(articles) - 1
+                    articles.append(art)
+                    prev_end = sm.end()
             else:
                 articles.append({'tag': 'ART', 'val': num, 'span': m.span(), 'code': 'INCONNU', 'livre': 'INCONNU'})
 
         # 2. HIÉRARCHIE LIVRE -> CODE
+        # Le code d'un livre est le premier qui commence dans les 100 caractères après lui (codes triés)
+        code_starts = [c['span'][0] for c in codes]
         for lv in livres:
-            for c in codes:
-                if 0 < (c['span'][0] - lv['span'][1]) < 100:
-                    lv['code'] = c['val']; break
+            j = bisect.bisect_right(code_starts, lv['span'][1])
+            if j < len(codes) and code_starts[j] - lv['span'][1] < 100:
+                lv['code'] = codes[j]['val']
             if lv['code'] == 'INCONNU' and meta and meta.get('type') == 'CODE':
                 lv['code'] = meta['source'].replace('.md','').replace('code','').strip('_')
 
-        # 3. HIÉRARCHIE ARTICLE -> LIVRE/CODE
+        # 3. HIÉRARCHIE ARTICLE -> LIVRE/CODE, 4. PROPAGATION ARRIÈRE et 5. CONTEXTE DU DOCUMENT,
+        # en un seul passage dans l'ordre du texte.
+        # `state` suit le dernier code/loi/livre rencontré (en partant du contexte du document) : il
+        # voit les parents et les articles sous leur forme définitive, dans l'ordre du texte, comme le
+        # contexte du document à la fin de la ligne et celui que le mode fenêtré passe d'un segment au
+        # suivant. Un article sans parent attend l'article suivant (propagation arrière) : la suite
+        # d'articles en attente est fixée dès que l'article suivant est connu ou trop loin, puis
+        # rejouée dans l'ordre du texte avec les parents vus entre-temps (_settle).
+        # Les entités qui commencent avant `core_start` ne font pas avancer le contexte (mode fenêtré :
+        # le segment précédent l'a déjà fait). Un parent n'entre dans le contexte qu'une fois lu en
+        # entier (seen_at) : un article pris dans une loi trop longue ("la convention ... de l'article
+        # 2372-2 est ...") ne la reprend pas comme contexte.
+        context = meta.get('context') if meta else None
+        state = context.copy() if context is not None else DocumentContext()
         parents = sorted(codes + lois + livres, key=lambda x: x['span'][0])
+        parent_starts = [p['span'][0] for p in parents]
+        parents_seen = sorted(parents, key=seen_at)
+        # Un parent qui finit moins de 120 caractères avant l'article commence au plus
+        # 120 + (plus long parent) caractères avant lui : seuls ceux-là sont examinés.
+        reach = 120 + max((p['span'][1] - p['span'][0] for p in parents), default=0)
+        # Repli sur le contexte du document (étape 5) : hors codes, où le code du fichier sert déjà de repli
+        fallback = not (meta and meta.get('type') == 'CODE')
+        # Articles suivis d'un code ou d'une loi nommé, directement ou au bout de leur énumération
+        # ("les articles L. 1 et L. 2 du code rural")
+        named_after = [False] * len(articles)
+        for k in range(len(articles) - 1, -1, -1):
+            end = articles[k]['span'][1]
+            named_after[k] = self.re_named_parent.match(text, end) is not None or (
+                k + 1 < len(articles) and named_after[k + 1]
+                and self.re_enum_gap.fullmatch(text, end, articles[k + 1]['span'][0]) is not None)
         linked_articles = []
-        for art in articles:
+        pending, pending_state, events = [], None, []
+        i_parent = i_seen = 0
+        for i_art, art in enumerate(articles):
+            budget -= 1
+            if budget < 0: raise LineBudgetExceeded()
+            a_start, a_end = art['span']
+            while i_parent < len(parents) and parent_starts[i_parent] < a_start:
+                i_parent += 1
+            while i_seen < len(parents_seen) and seen_at(parents_seen[i_seen]) <= seen_at(art):
+                if parents_seen[i_seen]['span'][0] >= core_start:
+                    state.observe(parents_seen[i_seen])
+                    if pending:
+                        events.append(parents_seen[i_seen])
+                i_seen += 1
             p_code, p_livre, p_tag = "INCONNU", "INCONNU", None
-            snippet = text[art['span'][1]:art['span'][1]+150]
-            
-            # Parent direct: on accepte un parent proche avant ou après l'article
-            for p in parents:
-                after_dist = p['span'][0] - art['span'][1]
-                before_dist = art['span'][0] - p['span'][1]
-                if (0 < after_dist < 120) or (0 < before_dist < 120):
-                    p_tag = p['tag']
-                    if p['tag'] == 'LIVRE':
-                        p_livre, p_code = p['val'], p['code']
-                    else:
-                        p_code = p['val']
-                    break
-            
-            # Anaphore
-            if p_code == "INCONNU" and self.re_anaphora.search(snippet) and linked_articles:
-                p_code, p_livre = linked_articles[-1]['code'], linked_articles[-1]['livre']
+
+            # Parent direct: on accepte un parent proche avant ou après l'article. Le premier
+            # parent (dans l'ordre du texte) qui finit dans les 120 caractères avant l'article,
+            # à défaut le premier qui commence dans les 120 caractères après lui.
+            parent, enclosing = None, set()
+            for j in range(bisect.bisect_right(parent_starts, a_start - reach), i_parent):
+                if parents[j]['span'][1] >= a_end:
+                    enclosing.add(parents[j]['code'] if parents[j]['tag'] == 'LIVRE' else parents[j]['val'])
+                elif parent is None and 0 < a_start - parents[j]['span'][1] < 120:
+                    parent = parents[j]
+            if parent is None:
+                j = bisect.bisect_right(parent_starts, a_end)
+                if j < len(parents) and parent_starts[j] - a_end < 120:
+                    parent = parents[j]
+            if parent is not None:
+                p_tag = parent['tag']
+                if parent['tag'] == 'LIVRE':
+                    p_livre, p_code = parent['val'], parent['code']
+                else:
+                    p_code = parent['val']
+
+            # Anaphore ("du même code" dans les 150 caractères qui suivent) : on reprend le dernier
+            # code (ou la dernière loi) du document, y compris ceux des lignes précédentes.
+            # Le premier marqueur après l'article est trouvé par dichotomie dans les positions triées.
+            if p_code == "INCONNU":
+                j = bisect.bisect_left(anaphora_starts, a_end)
+                if j < len(anaphora) and anaphora[j][0] <= a_end + 150:
+                    p_code, p_livre, p_tag = state.resolve(anaphora[j][1])
 
             # Contexte fichier
             if p_code == "INCONNU" and meta and meta.get('type') == 'CODE':
                 p_code = meta['source'].replace('.md','').replace('code','').strip('_')
 
-            linked_articles.append({'tag': 'ART', 'article': self._norm(art['val']), 'code': p_code, 'livre': p_livre, 'span': art['span'], 'parent_tag': p_tag})
+            linked = {'tag': 'ART', 'article': self._norm(art['val']), 'code': p_code, 'livre': p_livre, 'span': art['span'], 'parent_tag': p_tag}
+            if 'range_start' in art:
+                linked['range_start'] = art['range_start']
+            linked_articles.append(linked)
 
-        # 4. PROPAGATION ARRIÈRE (Plages)
-        for i in range(len(linked_articles)-2, -1, -1):
-            if linked_articles[i]['code'] == "INCONNU" and linked_articles[i+1]['code'] != "INCONNU":
-                if (linked_articles[i+1]['span'][0] - linked_articles[i]['span'][1]) < 600:
-                    linked_articles[i]['code'] = linked_articles[i+1]['code']
-                    linked_articles[i]['livre'] = linked_articles[i+1]['livre']
+            # Un article suivi d'un code ou d'une loi que le moteur ne reconnaît pas ("l'article 5 du
+            # code rural...") reste inconnu : il n'attend pas l'article suivant et ne reprend pas le contexte.
+            named = p_code == "INCONNU" and named_after[i_art]
+
+            # 4. Les articles en attente reprennent le code de celui-ci s'il est connu (plages, énumérations) :
+            # ceux qui en sont à moins de 600 caractères, voir _settle. Un article inconnu à plus de 600
+            # caractères du dernier article en attente les fixe tous sans lui.
+            if pending and (p_code != "INCONNU" or named or a_start - pending[-1]['span'][1] >= 600):
+                source = linked if p_code != "INCONNU" and a_start - pending[-1]['span'][1] < 600 else None
+                state = self._settle(pending, pending_state, events, source, text, fallback, core_start)
+                pending, events = [], []
+            if p_code == "INCONNU" and not named:
+                if not pending:
+                    pending_state = state.copy()
+                if enclosing:
+                    linked['enclosing'] = enclosing
+                pending.append(linked)
+                events.append(linked)
+            elif a_start >= core_start:
+                state.observe(linked)
+        if pending:
+            self._settle(pending, pending_state, events, None, text, fallback, core_start)
+
+        # 6. PLAGES : les articles existants entre les deux bornes, pris dans l'index du code
+        for art in linked_articles:
+            first = linked_articles[art.pop('range_start')] if 'range_start' in art else None
+            if first is not None and art['code'] == first['code'] != "INCONNU" and art.get('parent_tag') != 'LOI':
+                inside = self.article_index.between(slugify(art['code']), first['article'], art['article'])
+                if inside:
+                    dot = "." in first['article']
+                    art['range'] = [a.format(dot=dot) for a in inside]
 
         res = linked_articles + livres + codes + lois
         res.sort(key=lambda x: x['span'][0])
+        if context is not None:
+            for e in sorted(res, key=seen_at):
+                if e['span'][0] >= core_start:
+                    context.observe(e)
         return res
 
+    def _settle(self, pending, state, events, source, text, fallback, core_start=0):
+        # Fixe les articles en attente : ils reprennent le code de `source` s'il commence à moins de
+        # 600 caractères après eux (4. propagation arrière ; la distance est comptée jusqu'à la source
+        # et non d'un article au suivant, pour que le mode fenêtré voie toujours la source dans son
+        # débordement), à défaut, s'ils sont cités ("l'article 5", "des articles..."), la dernière
+        # référence vue avant eux, même plusieurs phrases ou lignes plus haut (5. contexte du document).
+        # `state` est le contexte avant le premier article en attente ; `events` les articles et les
+        # parents vus depuis, dans l'ordre du texte. Renvoie le contexte après le dernier d'entre eux.
+        # Un article ne reprend jamais (source ou contexte) une loi ou un code dont la mention le contient.
+        for e in events:
+            if e['tag'] == 'ART':
+                start, enclosing = e['span'][0], e.pop('enclosing', ())
+                if source is not None and source['span'][0] - e['span'][1] < 600 and source['code'] not in enclosing:
+                    e['code'], e['livre'], e['parent_tag'] = source['code'], source['livre'], source['parent_tag']
+                elif fallback and self.re_citing.search(text, max(0, start - 8), start):
+                    c_code, c_livre, c_tag = state.resolve(None)
+                    if c_code != "INCONNU" and c_code not in enclosing:
+                        e['code'], e['livre'], e['parent_tag'] = c_code, c_livre, c_tag
+                if start < core_start:
+                    continue
+            state.observe(e)
+        return state
+
     def _norm(self, v):
         # Normalise un identifiant d'article ou de suffixe latin:
         # - remplace "1er" par "1"
         # - convertit les suffixes latins (bis/ter/quater...) en codage numérique (-2,-3,-4...)
         # - supprime espaces et majuscules pour retourner une forme canonique (ex: "209 quater" -> "209-4")
-        v = re.sub(r'\b1er\b','1', v, flags=re.IGNORECASE)
+        v = self.re_1er.sub('1', v)
         # Remplacer les suffixes latins attachés à un nombre, avec ou sans espace,
         # ex: '209quater' ou '209 quater' -> '209-4'
-        keys = sorted(self.latin_map.keys(), key=len, reverse=True)
-        suf_pattern = r'(?i)(?P<num>\d+)\s*(?P<suf>' + '|'.join(re.escape(k) for k in keys) + r')\b'
         def _repl(m):
             num = m.group('num')
             suf = m.group('suf').lower()
             return num + self.latin_map.get(suf, '')
 
-        v = re.sub(suf_pattern, _repl, v)
+        v = self.re_norm_suffix.sub(_repl, v)
         # Pour régler quelques problèmes restants avec les suffixes latins 
-        for k, vs in self.latin_map.items():
-            v = re.sub(r'\b' + re.escape(k) + r'\b', vs, v, flags=re.IGNORECASE)
+        for rx, vs in self.re_latin_words:
+            v = rx.sub(vs, v)
         return v.replace(" ","").replace("\xa0","").upper().strip(".")
 
 # 3. Génération des liens hypertexte
@@ -225,82 +616,607 @@ def slugify(t):
     t = re.sub(r"\b(code|loi|decret|ordonnance|du|des|de|la|le|l|d|et|n|no)\b", "", t)
     return re.sub(r"[^a-z0-9]+", "_", t).strip("_")
 
+def code_files():
+    # slug du code -> fichier markdown ("code_de_l_action_sociale_et_des_familles.md" -> "action_sociale_familles"),
+    # même slug que celui des liens produits par inject_links
+    if not DIR_CODES.exists():
+        return {}
+    return {slugify(f.stem.replace("_", " ")): f for f in sorted(DIR_CODES.glob("*.md")) if slugify(f.stem.replace("_", " "))}
+
+def link_target(e):
+    # Cible (attribut data) du lien d'une entité, ou None si l'entité ne produit pas de lien
+    if e['tag'] == 'ART':
+        s = slugify(e['code'])
+        if s:
+            if e.get('parent_tag') == 'LOI':
+                return f"fr_loi_article:{s}/{e['article']}"
+            return f"fr_code_article:{s}/{e['article']}"
+    elif e['tag'] == 'CODE':
+        s = slugify(e['val'])
+        if s: return f"fr_code:code/{s}"
+    elif e['tag'] == 'LOI':
+        s = slugify(e['val'])
+        if s: return f"fr_loi:loi/{s}"
+    elif e['tag'] == 'LIVRE':
+        s_lv, s_co = slugify(e['val']), slugify(e.get('code'))
+        if s_lv: return f"fr_livre:{s_lv}" + (f"/{s_co}" if s_co else "")
+    return None
+
+def linked_entities(entities):
+    # [(entité, cible)] des entités qui deviennent des liens, de la dernière à la première.
+    # Une entité qui chevauche un lien déjà retenu (plus loin dans le texte) est ignorée : les liens
+    # retenus commencent tous après elle et ne se chevauchent pas, il suffit donc de comparer sa fin
+    # au début du dernier lien retenu.
+    entities.sort(key=lambda x: x['span'][0], reverse=True)
+    kept, first = [], None
+    for e in entities:
+        start, end = e['span']
+        if first is not None and end > first: continue
+        data = link_target(e)
+        if data:
+            kept.append((e, data))
+            first = start
+    return kept
+
 def inject_links(text, entities):
     # Injecte des balises <a data="..."></a> autour des entités détectées.
     # Les entités doivent contenir des spans absolus pour pouvoir réécrire la chaîne.
     if not entities: return text
-    entities.sort(key=lambda x: x['span'][0], reverse=True)
-    curr, mask = text, []
-    for e in entities:
+    out, pos = [], len(text)
+    for e, data in linked_entities(entities):
         start, end = e['span']
-        if any(not (end <= ms or start >= me) for ms, me in mask): continue
-        
-        seg, data = curr[start:end], None
-        if e['tag'] == 'ART':
-            s = slugify(e['code'])
-            if s:
-                if e.get('parent_tag') == 'LOI':
-                    data = f"fr_loi_article:{s}/{e['article']}"
-                else:
-                    data = f"fr_code_article:{s}/{e['article']}"
-        elif e['tag'] == 'CODE':
-            s = slugify(e['val'])
-            if s: data = f"fr_code:code/{s}"
-        elif e['tag'] == 'LOI':
-            s = slugify(e['val'])
-            if s: data = f"fr_loi:loi/{s}"
-        elif e['tag'] == 'LIVRE':
-            s_lv, s_co = slugify(e['val']), slugify(e.get('code'))
-            if s_lv: data = f"fr_livre:{s_lv}" + (f"/{s_co}" if s_co else "")
-
-        if data:
-            curr = curr[:start] + f'<a data="{data}">{seg}</a>' + curr[end:]
-            mask.append((start, end))
-    return curr
+        # Une plage peut compter jusqu'à 500 articles : le html n'en garde que le premier et le dernier,
+        # les autres sont relus dans l'index des articles (ArticleIndex.span)
+        extra = f' data-range="{e["range"][0]} {e["range"][-1]}"' if e.get('range') else ""
+        # Clé de l'aperçu (previews.py), la même que celle de l'article dans previews/<code>/<i>.json
+        if data.startswith("fr_code_article:"):
+            extra += f' data-key="{preview_key(e["article"])}"'
+        out.append(text[end:pos])
+        out.append(f'<a data="{data}"{extra}>{text[start:end]}</a>')
+        pos = start
+    out.append(text[:pos])
+    return "".join(reversed(out))
 
 # 4. Fichier main.py que j'ai rentré ici car il n'arrivait pas à faire le lien 
 
-def main():
+def render_code_line(line, meta, engine):
+    # Un paragraphe du corps d'un article -> fragment html avec liens.
+    ents = engine.extract(line, meta)
+    return f"<p>{inject_links(line, ents)}</p>"
+
+def render_code_record(rec, meta, engine, cache=None):
+    # Un enregistrement de parse_code_file -> fragment html. Seul le corps des articles passe
+    # par l'extraction ; l'en-tête YAML donne le titre de la page et chaque en-tête d'article
+    # devient une ancre (civil.html#L111-1). Le contexte du document est remis à zéro à chaque titre.
+    kind = rec['kind']
+    if kind == BODY:
+        return render_cached(cache, engine, meta, rec['text'], render_code_line)
+    if kind == HEADING:
+        if meta.get('context') is not None:
+            meta['context'].see_heading(rec['title'])
+        level = min(rec['level'], 6)
+        return f"<h{level}>{rec['text'].strip('# ')}</h{level}>"
+    if kind == ARTICLE:
+        return f"<p class='article' id=\"{rec['num']}\"><strong>Art. {rec['num']}</strong></p>"
+    if kind == FRONTMATTER and rec['data'].get('title'):
+        return f"<h1>{rec['data']['title']}</h1>"
+    return ""
+
+def iter_jorf_texts(f):
+    # Texte retenu pour chaque ligne du csv JORF : le champ le plus long, s'il fait au moins 30 caractères.
+    with open(f, 'r', encoding='utf-8', errors='ignore', buffering=READ_BUFFER) as fin:
+        reader = csv.reader(fin, delimiter='|')
+        for row in reader:
+            if not row: continue
+            text = max(row, key=len)
+            if len(text) < 30: continue
+            yield text
+
+def render_jorf_text(text, meta, engine):
+    # Chaque ligne du JORF est un texte distinct : elle a son propre contexte.
+    ents = engine.extract_windowed(text, dict(meta, context=DocumentContext()))
+    return f"<div class='jorf-article'>{inject_links(text, ents)}</div>"
+
+def cache_scope(meta):
+    # Ce qui, en dehors du texte, influence le résultat : le type et, pour un code, le code
+    # par défaut déduit du nom de fichier. Deux années du JORF partagent donc leurs paragraphes.
+    if meta.get('type') == 'CODE':
+        return "CODE|" + meta['source'].replace('.md','').replace('code','').strip('_')
+    return meta.get('type') or ""
+
+def render_cached(cache, engine, meta, text, render):
+    # render(text, meta, engine) -> fragment html, lu dans le cache si possible.
+    # Une ligne passée par le détecteur simplifié (budget dépassé) n'est pas mise en cache.
+    # Quand le document porte un contexte, il fait partie de la clé et l'état obtenu après la
+    # ligne est stocké avec le fragment, pour que les lignes suivantes le retrouvent sur un hit.
+    if cache is None:
+        return render(text, meta, engine)
+    context = meta.get('context')
+    scope = cache_scope(meta) + ("|" + context.key() if context is not None else "")
+    key = cache.key(scope, text)
+    value = cache.get(key)
+    if value is not None:
+        after, frag = value.split("\x1e", 1)
+        if context is not None:
+            context.restore(after)
+        return frag
+    slow = engine.budget_exceeded
+    frag = render(text, meta, engine)
+    if engine.budget_exceeded == slow:
+        cache.put(key, (context.key() if context is not None else "") + "\x1e" + frag)
+    return frag
+
+def render_code(f, engine, cache=None, graph=None, checker=None, sinks=(), rendered=None):
+    # Génère la page html d'un code à partir de son fichier markdown.
+    # Avec `graph`, les liens de chaque paragraphe deviennent des citations de l'article qui le contient ;
+    # avec `checker`, leurs cibles sont vérifiées au passage. Chaque objet de `sinks` (index de
+    # recherche...) reçoit tous les enregistrements avec leur fragment html : sink.add(rec, frag).
+    # `rendered` fournit les paires (enregistrement, fragment) déjà rendues ailleurs (ChunkStream).
+    # La lecture et l'écriture se font dans des threads, en parallèle du rendu (pipeline.py).
+    meta = {'source': f.name, 'type': 'CODE', 'context': DocumentContext()}
+    slug = slugify(f.stem.replace("_", " "))
+    if rendered is None:
+        rendered = ((rec, render_code_record(rec, meta, engine, cache)) for rec in prefetch(parse_code_file(f, READ_BUFFER)))
+    out = DIR_OUTPUT / "codes" / f.name.replace('.md','.html')
+    with PageWriter(out) as page:
+        page.write(HTML_HEADER.replace("{title}", f.name))
+        for rec, frag in rendered:
+            if graph is not None and rec['kind'] == BODY:
+                source = article_node('fr_code_article', slug, rec['article']) if rec['article'] else f"fr_code:code/{slug}"
+                graph.add_html(source, frag)
+            if checker is not None and rec['kind'] == BODY:
+                checker.check_html(frag)
+            for sink in sinks:
+                sink.add(rec, frag)
+            page.write(frag)
+        page.write(HTML_FOOTER)
+    return out
+
+def render_jorf(f, annee, engine, cache=None, graph=None, checker=None, sinks=(), rendered=None):
+    # Génère la page html d'une année du JORF (csv délimité par des '|').
+    # Chaque objet de `sinks` reçoit le fragment de chaque ligne : sink.add(None, frag).
+    # `rendered` fournit les paires (texte, fragment) déjà rendues ailleurs (ChunkStream).
+    meta = {'source': f.name, 'type': 'JORF'}
+    if rendered is None:
+        rendered = ((t, render_cached(cache, engine, meta, t, render_jorf_text)) for t in prefetch(iter_jorf_texts(f)))
+    out = DIR_OUTPUT / "jorf" / f.name.replace('.csv','.html')
+    with PageWriter(out) as page:
+        page.write(HTML_HEADER.replace("{title}", f.name) + f"<h1>Journal Officiel {annee}</h1>")
+        for t, frag in rendered:
+            if graph is not None:
+                graph.add_html(f"jorf:{annee}", frag)
+            if checker is not None:
+                checker.check_html(frag)
+            for sink in sinks:
+                sink.add(None, frag)
+            page.write(frag)
+        page.write(HTML_FOOTER)
+    return out
+
+# Moteur et cache propres à chaque processus (créés une fois par worker, pas à chaque fichier)
+_WORKER = {}
+
+def init_worker(cache_path=None, cache_mb=512, data=None, trace_memory=False):
+    if data is not None:
+        use_data_root(data)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    engine = LegalEngine()
+    cache = None
+    if cache_path is not None:
+        cache = ExtractionCache(engine.fingerprint(), cache_path, disk_bytes=cache_mb * 1024 * 1024)
+    _WORKER.update(engine=engine, cache=cache, trace_memory=trace_memory)
+
+def take_cache_stats(cache):
+    # Compteurs du cache depuis le dernier appel (None sans cache)
+    if cache is None:
+        return None
+    cache.flush()
+    stats = cache.stats()
+    cache.hits_memory = cache.hits_disk = cache.misses = 0
+    return stats
+
+def build_one(kind, f, annee=None, outputs=(), rendered=None):
+    # Rend un fichier et renvoie les compteurs du cache accumulés depuis le dernier appel, ainsi
+    # que les sorties annexes demandées dans `outputs`, dans un dictionnaire :
+    #   'graph'  -> citations du fichier (GraphBuilder.state)
+    #   'links'  -> (liens vérifiés, liens cassés)
+    #   'search' -> (slug, titre, page) du code, dont l'index de recherche vient d'être écrit
+    #   'previews' -> (slug, nombre de fichiers d'aperçus écrits pour le code)
+    # ainsi que, toujours, 'report' : temps, octets, paragraphes, mémoire et lignes trop denses du
+    # fichier (build_report.py).
+    # Avec `rendered` (ChunkStream), les fragments viennent des workers et seul l'assemblage se fait ici.
+    engine, cache = _WORKER['engine'], _WORKER['cache']
+    t0, cpu0 = time.perf_counter(), time.process_time()
+    engine.slow_lines, exceeded = [], engine.budget_exceeded
+    if _WORKER['trace_memory']:
+        tracemalloc.reset_peak()
+    stats_sink = FileStats()
+    graph = GraphBuilder(engine.article_index) if 'graph' in outputs else None
+    checker = LinkChecker(engine.article_index, slugify) if 'links' in outputs else None
+    side = {}
+    if kind == 'CODE':
+        slug = slugify(f.stem.replace("_", " "))
+        search = SearchShard(slug, f"codes/{f.stem}.html") if 'search' in outputs else None
+        previews = PreviewSink(slug) if 'previews' in outputs else None
+        out = render_code(f, engine, cache, graph, checker, [s for s in (search, previews, stats_sink) if s is not None], rendered)
+        if search is not None:
+            search.save(DIR_OUTPUT / "search")
+            side['search'] = (slug, search.title, search.page)
+        if previews is not None:
+            side['previews'] = (slug, previews.save(DIR_OUTPUT / "previews"))
+    else:
+        out = render_jorf(f, annee, engine, cache, graph, checker, [stats_sink], rendered)
+    stats = take_cache_stats(cache)
+    if graph is not None:
+        side['graph'] = graph.state()
+    if checker is not None:
+        side['links'] = (checker.checked, checker.report())
+    side['report'] = {'file': job_key(kind, f), 'type': kind,
+                      'seconds': round(time.perf_counter() - t0, 3), 'cpu_seconds': round(time.process_time() - cpu0, 3),
+                      'bytes_in': f.stat().st_size, 'bytes_out': out.stat().st_size,
+                      'paragraphs': stats_sink.paragraphs, 'links': stats_sink.links,
+                      'rss_peak_mb': rss_peak_mb(), 'pid': os.getpid(),
+                      'budget_lines': engine.budget_exceeded - exceeded, 'slow_lines': engine.slow_lines,
+                      'tracemalloc_peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1) if _WORKER['trace_memory'] else None}
+    return kind, f, annee, stats, side
+
+# Découpage des gros fichiers : un fichier = une tâche laisse le plus gros code ou la plus grosse
+# année du JORF dicter la durée du build. Au-delà de 2 x --chunk-mb, un fichier est découpé en
+# morceaux d'environ --chunk-mb, coupés avant un titre (code) ou entre deux lignes (JORF), que les
+# workers rendent comme n'importe quelle tâche. Le processus principal lit le fichier, envoie les
+# morceaux en gardant une fenêtre bornée d'avance, puis reprend les fragments dans l'ordre pour le
+# graphe, la vérification des liens, les index et l'écriture de la page : le résultat est celui
+# d'un rendu d'un seul tenant.
+# Le contexte du document ne franchit pas une coupure : un titre le remet entièrement à zéro
+# (DocumentContext.see_heading) et chaque ligne du JORF a le sien. Un morceau de code commence donc
+# avec un contexte neuf, qui est exactement celui qu'aurait eu le rendu continu à cet endroit.
+
+def iter_file_chunks(kind, f, chunk_chars):
+    # Morceaux d'un fichier : listes d'enregistrements (code) ou de textes (JORF) d'environ chunk_chars caractères
+    units = parse_code_file(f, READ_BUFFER) if kind == 'CODE' else iter_jorf_texts(f)
+    chunk, size = [], 0
+    for u in units:
+        boundary = u['kind'] == HEADING if kind == 'CODE' else True
+        if boundary and size >= chunk_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(u)
+        size += len(u['text'] if kind == 'CODE' else u)
+    if chunk:
+        yield chunk
+
+def render_chunk(kind, source, units):
+    # Tâche d'un worker : fragments html d'un morceau, compteurs du cache, temps CPU et lignes trop
+    # denses (nombre, plus lentes)
+    engine, cache = _WORKER['engine'], _WORKER['cache']
+    cpu0 = time.process_time()
+    engine.slow_lines, exceeded = [], engine.budget_exceeded
+    if kind == 'CODE':
+        meta = {'source': source, 'type': 'CODE', 'context': DocumentContext()}
+        frags = [render_code_record(rec, meta, engine, cache) for rec in units]
+    else:
+        meta = {'source': source, 'type': 'JORF'}
+        frags = [render_cached(cache, engine, meta, t, render_jorf_text) for t in units]
+    return frags, take_cache_stats(cache), time.process_time() - cpu0, (engine.budget_exceeded - exceeded, engine.slow_lines)
+
+class ChunkStream:
+    """Paires (enregistrement ou texte, fragment) d'un gros fichier, rendues par morceaux dans le pool.
+
+    Au plus `window` morceaux sont en cours à la fois, et autant d'avance sont lus par un thread
+    (pipeline.py) : la mémoire du processus principal reste bornée quelle que soit la taille du fichier."""
+
+    def __init__(self, pool, kind, f, chunk_chars, window):
+        self.pool, self.kind, self.f, self.window = pool, kind, f, window
+        self.chunks = prefetch(iter_file_chunks(kind, f, chunk_chars), batch=1, depth=window)
+        self.pending = None
+        self.count = 0
+        self.cpu_seconds = 0.0
+        self.stats = None
+        self.budget_lines, self.slow_lines = 0, []
+
+    def _submit(self):
+        chunk = next(self.chunks, None)
+        if chunk is not None:
+            self.pending.append((chunk, self.pool.submit(render_chunk, self.kind, self.f.name, chunk)))
+
+    def start(self):
+        # Envoie la première fenêtre de morceaux (sans attendre qu'on lise le résultat)
+        if self.pending is None:
+            self.pending = deque()
+            for _ in range(self.window):
+                self._submit()
+
+    def __iter__(self):
+        self.start()
+        while self.pending:
+            chunk, fut = self.pending.popleft()
+            frags, stats, cpu, (budget_lines, slow_lines) = fut.result()
+            self._submit()
+            self.count += 1
+            self.cpu_seconds += cpu
+            self.budget_lines += budget_lines
+            self.slow_lines = keep_slowest(self.slow_lines + slow_lines)
+            if stats is not None:
+                self.stats = {k: (self.stats or {}).get(k, 0) + v for k, v in stats.items()}
+            yield from zip(chunk, frags)
+
+def discover_jorf_files():
+    # Années disponibles, lues dans le dossier au lieu de tester range(1990, 2024).
+    # Un fichier de DIR_JORF est prioritaire sur son homonyme posé directement dans data/.
+    found = {}
+    for d in (DIR_JORF.parent, DIR_JORF):
+        if not d.exists(): continue
+        for f in d.glob("jorf_*.csv"):
+            m = re.fullmatch(r"jorf_(\d{4})", f.stem)
+            if m: found[int(m.group(1))] = f
+    return sorted(found.items())
+
+def parse_years(spec):
+    # "2010", "2010-2015" ou "2008,2010-2012" -> ensemble d'années (type= d'argparse)
+    years = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part: continue
+        m = re.fullmatch(r"(\d{4})(?:\s*-\s*(\d{4}))?", part)
+        if not m:
+            raise argparse.ArgumentTypeError(f"années invalides : {part!r} (format attendu : 2010, 2010-2015 ou 2008,2010-2012)")
+        lo, hi = int(m.group(1)), int(m.group(2) or m.group(1))
+        if hi < lo:
+            raise argparse.ArgumentTypeError(f"intervalle inversé : {part!r}")
+        years.update(range(lo, hi + 1))
+    if not years:
+        raise argparse.ArgumentTypeError("aucune année indiquée")
+    return years
+
+def select_inputs(codes=None, years=None, pattern=None, codes_only=False, jorf_only=False):
+    # Renvoie (fichiers de codes, [(année, fichier jorf)]) filtrés par les sélecteurs.
+    # Sans sélecteur, tout est retenu. `pattern` est un glob testé sur le nom du fichier.
+    code_files, jorf_files = [], []
+    if not jorf_only and DIR_CODES.exists():
+        code_files = sorted(DIR_CODES.glob("*.md"))
+        if codes: code_files = [f for f in code_files if f.stem in codes]
+        elif years: code_files = []
+        if pattern: code_files = [f for f in code_files if fnmatch.fnmatch(f.name, pattern)]
+    if not codes_only:
+        jorf_files = discover_jorf_files()
+        if years: jorf_files = [(a, f) for a, f in jorf_files if a in years]
+        elif codes: jorf_files = []
+        if pattern: jorf_files = [(a, f) for a, f in jorf_files if fnmatch.fnmatch(f.name, pattern)]
+    return code_files, jorf_files
+
+def use_data_root(root):
+    # Autre racine de données que data/ (ex: corpus synthétique de tools/synth_corpus.py) : les
+    # entrées y sont lues et le site, le cache et le graphe y sont écrits.
+    global DIR_CODES, DIR_JORF, DIR_OUTPUT, DIR_CACHE, DIR_GRAPH
+    root = Path(root)
+    DIR_CODES, DIR_JORF = root / "codes", root / "jorf_2023_1990"
+    DIR_OUTPUT, DIR_CACHE, DIR_GRAPH = root / "html", root / "cache", root / "graph"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Génère le site html avec les hyperliens juridiques.")
+    parser.add_argument("--data", type=Path, metavar="DOSSIER", help="racine des données à la place de data/ (codes/, jorf_2023_1990/)")
+    parser.add_argument("--codes", nargs="+", metavar="NOM", help="noms de fichiers de codes sans extension (ex: civil penal)")
+    parser.add_argument("--years", type=parse_years, metavar="ANNÉES", help="années du JORF : 2010, 2010-2015 ou 2008,2010-2012")
+    parser.add_argument("--glob", dest="pattern", metavar="MOTIF", help="motif sur le nom de fichier (ex: 'action_*.md', 'jorf_201*')")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--codes-only", action="store_true", help="ne traiter que les codes")
+    group.add_argument("--jorf-only", action="store_true", help="ne traiter que le JORF")
+    parser.add_argument("--jobs", type=int, default=1, help="nombre de processus (un fichier, ou un morceau de gros fichier, par tâche)")
+    parser.add_argument("--chunk-mb", type=float, default=2, help="avec --jobs, taille des morceaux des gros fichiers (0 : pas de découpage)")
+    parser.add_argument("--no-cache", action="store_true", help="désactiver le cache des paragraphes déjà liés")
+    parser.add_argument("--cache-dir", type=Path, help="dossier du cache persistant (data/cache)")
+    parser.add_argument("--cache-mb", type=int, default=512, help="taille maximale du cache sur disque (Mo)")
+    parser.add_argument("--graph-dir", type=Path, help="dossier du graphe des citations (data/graph)")
+    parser.add_argument("--no-graph", action="store_true", help="ne pas construire le graphe des citations")
+    parser.add_argument("--no-check-links", action="store_true", help="ne pas vérifier les cibles des liens")
+    parser.add_argument("--no-search", action="store_true", help="ne pas écrire l'index de recherche")
+    parser.add_argument("--no-previews", action="store_true", help="ne pas écrire les aperçus des articles")
+    parser.add_argument("--report", type=Path, help="rapport de ressources du build (data/html/rapport_build.json)")
+    parser.add_argument("--trace-memory", action="store_true", help="mesurer le pic tracemalloc de chaque fichier (plus lent)")
+    shard = parser.add_mutually_exclusive_group()
+    shard.add_argument("--shard", type=parse_shard, metavar="i/N", help="ne construire que la part i (1 à N) des fichiers, pour un build sur N machines")
+    shard.add_argument("--merge", action="store_true", help="rassembler les sorties annexes des parts (data/html/shards)")
+    return parser.parse_args(argv)
+
+# Build sur plusieurs machines : chaque machine lance --shard i/N sur les mêmes données et les mêmes
+# sélecteurs. Les pages et les fichiers par code (recherche, aperçus) sont écrits normalement ; les
+# sorties qui rassemblent tous les fichiers (graphe, rapport des liens, catalogues) sont mises de côté
+# dans data/html/shards/i-N.json. Une fois les dossiers data/html réunis, --merge les assemble dans
+# l'ordre des fichiers : le résultat est identique octet pour octet à celui d'un build sur une machine.
+
+def parse_shard(spec):
+    # "2/4" -> (2, 4)
+    i, _, n = spec.partition('/')
+    try:
+        i, n = int(i), int(n)
+    except ValueError:
+        raise argparse.ArgumentTypeError("format attendu : i/N (ex: 2/4)")
+    if not 1 <= i <= n:
+        raise argparse.ArgumentTypeError("il faut 1 <= i <= N")
+    return i, n
+
+def job_key(kind, f):
+    # Identifiant d'un fichier, le même sur toutes les machines
+    return f"{'codes' if kind == 'CODE' else 'jorf'}/{f.name}"
+
+def assign_shards(jobs, count):
+    # Répartit les fichiers en `count` parts de taille comparable : du plus gros au plus petit (à taille
+    # égale, dans l'ordre d'un hash stable du nom), chacun va à la part la moins chargée. Le résultat ne
+    # dépend que des noms et des tailles des fichiers : chaque machine calcule la même répartition.
+    def weight(job):
+        key = job_key(job[0], job[1])
+        return -job[1].stat().st_size, hashlib.sha1(key.encode('utf-8')).hexdigest()
+    loads = [0] * count
+    shard_of = {}
+    for job in sorted(jobs, key=weight):
+        i = loads.index(min(loads))
+        loads[i] += job[1].stat().st_size
+        shard_of[job_key(job[0], job[1])] = i + 1
+    return shard_of
+
+def finalize(order, sides, outputs, graph_dir):
+    # Sorties qui rassemblent tous les fichiers, dans l'ordre des fichiers : identiques en série,
+    # en parallèle et après --merge. `order` : [(type, clé du fichier)], `sides` : clé -> sorties de build_one.
+    if 'graph' in outputs:
+        builder = GraphBuilder()
+        for _, key in order:
+            builder.merge(sides[key].pop('graph'))
+        graph = builder.to_graph()
+        graph.save(graph_dir)
+        print(f"🔗 Graphe des citations : {len(graph)} noeuds, {len(graph.indices)} citations ({graph_dir})")
+    if 'links' in outputs:
+        reports = [(key.split('/', 1)[1], *sides[key]['links']) for _, key in order]
+        write_report(DIR_OUTPUT / "liens_casses.tsv", reports)
+        checked = sum(n for _, n, _ in reports)
+        broken = sum(c for _, _, b in reports for *_, c in b)
+        for name, n, b in reports:
+            if b:
+                print(f"⚠️ {name} : {sum(c for *_, c in b)} liens cassés sur {n} ({len(b)} cibles distinctes)")
+        print(f"🔎 Liens vérifiés : {checked}, cassés : {broken} (détail dans {DIR_OUTPUT / 'liens_casses.tsv'})")
+    codes = [key for kind, key in order if kind == 'CODE']
+    if 'search' in outputs and codes:
+        write_catalog(DIR_OUTPUT / "search", [sides[key]['search'] for key in codes])
+        with open(DIR_OUTPUT / "recherche.html", 'w', encoding='utf-8') as fout:
+            fout.write(HTML_HEADER.replace("{title}", "Recherche") + SEARCH_PAGE + HTML_FOOTER)
+        print(f"🔍 Index de recherche : {len(codes)} codes ({DIR_OUTPUT / 'recherche.html'})")
+    if 'previews' in outputs and codes:
+        entries = [sides[key]['previews'] for key in codes]
+        write_preview_catalog(DIR_OUTPUT / "previews", entries)
+        print(f"💬 Aperçus : {sum(k for _, k in entries)} fichiers pour {len(entries)} codes")
+
+def write_shard(shard, order, sides, outputs):
+    i, n = shard
+    for side in sides.values():
+        if 'graph' in side:
+            names, src, dst = side['graph']
+            side['graph'] = [names, src.tolist(), dst.tolist()]
+    path = DIR_OUTPUT / "shards" / f"{i}-{n}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fout:
+        json.dump({'shard': i, 'count': n, 'outputs': sorted(outputs), 'order': order, 'sides': sides},
+                  fout, ensure_ascii=False, separators=(',', ':'))
+    print(f"📦 Part {i}/{n} : {len(sides)} fichiers sur {len(order)}, sorties annexes dans {path}")
+
+def merge_shards(graph_dir, report_path=None):
+    shard_dir = DIR_OUTPUT / "shards"
+    parts = [json.loads(p.read_text(encoding='utf-8')) for p in sorted(shard_dir.glob("*.json"))] if shard_dir.exists() else []
+    if not parts:
+        print(f"Aucune part à rassembler dans {shard_dir}.")
+        return False
+    n, order, outputs = parts[0]['count'], parts[0]['order'], frozenset(parts[0]['outputs'])
+    if any(p['count'] != n or p['order'] != order or frozenset(p['outputs']) != outputs for p in parts):
+        print("❌ Les parts ne viennent pas du même build (nombre de parts, fichiers ou options différents).")
+        return False
+    missing = sorted(set(range(1, n + 1)) - {p['shard'] for p in parts})
+    if missing:
+        print(f"❌ Parts manquantes : {', '.join(f'{i}/{n}' for i in missing)}")
+        return False
+    sides = {}
+    for p in parts:
+        sides.update(p['sides'])
+    finalize([tuple(o) for o in order], sides, outputs, graph_dir)
+    for p in shard_dir.glob("*.json"):
+        p.unlink()
+    shard_dir.rmdir()
+    # Rapports de ressources des parts (écrits à côté des pages, sauf --report ailleurs)
+    report_files = [DIR_OUTPUT / f"rapport_build-{i}-{n}.json" for i in range(1, n + 1)]
+    absent = [f.name for f in report_files if not f.exists()]
+    if absent:
+        print(f"⚠️ Rapports de build absents ({', '.join(absent)}) : pas de rapport pour le build entier.")
+        return True
+    report = merge_reports([json.loads(f.read_text(encoding='utf-8')) for f in report_files], [key for _, key in order])
+    path = report_path or DIR_OUTPUT / "rapport_build.json"
+    write_build_report(path, report)
+    print(format_report(report))
+    print(f"📄 Rapport de build ({n} parts) : {path}")
+    return True
+
+def main(argv=None):
     # Point d'entrée principal : parcourt les fichiers de `data/codes` et `data/jorf`,
     # extrait les entités et génère les fichiers html dans `data/html`.
-    engine = LegalEngine()
+    # Les sélecteurs permettent de ne reconstruire qu'une partie du site (ex: --codes civil).
+    t_start, cpu_start = time.perf_counter(), time.process_time()
+    args = parse_args(argv)
+    if args.data:
+        use_data_root(args.data)
+    args.cache_dir = args.cache_dir or DIR_CACHE
+    args.graph_dir = args.graph_dir or DIR_GRAPH
+    if args.merge:
+        merge_shards(args.graph_dir, args.report)
+        return
+    code_files, jorf_files = select_inputs(set(args.codes or ()), args.years,
+                                           args.pattern, args.codes_only, args.jorf_only)
+    if not code_files and not jorf_files:
+        print("Aucun fichier ne correspond aux sélecteurs.")
+        return
+
     (DIR_OUTPUT / "codes").mkdir(parents=True, exist_ok=True)
     (DIR_OUTPUT / "jorf").mkdir(parents=True, exist_ok=True)
+    cache_args = (None if args.no_cache else args.cache_dir / "extraction.sqlite", args.cache_mb, args.data, args.trace_memory)
 
-    # Traitement des codes juridique
-    for f in DIR_CODES.glob("*.md"):
-        html = ""
-        meta = {'source': f.name, 'type': 'CODE'}
-        with open(f, 'r', encoding='utf-8') as fin:
-            for line in fin:
-                if line.startswith('#'):
-                    level = min(line.count('#'), 6)
-                    html += f"<h{level}>{line.strip('# ')}</h{level}>"
-                elif line.strip():
-                    ents = engine.extract(line, meta)
-                    html += f"<p>{inject_links(line, ents)}</p>"
-        with open(DIR_OUTPUT / "codes" / f.name.replace('.md','.html'), 'w', encoding='utf-8') as fout:
-            fout.write(HTML_HEADER.replace("{title}", f.name) + html + HTML_FOOTER)
-
-    # Traitement JORF (1990-2023)
-    for annee in range(1990, 2024):
-        f = DIR_JORF / f"jorf_{annee}.csv"
-        if not f.exists(): f = BASE_DIR / "data" / f"jorf_{annee}.csv"
-        if not f.exists(): continue
-        
-        html_jorf, meta = f"<h1>Journal Officiel {annee}</h1>", {'source': f.name, 'type': 'JORF'}
-        with open(f, 'r', encoding='utf-8', errors='ignore') as fin:
-            reader = csv.reader(fin, delimiter='|')
-            for row in reader:
-                if not row: continue
-                text = max(row, key=len)
-                if len(text) < 30: continue
-                ents = engine.extract(text, meta)
-                html_jorf += f"<div class='jorf-article'>{inject_links(text, ents)}</div>"
-        
-        with open(DIR_OUTPUT / "jorf" / f.name.replace('.csv','.html'), 'w', encoding='utf-8') as fout:
-            fout.write(HTML_HEADER.replace("{title}", f.name) + html_jorf + HTML_FOOTER)
-        print(f"✅ JORF {annee} généré.")
+    # Codes juridiques puis JORF (années trouvées dans le dossier)
+    outputs = frozenset(name for name, off in (('graph', args.no_graph), ('links', args.no_check_links),
+                                               ('search', args.no_search), ('previews', args.no_previews)) if not off)
+    jobs = [('CODE', f, None, outputs) for f in code_files] + [('JORF', f, annee, outputs) for annee, f in jorf_files]
+    order = [(kind, job_key(kind, f)) for kind, f, _, _ in jobs]
+    if args.shard:
+        shard_of = assign_shards(jobs, args.shard[1])
+        jobs = [job for job in jobs if shard_of[job_key(job[0], job[1])] == args.shard[0]]
+    totals = {'hits_memory': 0, 'hits_disk': 0, 'misses': 0}
+    sides, reports = {}, {}
+
+    def done(kind, f, annee, stats, side):
+        report = side.pop('report')
+        print((f"✅ Code {f.stem} généré" if kind == 'CODE' else f"✅ JORF {annee} généré") + f" ({report['seconds']:.1f}s).")
+        for k, v in (stats or {}).items():
+            totals[k] += v
+        sides[job_key(kind, f)] = side
+        reports[job_key(kind, f)] = report
+
+    if args.jobs > 1:
+        chunk_chars = int(args.chunk_mb * 2**20)
+        big = [job for job in jobs if chunk_chars and job[1].stat().st_size > 2 * chunk_chars]
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=cache_args) as pool:
+            # Les premiers morceaux des gros fichiers passent devant les petits fichiers dans la file du pool
+            streams = [ChunkStream(pool, job[0], job[1], chunk_chars, 2 * args.jobs) for job in big]
+            for stream in streams:
+                stream.start()
+            futs = [pool.submit(build_one, *job) for job in jobs if job not in big]
+            if big:
+                # Assemblage des gros fichiers ici, dans l'ordre, pendant que le pool rend les morceaux
+                init_worker(None, args.cache_mb, args.data, args.trace_memory)
+                for job, stream in zip(big, streams):
+                    kind, f, annee, _, side = build_one(*job, rendered=stream)
+                    report = side['report']
+                    report.update(chunks=stream.count, assembly_cpu_seconds=report['cpu_seconds'],
+                                  cpu_seconds=round(report['cpu_seconds'] + stream.cpu_seconds, 3),
+                                  budget_lines=stream.budget_lines, slow_lines=stream.slow_lines)
+                    done(kind, f, annee, stream.stats, side)
+            for fut in as_completed(futs):
+                done(*fut.result())
+    elif jobs:
+        init_worker(*cache_args)
+        for job in jobs:
+            done(*build_one(*job))
+        if _WORKER['cache'] is not None:
+            _WORKER['cache'].close()
+
+    if not args.no_cache:
+        print(format_stats(totals))
+    if args.shard:
+        write_shard(args.shard, order, sides, outputs)
+    else:
+        finalize(order, sides, outputs, args.graph_dir)
+
+    # Rapport de ressources, dans l'ordre des fichiers
+    report = build_report([reports[key] for _, key in order if key in reports], time.perf_counter() - t_start,
+                          time.process_time() - cpu_start, args.jobs, None if args.no_cache else totals)
+    name = f"rapport_build-{args.shard[0]}-{args.shard[1]}.json" if args.shard else "rapport_build.json"
+    path = args.report or DIR_OUTPUT / name
+    write_build_report(path, report)
+    print(format_report(report))
+    print(f"📄 Rapport de build : {path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,97 @@
+# Vérification des liens produits par inject_links, pendant le build (pas de second parcours du html).
+#
+# Chaque fragment rendu est relu pour ses attributs data="fr_code_article:slug/ART" et
+# data="fr_code:code/slug" ; la cible est cherchée dans les ensembles des codes et des articles
+# existants (ArticleIndex du moteur, construit à partir des en-têtes du markdown), en O(1) par lien.
+# Les membres d'une plage (data-range : premier et dernier article existant entre les bornes) sont
+# relus dans l'index et comptés comme autant de liens vérifiés.
+#
+# Raisons d'un lien cassé :
+#   code inconnu       le slug ne correspond à aucun fichier de data/codes (ex: un slug issu du nom
+#                      de fichier, "de_l_action_sociale_et_des_familles", au lieu de celui des
+#                      mentions, "action_sociale_familles") ; la colonne indice propose le bon slug
+#   suffixe            l'article n'existe pas tel quel, mais existe avec un suffixe latin
+#                      ("209-4" pour l'article 209 quater)
+#   article absent     le code existe mais pas l'article
+#   inconnu            "INCONNU" est passé dans la cible
+#
+# Les liens vers les lois et les livres ne sont pas vérifiés (pas de corpus de référence).
+
+import re
+from collections import Counter
+
+from src.article_ids import ArticleId, LATIN_RANKS
+
+RE_LINK_DATA = re.compile(r'<a data="([^"]+)"(?: data-range="([^"]+)")?')
+MAX_LATIN_RANK = max(LATIN_RANKS.values())
+LATIN_NAMES = {rank: name for name, rank in LATIN_RANKS.items()}
+
+
+class LinkChecker:
+    """Compte, pour un fichier, les cibles de liens qui n'existent pas dans les codes."""
+
+    def __init__(self, index, slugify):
+        self.index = index
+        self.slugify = slugify
+        self.checked = 0
+        self.broken = Counter()   # (cible, raison, indice) -> nombre d'occurrences
+
+    def check_html(self, html):
+        for data, bounds in RE_LINK_DATA.findall(html):
+            targets = [data]
+            if bounds:
+                kind, _, rest = data.partition(':')
+                slug = rest.partition('/')[0]
+                targets += [f"{kind}:{slug}/{aid.format()}" for aid in self.index.span(slug, *bounds.split())]
+            for target in targets:
+                self.checked += 1
+                problem = self.check(target)
+                if problem is not None:
+                    self.broken[(target,) + problem] += 1
+
+    def check(self, data):
+        # Renvoie None si la cible existe, sinon (raison, indice)
+        kind, _, rest = data.partition(':')
+        if "INCONNU" in rest.upper():
+            return "inconnu", ""
+        if kind == 'fr_code':
+            slug = rest.partition('/')[2]
+            return None if slug in self.index.files else ("code inconnu", self._suggest(slug))
+        if kind != 'fr_code_article':
+            return None
+        slug, _, article = rest.partition('/')
+        if slug not in self.index.files:
+            return "code inconnu", self._suggest(slug)
+        aid = ArticleId.parse(article)
+        if aid is not None and (slug, aid) in self.index:
+            return None
+        # "209-4" normalisé depuis "209 quater" : la dernière composante est peut-être un suffixe
+        if aid is not None and not aid.rank and len(aid.nums) > 1 and 2 <= aid.nums[-1] <= MAX_LATIN_RANK:
+            alt = ArticleId(aid.prefix, aid.nums[:-1], aid.nums[-1], aid.dot)
+            if (slug, alt) in self.index:
+                return "suffixe", f"{alt.prefix}{'-'.join(map(str, alt.nums))} {LATIN_NAMES[alt.rank]}"
+        return "article absent", ""
+
+    def _suggest(self, slug):
+        # Slug connu le plus proche : même mots une fois les mots vides retirés, ou suffixe commun
+        alt = self.slugify(slug.replace("_", " "))
+        if alt in self.index.files:
+            return alt
+        for known in self.index.files:
+            if slug.endswith(known) or known.endswith(slug):
+                return known
+        return ""
+
+    def report(self):
+        # [(cible, raison, indice, occurrences)] triés par nombre d'occurrences
+        return [(t, r, h, n) for (t, r, h), n in sorted(self.broken.items(), key=lambda x: (-x[1], x[0]))]
+
+
+def write_report(path, reports):
+    # reports : [(nom du fichier source, nombre de liens vérifiés, LinkChecker.report())]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fout:
+        fout.write("source\tcible\traison\tindice\toccurrences\n")
+        for source, _, broken in reports:
+            for target, reason, hint, n in broken:
+                fout.write(f"{source}\t{target}\t{reason}\t{hint}\t{n}\n")
@@ -0,0 +1,157 @@
+# Recouvrement des entrées/sorties et du calcul pendant le rendu d'un fichier.
+#
+# Sans cela, chaque ligne lue attend le disque avant d'être extraite, et la page attend la fin de
+# l'extraction pour être écrite : sur un dossier de données monté par le réseau, la latence
+# s'ajoute au temps de calcul. Le rendu d'un fichier devient un pipeline à trois étages :
+#   lecture   prefetch() : un thread lit et découpe le fichier (tampon de READ_BUFFER octets) et
+#             passe les enregistrements par lots dans une file bornée ;
+#   extraction  le thread principal, ou les workers du pool pour un fichier découpé (ChunkStream) ;
+#   écriture  PageWriter : un thread écrit les fragments html au fil de l'eau, dans <page>.tmp
+#             renommé en <page> (os.replace) seulement si tout s'est bien passé : une erreur ne
+#             laisse jamais de page tronquée, la version précédente reste en place.
+# Les files sont bornées (QUEUE_DEPTH lots) : un étage plus rapide que le suivant attend au lieu
+# d'accumuler le fichier en mémoire. Les threads ne gagnent rien sur le calcul (GIL) mais libèrent
+# le GIL pendant les appels système : l'attente du disque est cachée derrière l'extraction.
+# Une exception dans un thread est relancée dans le thread principal.
+
+import os
+import queue
+import threading
+
+READ_BUFFER = 4 * 1024 * 1024
+QUEUE_DEPTH = 8
+BATCH = 256
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _put(q, item, stop):
+    # put bloquant, abandonné si le consommateur s'est arrêté
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def prefetch(iterable, batch=BATCH, depth=QUEUE_DEPTH):
+    """Parcourt `iterable` dans un thread et en rend les éléments dans l'ordre, avec au plus
+    `depth` lots de `batch` éléments d'avance."""
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def run():
+        try:
+            items = []
+            for item in iterable:
+                items.append(item)
+                if len(items) >= batch:
+                    if not _put(q, items, stop):
+                        return
+                    items = []
+            if items and not _put(q, items, stop):
+                return
+            _put(q, _END, stop)
+        except BaseException as e:
+            _put(q, _Failure(e), stop)
+
+    t = threading.Thread(target=run, name="prefetch", daemon=True)
+    t.start()
+    try:
+        while True:
+            items = q.get()
+            if items is _END:
+                break
+            if isinstance(items, _Failure):
+                raise items.exc
+            yield from items
+    finally:
+        # Sortie anticipée (exception, générateur abandonné) : le thread s'arrête au prochain lot
+        stop.set()
+        t.join()
+
+
+class PageWriter:
+    """Écrit une page dans un thread : write() met le texte en file, close() attend la fin de
+    l'écriture puis met la page en place. En cas d'erreur, le fichier temporaire est supprimé.
+
+        with PageWriter(out) as page:
+            page.write(header)
+            for frag in fragments: page.write(frag)
+    """
+
+    def __init__(self, path, batch=BATCH, depth=QUEUE_DEPTH):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+        self.batch = batch
+        self._items = []
+        self._q = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._error = None
+        self._fout = open(self.tmp_path, 'w', encoding='utf-8', buffering=READ_BUFFER)
+        self._thread = threading.Thread(target=self._run, name="page-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    items = self._q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if items is _END:
+                    break
+                self._fout.write("".join(items))
+        except BaseException as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            self._fout.close()
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, text):
+        self._items.append(text)
+        if len(self._items) >= self.batch:
+            self._check()
+            _put(self._q, self._items, self._stop)
+            self._items = []
+
+    def close(self):
+        if self._items:
+            _put(self._q, self._items, self._stop)
+            self._items = []
+        _put(self._q, _END, self._stop)
+        self._thread.join()
+        if self._error is not None:
+            self._discard()
+        self._check()
+        os.replace(self.tmp_path, self.path)
+
+    def _discard(self):
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Erreur pendant le rendu : on arrête l'écriture sans attendre la file
+            self._stop.set()
+            self._thread.join()
+            self._discard()
+        return False
@@ -0,0 +1,119 @@
+# Aperçus au survol des liens : début du texte de l'article cité, chargé à la demande.
+#
+# Pendant le rendu d'un code, PreviewSink garde les PREVIEW_CHARS premiers caractères de chaque
+# article et les répartit en K fichiers previews/<slug>/<i>.json, K étant choisi pour qu'un fichier
+# ne dépasse pas PREVIEW_SHARD_BYTES. L'article va dans le fichier fnv1a(clé) % K, où la clé est
+# preview_key(numéro) ("L. 111-1" -> "L111-1", "209 quater" -> "209-4"). previews/codes.json
+# donne K pour chaque code.
+#
+# Chaque lien vers un article de code porte la même clé, calculée par preview_key dans
+# inject_links (attribut data-key) : PREVIEW_SCRIPT la prend telle quelle, sans la recalculer.
+# Il charge le catalogue au premier survol, puis uniquement les fichiers des articles survolés
+# (gardés en mémoire).
+
+import json
+
+from src.article_ids import ArticleId
+from src.code_parser import ARTICLE, BODY
+
+PREVIEW_CHARS = 280
+PREVIEW_SHARD_BYTES = 32 * 1024
+
+
+def fnv1a(text):
+    # Hash 32 bits stable (le même est calculé en javascript dans PREVIEW_SCRIPT)
+    h = 0x811c9dc5
+    for b in text.encode('utf-8'):
+        h = ((h ^ b) * 0x01000193) & 0xffffffff
+    return h
+
+
+def preview_key(num):
+    # "L111-1", "209 quater", "1er" -> forme des liens sans point : "L111-1", "209-4", "1"
+    aid = ArticleId.parse(num)
+    return aid.format(dot=False) if aid is not None else num.replace(".", "").upper()
+
+
+class PreviewSink:
+    """Début du texte de chaque article d'un code, collecté pendant le rendu de sa page."""
+
+    def __init__(self, slug):
+        self.slug = slug
+        self.texts = {}
+        self._current = None
+
+    def add(self, rec, frag=None):
+        if rec['kind'] == ARTICLE:
+            self._current = preview_key(rec['num'])
+            self.texts.setdefault(self._current, "")
+        elif rec['kind'] == BODY and self._current is not None and rec['article'] is not None:
+            text = self.texts[self._current]
+            if len(text) < PREVIEW_CHARS:
+                text = (text + " " + rec['text'].strip()).strip()
+                if len(text) > PREVIEW_CHARS:
+                    text = text[:PREVIEW_CHARS].rsplit(" ", 1)[0] + " …"
+                self.texts[self._current] = text
+
+    def shards(self):
+        # Contenu des fichiers previews/<slug>/<i>.json : K dictionnaires clé -> texte
+        sizes = {key: len(key.encode('utf-8')) + len(text.encode('utf-8')) + 6 for key, text in self.texts.items()}
+        hashes = {key: fnv1a(key) for key in sizes}
+        # K le plus petit pour lequel aucun fichier ne dépasse la taille maximale
+        k = max(1, -(-sum(sizes.values()) // PREVIEW_SHARD_BYTES))
+        while True:
+            used = [0] * k
+            for key, size in sizes.items():
+                used[hashes[key] % k] += size
+            if max(used) <= PREVIEW_SHARD_BYTES or k >= len(sizes):
+                break
+            k += 1
+        shards = [{} for _ in range(k)]
+        for key, text in self.texts.items():
+            shards[hashes[key] % k][key] = text
+        return shards
+
+    def save(self, out_dir):
+        # Écrit previews/<slug>/<i>.json et renvoie le nombre de fichiers
+        shards = self.shards()
+        d = out_dir / self.slug
+        d.mkdir(parents=True, exist_ok=True)
+        for old in d.glob("*.json"):
+            old.unlink()
+        for i, shard in enumerate(shards):
+            with open(d / f"{i}.json", 'w', encoding='utf-8') as fout:
+                json.dump(shard, fout, ensure_ascii=False, separators=(',', ':'))
+        return len(shards)
+
+
+def write_preview_catalog(out_dir, entries):
+    # entries : [(slug, nombre de fichiers)] ; les codes d'un build partiel précédent sont conservés
+    path = out_dir / "codes.json"
+    catalog = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+    catalog.update(entries)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fout:
+        json.dump(dict(sorted(catalog.items())), fout, ensure_ascii=False, separators=(',', ':'))
+
+
+PREVIEW_SCRIPT = """<script>
+(() => {
+    const base = /\\/(codes|jorf)\\/[^\\/]*$/.test(location.pathname) ? '../previews/' : 'previews/';
+    const files = {};
+    const load = url => files[url] || (files[url] = fetch(url).then(r => r.ok ? r.json() : {}).catch(() => ({})));
+    const fnv1a = s => {
+        let h = 0x811c9dc5;
+        for (const b of new TextEncoder().encode(s)) h = Math.imul(h ^ b, 0x01000193) >>> 0;
+        return h;
+    };
+    document.addEventListener('mouseover', async e => {
+        const a = e.target.closest && e.target.closest('a[data^="fr_code_article:"]');
+        if (!a || a.dataset.preview !== undefined) return;
+        const [slug, art] = a.getAttribute('data').slice('fr_code_article:'.length).split('/');
+        const key = a.dataset.key;
+        const k = key && (await load(base + 'codes.json'))[slug];
+        if (!k) return;
+        const text = (await load(base + slug + '/' + (fnv1a(key) % k) + '.json'))[key];
+        if (text) a.dataset.preview = 'Art. ' + art + ' — ' + text;
+    });
+})();
+</script>"""
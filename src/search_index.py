@@ -0,0 +1,121 @@
+# Index de recherche côté navigateur pour le site statique (data/html/recherche.html).
+#
+# Le build écrit, au fil des pages :
+#   search/<slug>.json   un fichier par code : titre, page, numéros d'articles (qui sont aussi les
+#                        ancres de la page) et titres de sections avec l'article qui les suit
+#   search/codes.json    le catalogue : [slug, titre, page] pour chaque code
+# La page de recherche ne charge que le catalogue, puis le fichier du code nommé dans la requête
+# ("civil 1240", "L. 111-1 artisanat", "responsabilité civil") ; les fichiers déjà chargés restent
+# en mémoire. Aucune page de code n'est ouverte pour chercher.
+
+import json
+
+from src.code_parser import FRONTMATTER, HEADING, ARTICLE
+
+
+class SearchShard:
+    """Entrées de recherche d'un code, collectées pendant le rendu de sa page."""
+
+    def __init__(self, slug, page, title=None):
+        self.slug = slug
+        self.page = page
+        self.title = title or slug.replace("_", " ")
+        self.articles = []
+        self.headings = []    # [titre, ancre de l'article suivant ("" : haut de page)]
+        self._pending = []    # titres en attente du prochain article
+
+    def add(self, rec, frag=None):
+        kind = rec['kind']
+        if kind == FRONTMATTER and rec['data'].get('title'):
+            self.title = rec['data']['title']
+        elif kind == HEADING:
+            self._pending.append(rec['title'])
+        elif kind == ARTICLE:
+            self.articles.append(rec['num'])
+            self.headings.extend([t, rec['num']] for t in self._pending)
+            self._pending = []
+
+    def data(self):
+        # Contenu de search/<slug>.json (les titres en fin de page renvoient au haut de la page)
+        self.headings.extend([t, ""] for t in self._pending)
+        self._pending = []
+        return {'slug': self.slug, 'title': self.title, 'page': self.page,
+                'articles': self.articles, 'headings': self.headings}
+
+    def save(self, out_dir):
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with open(out_dir / f"{self.slug}.json", 'w', encoding='utf-8') as fout:
+            json.dump(self.data(), fout, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_catalog(out_dir, entries):
+    # entries : [(slug, titre, page)] dans l'ordre des fichiers ; les fichiers déjà présents
+    # (build partiel précédent) sont conservés
+    path = out_dir / "codes.json"
+    catalog = {}
+    if path.exists():
+        catalog = {slug: [slug, title, page] for slug, title, page in json.loads(path.read_text(encoding='utf-8'))}
+    for slug, title, page in entries:
+        catalog[slug] = [slug, title, page]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fout:
+        json.dump([catalog[s] for s in sorted(catalog)], fout, ensure_ascii=False, separators=(',', ':'))
+
+
+SEARCH_PAGE = """<h1>Recherche</h1>
+<p>Un numéro d'article, ou des mots d'un titre, suivis du nom du code (ex : <em>1240 civil</em>, <em>L. 111-1 artisanat</em>, <em>responsabilité pénal</em>).</p>
+<input id="q" type="search" autofocus style="width: 100%; font-size: 1.1em; padding: 8px;" placeholder="1240 civil">
+<ul id="results"></ul>
+<script>
+const norm = s => s.normalize('NFD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase();
+const artKey = s => norm(s).replace(/[\\s.]/g, '');
+const STOP = new Set(['article', 'articles', 'art', 'code', 'du', 'de', 'des', 'la', 'le', 'l', 'd']);
+let catalog = null;
+const shards = {};
+function shard(slug) {
+    if (!(slug in shards)) shards[slug] = fetch('search/' + slug + '.json').then(r => r.json());
+    return shards[slug];
+}
+function isCodeWord(w, slug, title) {
+    return w.length > 2 && !/\\d/.test(w) && (slug.split('_').includes(w) || norm(title).split(/[^a-z0-9]+/).includes(w));
+}
+async function search(q) {
+    catalog = catalog || await fetch('search/codes.json').then(r => r.json());
+    const words = norm(q).split(/[\\s,'’]+/).filter(w => w && !STOP.has(w));
+    const codes = catalog.filter(([slug, title]) => words.some(w => isCodeWord(w, slug, title)));
+    const terms = words.filter(w => !codes.some(([slug, title]) => isCodeWord(w, slug, title)));
+    const out = [];
+    if (!terms.length) {
+        for (const [slug, title, page] of codes) out.push([title, page]);
+        return out;
+    }
+    const key = artKey(terms.join(' '));
+    for (const [slug] of codes) {
+        const s = await shard(slug);
+        for (const num of s.articles) {
+            if (artKey(num).startsWith(key)) out.push([s.title + ' — Art. ' + num, s.page + '#' + encodeURIComponent(num)]);
+        }
+        for (const [title, anchor] of s.headings) {
+            const t = norm(title);
+            if (terms.every(w => t.includes(w))) out.push([s.title + ' — ' + title, s.page + (anchor ? '#' + encodeURIComponent(anchor) : '')]);
+        }
+    }
+    return out;
+}
+let pending = 0;
+document.getElementById('q').addEventListener('input', async e => {
+    const ticket = ++pending;
+    const q = e.target.value.trim();
+    const res = q ? await search(q) : [];
+    if (ticket !== pending) return;
+    const ul = document.getElementById('results');
+    ul.innerHTML = '';
+    if (q && !res.length) ul.innerHTML = '<li>Aucun résultat (le nom du code est-il dans la requête ?)</li>';
+    for (const [label, href] of res.slice(0, 100)) {
+        const li = document.createElement('li');
+        const a = document.createElement('a');
+        a.href = href; a.textContent = label;
+        li.appendChild(a); ul.appendChild(li);
+    }
+});
+</script>"""
@@ -0,0 +1,221 @@
+# Serveur local (bibliothèque standard uniquement) qui rend les pages à la demande
+# au lieu de pré-générer tout data/html.
+#   python src/serve_site.py --port 8000
+# puis ouvrir http://localhost:8000/
+#
+# Le moteur est chargé une seule fois. Chaque page est produite en lisant le fichier source
+# ligne par ligne ; les paragraphes déjà rendus viennent d'un cache LRU borné en taille,
+# indexé par le hash de leur contenu (un paragraphe répété ou inchangé n'est jamais ré-extrait).
+# Avec --cache-dir, ce cache est adossé au même stockage persistant que generate_full_site.
+# L'ETag d'une page dépend de la date et de la taille du fichier source et de l'empreinte du moteur
+# (qui couvre le contenu des codes : les plages data-range en dépendent). Un code ajouté, supprimé
+# ou modifié fait recharger le moteur (liste des codes, index des articles, empreinte) à la requête
+# suivante : les modifications sont visibles au rechargement, sans reconstruire le site.
+# Les threads du serveur partagent le moteur : un seul paragraphe est rendu à la fois (SiteServer.lock).
+#
+# Les aperçus (previews/...), l'index de recherche (search/...) et recherche.html sont servis comme
+# dans le site généré, à partir des seules sources des codes (sans extraction), gardés en mémoire
+# tant que le markdown ne change pas.
+
+import sys
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.generate_full_site import (LegalEngine, DocumentContext, HTML_HEADER, HTML_FOOTER, DIR_CODES,
+                                    discover_jorf_files, render_code_record, code_files,
+                                    iter_jorf_texts, render_jorf_text, render_cached)
+from src.code_parser import parse_code_file
+from src.extraction_cache import ExtractionCache
+from src.search_index import SearchShard, SEARCH_PAGE
+from src.previews import PreviewSink
+
+
+def code_signature():
+    # Nom, date et taille de chaque code : change dès qu'un code est ajouté, supprimé ou modifié
+    if not DIR_CODES.exists():
+        return ()
+    return tuple((f.name, f.stat().st_mtime_ns, f.stat().st_size) for f in sorted(DIR_CODES.glob("*.md")))
+
+
+class SiteServer(ThreadingHTTPServer):
+    def __init__(self, address, cache_chars, cache_path=None):
+        super().__init__(address, SiteHandler)
+        self.cache_chars, self.cache_path = cache_chars, cache_path
+        self.lock = threading.Lock()
+        self.sidecars = {}      # fichier md -> (date, taille, données de recherche, fichiers d'aperçus)
+        self.sources, self.engine, self.cache = None, None, None
+        self.refresh()
+
+    def refresh(self):
+        # Recharge le moteur si les codes ont changé depuis le dernier appel ; renvoie
+        # (moteur, cache, empreinte), à utiliser pour toute la page en cours
+        sources = code_signature()
+        with self.lock:
+            if sources != self.sources:
+                old = self.cache
+                self.engine = LegalEngine()
+                self.fingerprint = self.engine.fingerprint()
+                self.cache = ExtractionCache(self.fingerprint, self.cache_path, memory_chars=self.cache_chars)
+                self.sources = sources
+                if old is not None:
+                    old.close()
+            return self.engine, self.cache, self.fingerprint
+
+    def resolve(self, path):
+        # "/codes/civil.html" -> ('CODE', fichier md) ; "/jorf/jorf_2010.html" -> ('JORF', fichier csv, année)
+        parts = path.strip('/').split('/')
+        if len(parts) != 2 or not parts[1].endswith('.html'):
+            return None
+        stem = parts[1][:-len('.html')]
+        if parts[0] == 'codes':
+            f = DIR_CODES / f"{stem}.md"
+            if f.parent == DIR_CODES and f.exists():
+                return 'CODE', f, None
+        elif parts[0] == 'jorf':
+            for annee, f in discover_jorf_files():
+                if f.stem == stem:
+                    return 'JORF', f, annee
+        return None
+
+    def fragments(self, kind, f, annee, engine, cache):
+        meta = {'source': f.name, 'type': kind}
+        if kind == 'CODE':
+            meta['context'] = DocumentContext()
+        yield HTML_HEADER.replace("{title}", f.name)
+        if kind == 'CODE':
+            for rec in parse_code_file(f):
+                with self.lock:
+                    frag = render_code_record(rec, meta, engine, cache)
+                yield frag
+        else:
+            yield f"<h1>Journal Officiel {annee}</h1>"
+            for text in iter_jorf_texts(f):
+                with self.lock:
+                    frag = render_cached(cache, engine, meta, text, render_jorf_text)
+                yield frag
+        yield HTML_FOOTER
+
+    def index_page(self):
+        items = [f'<li><a href="/codes/{f.stem}.html">{f.stem}</a></li>' for f in sorted(DIR_CODES.glob("*.md"))]
+        items += [f'<li><a href="/jorf/{f.stem}.html">JORF {annee}</a></li>' for annee, f in discover_jorf_files()]
+        return (HTML_HEADER.replace("{title}", "Juriref") + '<h1>Juriref</h1><p><a href="/recherche.html">Recherche</a></p><ul>'
+                + "".join(items) + "</ul>" + HTML_FOOTER)
+
+    def code_sidecar(self, slug, f):
+        # (données de search/<slug>.json, contenu des fichiers previews/<slug>/<i>.json) d'un code
+        st = f.stat()
+        with self.lock:
+            known = self.sidecars.get(f)
+        if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+            return known[2:]
+        search, previews = SearchShard(slug, f"codes/{f.stem}.html"), PreviewSink(slug)
+        for rec in parse_code_file(f):
+            search.add(rec)
+            previews.add(rec)
+        value = (search.data(), previews.shards())
+        with self.lock:
+            self.sidecars[f] = (st.st_mtime_ns, st.st_size) + value
+        return value
+
+    def static_file(self, path):
+        # Contenu (str) de recherche.html, search/... ou previews/..., ou None
+        parts = path.strip('/').split('/')
+        if parts == ['recherche.html']:
+            return HTML_HEADER.replace("{title}", "Recherche") + SEARCH_PAGE + HTML_FOOTER
+        if parts[0] not in ('search', 'previews') or len(parts) not in (2, 3) or not parts[-1].endswith('.json'):
+            return None
+        files = code_files()
+        if parts[1:] == ['codes.json']:
+            if parts[0] == 'search':
+                data = [[slug, d['title'], d['page']] for slug, d in sorted((slug, self.code_sidecar(slug, f)[0]) for slug, f in files.items())]
+            else:
+                data = {slug: len(self.code_sidecar(slug, f)[1]) for slug, f in sorted(files.items())}
+        elif parts[0] == 'search' and len(parts) == 2 and parts[1][:-len('.json')] in files:
+            slug = parts[1][:-len('.json')]
+            data = self.code_sidecar(slug, files[slug])[0]
+        elif parts[0] == 'previews' and len(parts) == 3 and parts[1] in files and parts[2][:-len('.json')].isdigit():
+            shards = self.code_sidecar(parts[1], files[parts[1]])[1]
+            i = int(parts[2][:-len('.json')])
+            if i >= len(shards):
+                return None
+            data = shards[i]
+        else:
+            return None
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0 : la fin de la réponse est signalée par la fermeture de la connexion,
+    # ce qui permet d'envoyer la page au fil du rendu sans connaître sa taille.
+    protocol_version = "HTTP/1.0"
+
+    def send_body(self, body, content_type):
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path in ('/', '/index.html'):
+            self.send_body(self.server.index_page(), "text/html; charset=utf-8")
+            return
+        static = self.server.static_file(path)
+        if static is not None:
+            self.send_body(static, "text/html; charset=utf-8" if path.endswith('.html') else "application/json; charset=utf-8")
+            return
+
+        target = self.server.resolve(path)
+        if target is None:
+            self.send_error(404, "Page inconnue")
+            return
+        kind, f, annee = target
+        engine, cache, fingerprint = self.server.refresh()
+        st = f.stat()
+        etag = f'"{fingerprint[:16]}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(',')]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for frag in self.server.fragments(kind, f, annee, engine, cache):
+            self.wfile.write(frag.encode('utf-8'))
+
+    def log_message(self, fmt, *args):
+        st = self.server.cache.stats()
+        sys.stderr.write(f"{self.address_string()} {fmt % args} (cache {st['hits_memory'] + st['hits_disk']} hits / {st['misses']} misses)\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rend les pages juridiques à la demande.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-mb", type=int, default=64, help="taille maximale du cache de paragraphes (millions de caractères)")
+    parser.add_argument("--cache-dir", type=Path, help="réutiliser le cache persistant de generate_full_site (ex: data/cache)")
+    args = parser.parse_args(argv)
+
+    cache_path = args.cache_dir / "extraction.sqlite" if args.cache_dir else None
+    server = SiteServer((args.host, args.port), args.cache_mb * 1024 * 1024, cache_path)
+    print(f"Serveur prêt sur http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.cache.close()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
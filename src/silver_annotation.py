@@ -0,0 +1,162 @@
+# Annotation "silver" du corpus avec LegalEngine, pour entraîner un modèle NER (echec 2/main.py).
+#
+# LegalEngine est exposé comme composant spaCy ("legal_engine") : il remplit doc.ents avec
+# exactement les entités que le site transforme en liens (mêmes règles, même résolution des
+# chevauchements que inject_links), et range la cible du lien dans span.kb_id_.
+#   nlp = spacy.blank("fr"); nlp.add_pipe("legal_engine")
+#
+# En ligne de commande, les codes et le JORF sont annotés en parallèle (une tâche par fichier) et
+# écrits en fichiers DocBin de taille fixe :
+#   python src/silver_annotation.py --out data/silver --jobs 4
+#   python src/silver_annotation.py --codes civil penal --years 2010-2015
+# Les documents sont lus dans les sources comme le site les rend (extract_jsonl.iter_source_entries) :
+# même texte (champ le plus long d'une ligne du JORF, paragraphe tel quel d'un code) et contexte
+# remis à zéro à chaque titre. Les entités d'un document sont donc exactement les liens de son
+# paragraphe sur le site, ce que corpus_brut.jsonl (texte nettoyé, colonne 5 du JORF, sans titres)
+# ne permet pas. Les annotations ne dépendent ni du nombre de processus ni de l'ordre d'exécution.
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import spacy
+from spacy.language import Language
+from spacy.tokens import DocBin
+from spacy.util import filter_spans
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.generate_full_site import LegalEngine, BASE_DIR, linked_entities, select_inputs, parse_years
+from src.extract_jsonl import iter_source_entries, extract_entry
+
+DIR_SILVER = BASE_DIR / "data" / "silver"
+
+# Tags du moteur -> labels du NER (ceux de NERTrainer.entity_types)
+DEFAULT_LABELS = {'ART': 'ARTICLE_NUM', 'CODE': 'CODE_NAME', 'LOI': 'LOI_NAME', 'LIVRE': 'LIVRE'}
+
+
+class LegalEngineComponent:
+    """Composant spaCy qui remplace doc.ents par les entités liées de LegalEngine.
+
+    Le type de document et le contexte (comme le `meta` de LegalEngine.extract) peuvent être passés
+    dans doc.user_data["legal_meta"] ; sans lui, le texte est traité comme une ligne du JORF.
+    """
+
+    def __init__(self, labels=None, engine=None):
+        self.labels = dict(DEFAULT_LABELS, **(labels or {}))
+        self.engine = engine or LegalEngine()
+
+    def __call__(self, doc):
+        meta = doc.user_data.pop("legal_meta", None) or {'type': 'JORF'}
+        linked = linked_entities(extract_entry(self.engine, doc.text, meta))
+        split_at_bounds(doc, {b for e, _ in linked for b in e['span']})
+        spans = []
+        for e, data in linked:
+            start, end = e['span']
+            label = self.labels.get(e['tag'], e['tag'])
+            # Alignement sur les tokens : d'abord les tokens entièrement couverts, sinon tous ceux touchés
+            span = (doc.char_span(start, end, label=label, kb_id=data, alignment_mode="contract")
+                    or doc.char_span(start, end, label=label, kb_id=data, alignment_mode="expand"))
+            if span is not None:
+                spans.append(span)
+        doc.ents = filter_spans(spans)
+        return doc
+
+
+def split_at_bounds(doc, bounds):
+    # Coupe les tokens qui contiennent une borne d'entité : "435,465" (un seul token pour le
+    # tokenizer) porte deux liens sur le site, il devient "435", ",", "465"
+    with doc.retokenize() as retokenizer:
+        for token in doc:
+            cuts = sorted(b - token.idx for b in bounds if token.idx < b < token.idx + len(token.text))
+            if cuts:
+                pieces = [token.text[i:j] for i, j in zip([0] + cuts, cuts + [len(token.text)])]
+                retokenizer.split(token, pieces, heads=[(token, 0)] * len(pieces))
+
+
+@Language.factory("legal_engine", default_config={"labels": {}})
+def make_legal_engine(nlp, name, labels):
+    return LegalEngineComponent(labels)
+
+
+# Pipeline propre à chaque processus (créé une fois par worker)
+_WORKER = {}
+
+def init_worker(lang="fr"):
+    nlp = spacy.blank(lang)
+    nlp.add_pipe("legal_engine")
+    _WORKER['nlp'] = nlp
+
+def annotate_file(name, kind, f, out_dir, docs_per_file):
+    # Annote un code ou un csv du JORF et l'écrit en silver-<nom>-<n>.spacy ; renvoie (nom, fichiers, paragraphes, secondes)
+    nlp = _WORKER['nlp']
+    t0 = time.perf_counter()
+    files, lines = [], 0
+    db = DocBin(attrs=["ENT_IOB", "ENT_TYPE", "ENT_KB_ID"])
+
+    def flush():
+        path_out = out_dir / f"silver-{name}-{len(files):03d}.spacy"
+        db.to_disk(path_out)
+        files.append((path_out.name, len(db)))
+
+    for _, text, meta in iter_source_entries(kind, f):
+        doc = nlp.make_doc(text)
+        doc.user_data["legal_meta"] = meta
+        db.add(nlp(doc))
+        lines += 1
+        if len(db) >= docs_per_file:
+            flush()
+            db = DocBin(attrs=["ENT_IOB", "ENT_TYPE", "ENT_KB_ID"])
+    if len(db) or not files:
+        flush()
+    return name, files, lines, time.perf_counter() - t0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Annote les codes et le JORF avec LegalEngine et écrit des DocBin silver.")
+    parser.add_argument("--codes", nargs="+", metavar="NOM", help="noms de fichiers de codes sans extension (ex: civil penal)")
+    parser.add_argument("--years", type=parse_years, metavar="ANNÉES", help="années du JORF : 2010, 2010-2015 ou 2008,2010-2012")
+    parser.add_argument("--glob", dest="pattern", metavar="MOTIF", help="motif sur le nom de fichier (ex: 'jorf_201*')")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--codes-only", action="store_true", help="ne traiter que les codes")
+    group.add_argument("--jorf-only", action="store_true", help="ne traiter que le JORF")
+    parser.add_argument("--out", type=Path, default=DIR_SILVER, help="dossier des fichiers .spacy")
+    parser.add_argument("--jobs", type=int, default=1, help="nombre de processus")
+    parser.add_argument("--docs-per-file", type=int, default=5000, help="documents maximum par fichier DocBin")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    code_files, jorf_files = select_inputs(set(args.codes or ()), args.years,
+                                           args.pattern, args.codes_only, args.jorf_only)
+    tasks = [(f.stem, 'CODE', f) for f in code_files] + [(f.stem, 'JORF', f) for _, f in jorf_files]
+    if not tasks:
+        print("Aucun fichier ne correspond aux sélecteurs.")
+        return
+    args.out.mkdir(parents=True, exist_ok=True)
+    tasks = [(*t, args.out, args.docs_per_file) for t in tasks]
+    t0 = time.perf_counter()
+    total = 0
+
+    def done(name, files, lines, seconds):
+        nonlocal total
+        total += lines
+        print(f"✅ {name} : {lines} paragraphes en {seconds:.1f}s ({lines / seconds if seconds else 0:.0f} paragraphes/s), {len(files)} fichiers")
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker) as pool:
+            for fut in as_completed([pool.submit(annotate_file, *t) for t in tasks]):
+                done(*fut.result())
+    else:
+        init_worker()
+        for t in tasks:
+            done(*annotate_file(*t))
+
+    elapsed = time.perf_counter() - t0
+    print(f"📄 {total} paragraphes annotés en {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} paragraphes/s) dans {args.out}")
+
+
+if __name__ == "__main__":
+    main()
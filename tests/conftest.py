@@ -0,0 +1,24 @@
+import re
+import sys
+import html
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import src.generate_full_site as site
+
+
+@pytest.fixture(scope="session")
+def engine():
+    return site.LegalEngine()
+
+
+def real_paragraphs(name):
+    # Paragraphes d'un code, relus dans la page html versionnée (data/html/codes), faute de markdown
+    page = ROOT / "data" / "html" / "codes" / f"{name}.html"
+    if not page.exists():
+        pytest.skip(f"{page} absent")
+    return [html.unescape(re.sub(r"<[^>]+>", "", p)) for p in re.findall(r"<p>(.*?)</p>", page.read_text(encoding="utf-8"), re.S)]
@@ -0,0 +1,115 @@
+# Le site ne dépend pas de la façon dont il est construit : en série, en parallèle avec des fichiers
+# découpés en morceaux, en parts (--shard puis --merge), avec un cache vide ou plein.
+import json
+import shutil
+
+import pytest
+
+import src.generate_full_site as site
+from src.build_report import SLOW_LINES
+from src.pipeline import PageWriter
+from tools import synth_corpus
+
+# Le rapport de ressources (temps, mémoire) et le cache changent d'un build à l'autre
+VOLATILE = ("rapport_build",)
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    # Quelques codes et deux années du JORF, dont des lignes assez longues pour l'extraction fenêtrée
+    root = tmp_path_factory.mktemp("synth")
+    synth_corpus.main(["--out", str(root), "--codes", "3", "--articles", "150", "--years", "2", "--rows", "200",
+                       "--density", "1", "--no-harvest", "--adversarial", "long-rows", "--adversarial-rate", "0.02",
+                       "--long-chars", "30000"])
+    return root
+
+
+@pytest.fixture
+def build(corpus, tmp_path, monkeypatch):
+    # build(nom, *options) : construit le site dans une copie des entrées, renvoie sa racine
+    for name in ("DIR_CODES", "DIR_JORF", "DIR_OUTPUT", "DIR_CACHE", "DIR_GRAPH"):
+        monkeypatch.setattr(site, name, getattr(site, name))
+    roots = {}
+
+    def run(name, *options):
+        root = roots.get(name)
+        if root is None:
+            root = roots[name] = tmp_path / name
+            for d in ("codes", "jorf_2023_1990"):
+                shutil.copytree(corpus / d, root / d)
+        site.main(["--data", str(root), *options])
+        return root
+    return run
+
+
+def outputs(root):
+    # {chemin relatif: contenu} du site et du graphe des citations
+    files = {}
+    for d in ("html", "graph"):
+        for f in sorted((root / d).rglob("*")):
+            if f.is_file() and not f.name.startswith(VOLATILE):
+                files[f.relative_to(root).as_posix()] = f.read_bytes()
+    return files
+
+
+def report(root):
+    return json.loads((root / "html" / "rapport_build.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def serial(build):
+    return outputs(build("serial", "--no-cache"))
+
+
+def test_corpus_is_windowed(corpus):
+    longest = max(len(t) for f in (corpus / "jorf_2023_1990").glob("*.csv") for t in site.iter_jorf_texts(f))
+    assert longest > site.WINDOW_SIZE
+
+
+def test_chunked_parallel_equals_serial(build, serial):
+    root = build("chunked", "--no-cache", "--jobs", "2", "--chunk-mb", "0.01")
+    assert any(f.get('chunks') for f in report(root)['per_file'])
+    assert outputs(root) == serial
+
+
+def test_shards_then_merge_equal_serial(build, serial):
+    for i in (1, 2, 3):
+        root = build("shards", "--no-cache", "--shard", f"{i}/3")
+    assert not (root / "html" / "rapport_build.json").exists()
+    build("shards", "--merge")
+    assert report(root)['shards'] == 3
+    assert outputs(root) == serial
+
+
+def test_cache_hit_equals_miss(build, serial):
+    cold = build("cache")
+    assert report(cold)['cache']['misses'] > 0
+    assert outputs(cold) == serial
+    warm = build("cache")
+    assert report(warm)['cache']['misses'] == 0
+    assert outputs(warm) == serial
+
+
+def test_report_keeps_slowest_dense_lines(build, monkeypatch):
+    # Budget abaissé : beaucoup de lignes passent par le détecteur simplifié, le rapport n'en garde que les plus lentes
+    monkeypatch.setattr(site, "LINE_MATCH_BUDGET", 20)
+    rep = report(build("dense", "--no-cache"))
+    slow = rep['slow_lines']
+    assert rep['budget_lines'] > len(slow) == SLOW_LINES
+    assert [l['seconds'] for l in slow] == sorted((l['seconds'] for l in slow), reverse=True)
+    assert sum(f['budget_lines'] for f in rep['per_file']) == rep['budget_lines']
+
+
+def test_failed_render_keeps_previous_page(tmp_path):
+    out = tmp_path / "civil.html"
+    out.write_text("ancienne page", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with PageWriter(out, batch=2) as page:
+            for i in range(10):
+                page.write(f"<p>{i}</p>")
+            raise RuntimeError("rendu interrompu")
+    assert out.read_text(encoding="utf-8") == "ancienne page"
+    assert [f.name for f in tmp_path.iterdir()] == ["civil.html"]
+    with PageWriter(out, batch=2) as page:
+        page.write("nouvelle page")
+    assert out.read_text(encoding="utf-8") == "nouvelle page"
@@ -0,0 +1,17 @@
+# Options de la ligne de commande
+import pytest
+
+import src.generate_full_site as site
+
+
+def test_years():
+    assert site.parse_args(["--years", "2008, 2010-2012"]).years == {2008, 2010, 2011, 2012}
+    assert site.parse_args([]).years is None
+
+
+@pytest.mark.parametrize("spec", ["2010-", "abc", "2015-2010", ""])
+def test_invalid_years_is_a_usage_error(spec, capsys):
+    with pytest.raises(SystemExit) as exc:
+        site.parse_args(["--years", spec])
+    assert exc.value.code == 2
+    assert "--years" in capsys.readouterr().err
@@ -0,0 +1,95 @@
+# Contexte du document : extraction fenêtrée équivalente à l'extraction d'un seul tenant
+import shutil
+
+import pytest
+
+import src.generate_full_site as site
+from src.generate_full_site import DocumentContext, link_target, inject_links
+from conftest import real_paragraphs
+
+
+@pytest.mark.parametrize("name", ["civil", "penal", "energie"])
+@pytest.mark.parametrize("kind", ["JORF", "CODE"])
+@pytest.mark.parametrize("size", [site.WINDOW_SIZE, 2000])
+def test_windowed_equals_whole_text(engine, monkeypatch, name, kind, size):
+    monkeypatch.setattr(site, "LINE_MATCH_BUDGET", float("inf"))
+    text = " ".join(real_paragraphs(name))[:300000]
+    meta = {'type': kind, 'source': f"{name}.md"}
+    whole_ctx, windowed_ctx = DocumentContext(), DocumentContext()
+    whole = engine.extract(text, dict(meta, context=whole_ctx))
+    windowed = engine.extract_windowed(text, dict(meta, context=windowed_ctx), size=size)
+    assert len(text) > 40 * size
+    assert windowed == whole
+    assert windowed_ctx.key() == whole_ctx.key()
+
+
+@pytest.mark.parametrize("size", [site.WINDOW_SIZE, 2000])
+def test_windowed_keeps_match_longer_than_overlap(engine, monkeypatch, size):
+    # Énumération de 800 articles (~6000 caractères, bien plus que WINDOW_OVERLAP) dans une ligne du
+    # JORF de 13,7k caractères : aucune coupure ne tombe dans la correspondance de re_art
+    monkeypatch.setattr(site, "LINE_MATCH_BUDGET", float("inf"))
+    items = [f"L{n}-1" for n in range(100, 900)]
+    enum = "Les articles " + ", ".join(items[:-1]) + " et " + items[-1] + " du code civil."
+    text = "Vu le décret. " * 550 + enum + " Fait à Paris."
+    assert len(text) > 13700 and len(enum) > 5 * site.WINDOW_OVERLAP
+    meta = {'type': 'JORF', 'source': 'jorf_2010.csv'}
+    whole = engine.extract(text, dict(meta, context=DocumentContext()))
+    windowed = engine.extract_windowed(text, dict(meta, context=DocumentContext()), size=size)
+    assert sum(e['tag'] == 'ART' for e in whole) == 800
+    assert windowed == whole
+    assert inject_links(text, windowed) == inject_links(text, whole)
+
+
+def links(engine, context, text):
+    return [link_target(e) for e in engine.extract(text, {'type': 'JORF', 'source': 'x', 'context': context}) if e['tag'] == 'ART']
+
+
+def test_fallback_skips_article_naming_another_code(engine):
+    context = DocumentContext()
+    links(engine, context, "Conformément à la loi n° 89-1008 du 31 décembre 1989, article 12.")
+    assert links(engine, context, "l'article L. 321-21-1 du code rural et de la pêche maritime") == [None]
+    assert links(engine, context, "les articles L. 1 et L. 2 du code rural et de la pêche maritime") == [None, None]
+    assert links(engine, context, "l'article 7") == ["fr_loi_article:89_1008_31_decembre_1989/7"]
+
+
+def test_backward_propagation_keeps_law_parent(engine):
+    context = DocumentContext()
+    found = links(engine, context, "les articles 3 et 4 de la loi n° 89-1008 du 31 décembre 1989")
+    assert found == ["fr_loi_article:89_1008_31_decembre_1989/3", "fr_loi_article:89_1008_31_decembre_1989/4"]
+    # Une loi n'est pas un code pour la suite du document
+    assert context.code is None
+
+
+def test_article_inside_law_mention_does_not_take_it_as_parent(engine):
+    # Paragraphe du code civil : re_loi lit "la convention de rechargement ... à l'article 2019" comme
+    # une loi qui contient l'article 2372-2 ; elle ne devient pas son parent
+    text = ("A peine de nullité, la convention de rechargement établie selon les dispositions de l'article "
+            "2372-2 est enregistrée sous la forme prévue à l'article 2019. La date d'enregistrement "
+            "détermine, entre les créanciers inscrits, leur rang.")
+    assert links(engine, DocumentContext(), text) == [None]
+    ents = engine.extract(text, {'type': 'CODE', 'source': 'civil.md', 'context': DocumentContext()})
+    assert [link_target(e) for e in ents if e['tag'] == 'ART'] == ["fr_code_article:civil/2372-2"]
+    # Ni par propagation arrière depuis l'article suivant, dont elle est le parent direct (code pénal)
+    text = ("Dans le cas où les crimes et délits prévus par les articles 222-8, 222-10 ou 222-12 sont commis à "
+            "l'étranger sur une victime mineure résidant habituellement sur le territoire français, la loi "
+            "française est applicable par dérogation aux dispositions de l'article 113-7. S'il s'agit d'un "
+            "délit, les dispositions de la seconde phrase de l'article 113-8 ne sont pas applicables.")
+    found = links(engine, DocumentContext(), text)
+    assert found[-2] is None
+    assert found[-1].startswith("fr_loi_article:francaise_est_applicable")
+
+
+def test_fingerprint_follows_code_content_not_dates(tmp_path, monkeypatch):
+    codes = tmp_path / "codes"
+    codes.mkdir()
+    (codes / "civil.md").write_text("---\ntitle: Code civil\n---\n**Art. 1**\nTexte.\n", encoding="utf-8")
+    monkeypatch.setattr(site, "DIR_CODES", codes)
+    before = site.LegalEngine().fingerprint()
+
+    copy = tmp_path / "copie"
+    shutil.copytree(codes, copy, copy_function=shutil.copy)
+    monkeypatch.setattr(site, "DIR_CODES", copy)
+    assert site.LegalEngine().fingerprint() == before
+
+    (copy / "civil.md").write_text("---\ntitle: Code civil\n---\n**Art. 1**\nTexte.\n**Art. 2**\nTexte.\n", encoding="utf-8")
+    assert site.LegalEngine().fingerprint() != before
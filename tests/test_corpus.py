@@ -0,0 +1,43 @@
+# Corpus découpé en blocs (extract_jsonl) : mêmes entités quelle que soit la taille des blocs
+import json
+
+from src.extract_jsonl import corpus_chunks, iter_corpus_paragraphs
+
+
+def write_corpus(path):
+    # Deux codes puis des lignes du JORF, en alternance ; dans un code, "l'article N du même code"
+    # reprend le code cité dans les lignes précédentes (contexte du document)
+    lines = []
+    for k in range(6):
+        for source, code in (("civil.md", "code pénal"), ("penal.md", "code civil")):
+            lines.append({'text': f"Selon l'article {k} du {code}.", 'meta': {'source': source, 'type': 'CODE'}})
+            lines += [{'text': f"Voir l'article {k}{i} du même code.", 'meta': {'source': source, 'type': 'CODE'}} for i in range(1, 5)]
+        lines.append({'text': f"Vu l'article {k} et la loi n° 2010-{k}.", 'meta': {'source': 'jorf_2010.csv', 'type': 'JORF'}})
+    with open(path, 'w', encoding='utf-8') as fout:
+        for entry in lines:
+            fout.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return len(lines)
+
+
+def extract_all(engine, path, lines_per_chunk):
+    return [rec for chunk in corpus_chunks(path, lines_per_chunk) for rec in iter_corpus_paragraphs(path, *chunk, engine)]
+
+
+def test_chunks_cover_corpus(tmp_path):
+    path = tmp_path / "corpus_brut.jsonl"
+    total = write_corpus(path)
+    for size in (1, 3, 7, 1000):
+        chunks = corpus_chunks(path, size)
+        assert chunks[0][0] == 0 and chunks[-1][1] == path.stat().st_size
+        assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+        assert chunks[0][2] == 1 and len({c[2] for c in chunks}) == len(chunks) <= total
+
+
+def test_entities_do_not_depend_on_chunk_size(engine, tmp_path):
+    path = tmp_path / "corpus_brut.jsonl"
+    write_corpus(path)
+    whole = extract_all(engine, path, 1000)
+    # Le contexte traverse bien les lignes d'un code
+    assert any(e.get('code') == "pénal" for rec in whole[1:5] for e in rec['entities'])
+    for size in (1, 2, 3, 7):
+        assert extract_all(engine, path, size) == whole
@@ -0,0 +1,37 @@
+# Test différentiel : moteur de référence d'une révision antérieure, empreinte des moteurs
+import src.generate_full_site as site
+from src.diff_engines import Side, module_sources
+
+LEGACY = '''import re
+from legacy.helpers import slugify
+
+class LegalEngine:
+    # Comme avant le contexte du document : ni DocumentContext, ni extract_windowed, ni slow_lines
+    def extract(self, text, meta=None):
+        assert 'context' not in (meta or {})
+        return [{'tag': 'ART', 'article': m.group(1), 'code': 'civil', 'span': m.span()} for m in re.finditer(r"article (\\d+)", text)]
+
+def inject_links(text, entities):
+    return slugify(text)
+'''
+
+
+def test_reference_without_context_or_windowed_extraction(tmp_path):
+    pkg = tmp_path / "legacy"
+    pkg.mkdir()
+    (pkg / "engine.py").write_text(LEGACY, encoding="utf-8")
+    (pkg / "helpers.py").write_text("def slugify(t):\n    return t.lower()\n", encoding="utf-8")
+    (pkg / "unused.py").write_text("X = 1\n", encoding="utf-8")
+    side = Side("legacy.engine:LegalEngine", tmp_path)
+    side.new_context()
+    side.see_heading("Livre Ier")
+    ents, html, slow = side.run("Vu l'article 12.", {'type': 'JORF', 'source': 'jorf_2010.csv'})
+    assert ents == [{'tag': 'ART', 'article': '12', 'code': 'civil', 'span': [5, 15]}]
+    assert html == "vu l'article 12." and not slow
+    assert [f.name for f in module_sources(side.module)] == ["engine.py", "helpers.py"]
+
+
+def test_fingerprint_covers_engine_imports_only():
+    names = {f.name for f in module_sources(site)}
+    assert {"generate_full_site.py", "code_parser.py", "article_ids.py"} <= names
+    assert not names & {"diff_engines.py", "serve_site.py", "extract_jsonl.py"}
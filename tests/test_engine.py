@@ -0,0 +1,72 @@
+# Entrées adverses du moteur : coût linéaire, budget déterministe, parents et liens
+import re
+import time
+
+import src.generate_full_site as site
+from src.generate_full_site import inject_links
+from src.code_parser import ARTICLE
+from src.previews import PreviewSink
+
+
+def best_time(fn, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def test_parent_dense_line_is_linear(engine, monkeypatch):
+    # "code civil article 1 " répété : chaque article a un parent juste avant lui
+    monkeypatch.setattr(site, "LINE_MATCH_BUDGET", float("inf"))
+    small = best_time(engine.extract, "code civil article 1 " * 2000)
+    large = best_time(engine.extract, "code civil article 1 " * 8000)
+    # 4x plus long : ~4x en linéaire, ~16x en quadratique
+    assert large / small < 8
+
+
+def test_dense_links_injection_is_linear(engine, monkeypatch):
+    monkeypatch.setattr(site, "LINE_MATCH_BUDGET", float("inf"))
+    render = lambda text: inject_links(text, engine.extract(text))
+    small = best_time(render, "article 1 du code civil " * 2000)
+    large = best_time(render, "article 1 du code civil " * 8000)
+    assert large / small < 8
+
+
+def test_nearest_parent(engine):
+    def targets(text):
+        return [(e['article'], e['code']) for e in engine.extract(text) if e['tag'] == 'ART']
+
+    assert targets("l'article 5 du code civil") == [("5", "civil")]
+    assert targets("code civil, article 5") == [("5", "civil")]
+    # Parent qui finit avant l'article prioritaire sur celui qui commence après
+    assert targets("code pénal article 5 du code civil") == [("5", "pénal")]
+    # Au-delà de 120 caractères, pas de parent
+    assert targets("code civil" + " x" * 80 + " article 5") == [("5", "INCONNU")]
+
+
+def test_livre_attached_to_following_code(engine):
+    livres = [e for e in engine.extract("Livre II du code civil et Livre III du code pénal") if e['tag'] == 'LIVRE']
+    assert [(e['val'], e['code']) for e in livres] == [("II", "civil"), ("III", "pénal")]
+
+
+def test_match_budget_is_deterministic(engine, monkeypatch):
+    # Au-delà du budget, la ligne passe par le détecteur simplifié, quelle que soit la charge
+    monkeypatch.setattr(site, "LINE_MATCH_BUDGET", 10)
+    text = "article 1 du code civil " * 50
+    slow = engine.budget_exceeded
+    first = engine.extract(text)
+    assert engine.budget_exceeded == slow + 1
+    assert engine.slow_lines[0]['length'] == len(text)
+    assert first == engine.extract(text) == engine._extract_simple(text)
+
+
+def test_link_carries_preview_key(engine):
+    # La clé de l'aperçu est calculée en python pour le lien et pour l'article : "L111.2" cité et
+    # "L. 111-2" en en-tête donnent la même (le javascript en retirant les points obtenait "L1112")
+    sink = PreviewSink("civil")
+    sink.add({'kind': ARTICLE, 'num': "L. 111-2"})
+    html = inject_links("l'article L111.2 du code civil", engine.extract("l'article L111.2 du code civil"))
+    assert re.findall(r'data="fr_code_article:civil/([^"]+)" data-key="([^"]+)"', html) == [("L111.2", "L111-2")]
+    assert list(sink.texts) == ["L111-2"]
@@ -0,0 +1,51 @@
+# Plages d'articles : html compact (deux bornes), membres relus par le graphe et le vérificateur de liens
+import re
+
+import pytest
+
+import src.generate_full_site as site
+from src.generate_full_site import inject_links, slugify
+from src.citation_graph import GraphBuilder
+from src.link_check import LinkChecker
+
+# Articles L1 à L300 du code civil, sans les multiples de 7
+MISSING = {n for n in range(1, 301) if n % 7 == 0}
+
+
+@pytest.fixture
+def range_engine(tmp_path, monkeypatch):
+    body = "\n".join(f"**Art. L{n}**\nTexte de l'article {n}.\n" for n in range(1, 301) if n not in MISSING)
+    (tmp_path / "civil.md").write_text("---\ntitle: Code civil\n---\n## Partie législative\n" + body, encoding="utf-8")
+    monkeypatch.setattr(site, "DIR_CODES", tmp_path)
+    return site.LegalEngine()
+
+
+def test_range_html_keeps_bounds(range_engine):
+    text = "les articles L10 à L250 du code civil"
+    ents = range_engine.extract(text)
+    closing = [e for e in ents if e.get('range')]
+    assert len(closing) == 1
+    members = closing[0]['range']
+    assert members[0] == "L11" and members[-1] == "L249"
+    assert len(members) == sum(1 for n in range(11, 250) if n not in MISSING)
+    html = inject_links(text, ents)
+    assert re.findall(r'data-range="([^"]+)"', html) == ["L11 L249"]
+
+
+def test_range_members_reach_graph_and_checker(range_engine):
+    text = "les articles L10 à L250 du code civil"
+    ents = range_engine.extract(text)
+    members = next(e['range'] for e in ents if e.get('range'))
+    html = inject_links(text, ents)
+
+    graph = GraphBuilder(range_engine.article_index)
+    graph.add_html("fr_code_article:civil/L1", html)
+    cited = {graph.names[d] for d in graph.dst}
+    assert {f"fr_code_article:civil/{m}" for m in members} <= cited
+    assert {"fr_code_article:civil/L10", "fr_code_article:civil/L250"} <= cited
+
+    checker = LinkChecker(range_engine.article_index, slugify)
+    checker.check_html(html)
+    links = len(re.findall(r'<a data="', html))
+    assert checker.checked == links + len(members)
+    assert not checker.broken
@@ -0,0 +1,49 @@
+# Serveur local : mêmes aperçus et index de recherche que le site généré, ETag qui suit les codes
+import threading
+import urllib.request
+
+import pytest
+
+import src.generate_full_site as site
+import src.serve_site as serve
+
+CIVIL = "---\ntitle: Code civil\n---\n## Livre Ier\n**Art. 1**\nVoir l'article 2.\n**Art. 2**\nTexte de l'article 2.\n"
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    # (racine des données, get(chemin) -> (ETag, contenu)) ; site généré dans racine/html
+    for name in ("DIR_CODES", "DIR_JORF", "DIR_OUTPUT", "DIR_CACHE", "DIR_GRAPH"):
+        monkeypatch.setattr(site, name, getattr(site, name))
+    (tmp_path / "codes").mkdir()
+    (tmp_path / "jorf_2023_1990").mkdir()
+    (tmp_path / "codes" / "civil.md").write_text(CIVIL, encoding="utf-8")
+    site.main(["--data", str(tmp_path), "--no-cache"])
+    monkeypatch.setattr(serve, "DIR_CODES", site.DIR_CODES)
+    server = serve.SiteServer(("127.0.0.1", 0), 10**6)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def get(path):
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as r:
+            return r.headers["ETag"], r.read()
+    yield tmp_path, get
+    server.shutdown()
+    server.server_close()
+
+
+def test_serves_search_and_previews_like_the_build(served):
+    root, get = served
+    for path in ("search/codes.json", "search/civil.json", "previews/codes.json", "previews/civil/0.json"):
+        assert get("/" + path)[1] == (root / "html" / path).read_bytes()
+    assert get("/recherche.html")[1] == (root / "html" / "recherche.html").read_bytes()
+    assert get("/codes/civil.html")[1] == (root / "html" / "codes" / "civil.html").read_bytes()
+
+
+def test_etag_follows_code_index(served):
+    root, get = served
+    before, page = get("/codes/civil.html")
+    assert get("/codes/civil.html")[0] == before
+    # Un autre code ajouté change l'index des articles (et les regexps) : la page doit être refaite
+    (root / "codes" / "penal.md").write_text("---\ntitle: Code pénal\n---\n**Art. 1**\nTexte.\n", encoding="utf-8")
+    after, page_after = get("/codes/civil.html")
+    assert after != before and page_after == page
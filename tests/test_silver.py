@@ -0,0 +1,61 @@
+# Annotation silver : les entités de chaque document sont exactement les liens de son paragraphe sur le site
+import re
+
+import pytest
+
+pytest.importorskip("spacy")
+
+import src.generate_full_site as site
+from src.extract_jsonl import iter_source_entries
+
+# "du même code" reprend le code pénal dans la section, plus après le titre suivant (see_heading) ;
+# "435,465" est un seul token pour spaCy mais deux liens sur le site
+CIVIL = """---
+title: Code civil
+---
+## Livre Ier
+**Art. 1**
+Voir l'article 131-1 du code pénal.
+**Art. 2**
+Voir aussi l'article 131-2 du même code.
+## Livre II
+**Art. 3**
+Voir l'article 131-3 du même code, et les articles 435,465 et 494-9.
+"""
+# Le texte retenu d'une ligne du JORF est son champ le plus long, pas la 6e colonne
+JORF = "1|2010-01-01|x|y|z|court|Vu l'article L. 111-1 du code civil et les articles 1240,1241 du même code.\n"
+
+
+def site_links(page):
+    return [re.findall(r'<a data="([^"]+)"', p) for p in re.findall(r"<(?:p|div class='jorf-article')>(.*?)</(?:p|div)>", page, re.S)
+            if not p.startswith("<strong>")]
+
+
+def test_silver_entities_are_site_links(tmp_path, monkeypatch):
+    for name in ("DIR_CODES", "DIR_JORF", "DIR_OUTPUT", "DIR_CACHE", "DIR_GRAPH"):
+        monkeypatch.setattr(site, name, getattr(site, name))
+    (tmp_path / "codes").mkdir()
+    (tmp_path / "jorf_2023_1990").mkdir()
+    (tmp_path / "codes" / "civil.md").write_text(CIVIL, encoding="utf-8")
+    (tmp_path / "codes" / "penal.md").write_text("---\ntitle: Code pénal\n---\n**Art. 131-1**\nTexte.\n", encoding="utf-8")
+    (tmp_path / "jorf_2023_1990" / "jorf_2010.csv").write_text(JORF, encoding="utf-8")
+    site.main(["--data", str(tmp_path), "--no-cache"])
+
+    import src.silver_annotation as silver
+    silver.init_worker()
+    nlp = silver._WORKER['nlp']
+    labels = {}
+    for kind, f, page in (('CODE', tmp_path / "codes" / "civil.md", "codes/civil.html"),
+                          ('JORF', tmp_path / "jorf_2023_1990" / "jorf_2010.csv", "jorf/jorf_2010.html")):
+        found = labels[kind] = []
+        for _, text, meta in iter_source_entries(kind, f):
+            doc = nlp.make_doc(text)
+            doc.user_data["legal_meta"] = meta
+            found.append([e.kb_id_ for e in nlp(doc).ents])
+        expected = site_links((tmp_path / "html" / page).read_text(encoding="utf-8"))
+        assert found == expected
+    assert labels['CODE'][1:] == [["fr_code_article:penal/131-2"],
+                                  ["fr_code_article:civil/131-3", "fr_code_article:civil/435",
+                                   "fr_code_article:civil/465", "fr_code_article:civil/494-9"]]
+    assert labels['JORF'] == [["fr_code_article:civil/L.111-1", "fr_code:code/civil",
+                               "fr_code_article:civil/1240", "fr_code_article:civil/1241"]]
@@ -0,0 +1,60 @@
+# Entrées adverses pour mesurer le temps de scan des regexps quand la ligne s'allonge.
+# Pour chaque cas, on double la longueur et on affiche le rapport de temps :
+# un rapport proche de 2 signifie un coût linéaire, au-delà de ~3 le cas est signalé.
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import src.generate_full_site as site
+from src.generate_full_site import LegalEngine
+
+# Lignes JORF longues sans ponctuation, énumérations denses, longues suites d'espaces...
+CASES = {
+    "loi sans ponctuation": lambda n: "loi relative " + "aux mesures diverses " * n,
+    "lois répétées": lambda n: "loi " * n,
+    "article puis espaces": lambda n: "article 1" + " " * n + "x",
+    "énumération d'articles": lambda n: "articles " + " et ".join(str(i) for i in range(n)) + " et x",
+    "numéro à rallonge": lambda n: "article 1" + "-1" * n + " et x",
+    "articles répétés": lambda n: "article 1 " * n,
+    "code puis article répétés": lambda n: "code civil article 1 " * n,
+    "livre puis code répétés": lambda n: "Livre II du code civil " * n,
+    "lois puis articles répétés": lambda n: "loi n° 89-1008 du 31 décembre 1989 article 2 " * n,
+    "séparateur puis espaces": lambda n: "article 1 ," + " " * n + "x",
+    "suffixe puis espaces": lambda n: "article 1 bis" + " " * n + "x",
+}
+SIZES = [500, 1000, 2000, 4000, 8000]
+
+
+def timed(fn, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    engine = LegalEngine()
+    # Le budget par ligne fausserait la mesure : on le désactive le temps du benchmark
+    site.LINE_MATCH_BUDGET = float("inf")
+    scanners = {
+        "re_source": lambda t: sum(1 for _ in engine.re_source.finditer(t)),
+        "re_art": lambda t: sum(1 for _ in engine.re_art.finditer(t)),
+        "extract": lambda t: engine.extract(t),
+    }
+    suspects = []
+    for name, gen in CASES.items():
+        print(f"\n--- {name} ---")
+        for label, fn in scanners.items():
+            times = [timed(fn, gen(n)) for n in SIZES]
+            ratios = [b / a if a > 0 else 0 for a, b in zip(times, times[1:])]
+            flag = "  ⚠️ superlinéaire" if ratios and max(ratios[-2:]) > 3 else ""
+            if flag:
+                suspects.append((name, label))
+            print(f"{label:10s} " + " ".join(f"{t*1000:8.2f}ms" for t in times) + f"  (x{ratios[-1]:.1f}){flag}")
+    print("\nCas suspects :", suspects if suspects else "aucun")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+# Corpus synthétique pour tester le build à 10x-100x la taille des données réelles.
+#   python tools/synth_corpus.py --codes 650 --articles 2000 --years 340 --rows 5000
+#   python tools/synth_corpus.py --density 1.5 --adversarial long-rows dense-enum --seed 7
+#   python src/generate_full_site.py --data data/synth --jobs 8
+#
+# Le résultat a la forme de data/ : codes/<nom>.md (en-tête YAML, titres #, **Art. L111-1**,
+# paragraphes) et jorf_2023_1990/jorf_<année>.csv (séparateur '|', texte en dernière colonne).
+# Chaque code synthétique a une structure livre/titre/chapitre tirée au sort ; les numéros
+# d'articles en découlent (L<livre><titre><chapitre>-<n>), de sorte qu'une citation peut viser un
+# article qui existe sans garder la liste des articles en mémoire.
+#
+# Les phrases viennent des données réelles quand elles sont là (les N premières lignes de chaque
+# fichier) : les phrases sans citation servent de texte de remplissage, celles qui citent des
+# articles deviennent des modèles dont les numéros et le nom du code sont remplacés par des
+# cibles synthétiques (énumérations et plages comprises). Sans données, ou avec --no-harvest,
+# des modèles intégrés sont utilisés. --density donne le nombre moyen de citations par paragraphe
+# (ou par ligne du JORF), --broken la part de citations vers un article qui n'existe pas.
+#
+# Modes adverses (--adversarial, avec la probabilité --adversarial-rate par paragraphe / ligne) :
+#   long-rows    lignes du JORF de --long-chars caractères (extraction fenêtrée, budget par ligne)
+#   dense-enum   énumérations de centaines d'articles et plages couvrant tout un livre
+#
+# Chaque fichier a son propre générateur aléatoire, dérivé de --seed et du nom du fichier : la
+# sortie est la même d'une exécution à l'autre, en série comme avec --jobs, pour les mêmes données
+# réelles. synth.json résume les paramètres et les volumes produits.
+
+import re
+import sys
+import json
+import random
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.generate_full_site import LegalEngine, BASE_DIR, select_inputs, iter_jorf_texts
+from src.code_parser import parse_code_file, BODY
+
+DIR_SYNTH = BASE_DIR / "data" / "synth"
+
+# Noms des codes synthétiques : "<thème>_<n>" -> "code des ports 3"
+THEMES = ["ports", "forêts", "mines", "eaux", "routes", "marchés", "pêches", "archives", "musées",
+          "canaux", "phares", "foires", "halles", "ponts", "greffes", "haras", "vignes", "salines"]
+MONTHS = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre",
+          "octobre", "novembre", "décembre"]
+NATURES = ["LOI", "DECRET", "ARRETE", "ORDONNANCE"]
+
+# Texte de remplissage et modèles de citation utilisés sans données réelles
+BUILTIN_FILLER = [
+    "Les dispositions du présent chapitre s'appliquent sans préjudice des règles particulières.",
+    "Un décret en Conseil d'Etat précise les conditions d'application du présent article.",
+    "La demande est adressée à l'autorité administrative compétente dans un délai de deux mois.",
+    "Le silence gardé pendant ce délai vaut décision de rejet.",
+    "Les modalités de la déclaration sont fixées par arrêté du ministre chargé de l'économie.",
+    "Cette obligation ne s'applique pas aux personnes mentionnées au deuxième alinéa.",
+]
+BUILTIN_CITATIONS = [
+    "Les conditions prévues à l'article 12 du code civil sont applicables.",
+    "Sous réserve des dispositions des articles L. 111-2 et L. 111-3, la demande est recevable.",
+    "Les personnes mentionnées aux articles L. 123-36 à L. 123-57 du code de commerce en sont dispensées.",
+    "Les sanctions prévues par l'article 313-1 du code pénal sont encourues.",
+    "Le présent article est applicable dans les conditions fixées par les articles 5, 7 et 9 du même code.",
+    "Il est procédé conformément à l'article L. 130-1 du code de la sécurité sociale.",
+]
+
+RE_CITE_LEAD = re.compile(r"(?i)\b(?:articles?|art\.)\s+")
+RE_ITEM = re.compile(r"(?:[LDR]\.?\s*)?\d+(?:[\.-]\d+)*")
+RE_ENUM_SEP = re.compile(r"\s*(?:,|;|\bet\b|\bà\b|\bau\b)\s*")
+RE_SENTENCE = re.compile(r"(?<=[.;:])\s+(?=[A-ZÀ-Ý«])")
+
+ENUM, CODE = 0, 1
+
+
+def templatize(sentence, re_code):
+    # Phrase citant des articles -> [texte, (ENUM, [séparateurs]), texte, (CODE,), ...] ou None
+    parts, pos = [], 0
+    marks = []
+    for lead in RE_CITE_LEAD.finditer(sentence):
+        m = RE_ITEM.match(sentence, lead.end())
+        if not m:
+            continue
+        seps, end = [], m.end()
+        while True:
+            sep = RE_ENUM_SEP.match(sentence, end)
+            nxt = RE_ITEM.match(sentence, sep.end()) if sep else None
+            if not nxt:
+                break
+            seps.append(sep.group(0))
+            end = nxt.end()
+        marks.append((m.start(), end, (ENUM, seps)))
+    if not marks:
+        return None
+    marks += [(m.start(), m.end(), (CODE,)) for m in re_code.finditer(sentence)]
+    marks.sort()
+    for start, end, mark in marks:
+        if start < pos:
+            continue
+        parts.append(sentence[pos:start])
+        parts.append(mark)
+        pos = end
+    parts.append(sentence[pos:])
+    return parts
+
+
+def harvest(lines_per_file, use_data=True):
+    # (phrases de remplissage, modèles de citation), tirés des N premières lignes de chaque fichier réel
+    re_code = LegalEngine().re_code
+    texts = []
+    if use_data:
+        code_files, jorf_files = select_inputs()
+        for f in code_files:
+            n = 0
+            for rec in parse_code_file(f):
+                if rec['kind'] == BODY:
+                    texts.append(rec['text'].strip())
+                    n += 1
+                    if n >= lines_per_file: break
+        for _, f in jorf_files:
+            for n, text in enumerate(iter_jorf_texts(f)):
+                if n >= lines_per_file: break
+                texts.append(text)
+    filler, templates = [], []
+    for text in texts or (BUILTIN_FILLER + BUILTIN_CITATIONS):
+        for sentence in RE_SENTENCE.split(text):
+            if not 20 <= len(sentence) <= 600:
+                continue
+            t = templatize(sentence, re_code)
+            if t is not None:
+                templates.append(t)
+            elif not RE_CITE_LEAD.search(sentence):
+                filler.append(sentence)
+    if not filler: filler = list(BUILTIN_FILLER)
+    if not templates: templates = [templatize(s, re_code) for s in BUILTIN_CITATIONS]
+    return sorted(set(filler)), templates
+
+
+class SynthCode:
+    """Structure d'un code synthétique : nombre de livres, titres, chapitres et articles par chapitre."""
+
+    def __init__(self, index, seed, articles):
+        rng = random.Random(f"{seed}:structure:{index}")
+        self.stem = f"{THEMES[index % len(THEMES)]}_{index // len(THEMES) + 1}"
+        self.name = self.stem.replace("_", " ")
+        self.livres, self.titres, self.chapitres = rng.randint(1, 6), rng.randint(1, 5), rng.randint(1, 6)
+        self.per_chapter = max(1, round(articles / (self.livres * self.titres * self.chapitres)))
+
+    def article(self, l, t, c, n):
+        return f"L{l}{t}{c}-{n}"
+
+    def random_article(self, rng, broken=0.0):
+        n = self.per_chapter + rng.randint(1, 50) if rng.random() < broken else rng.randint(1, self.per_chapter)
+        return self.article(rng.randint(1, self.livres), rng.randint(1, self.titres), rng.randint(1, self.chapitres), n)
+
+    def random_range(self, rng):
+        l, t, c = rng.randint(1, self.livres), rng.randint(1, self.titres), rng.randint(1, self.chapitres)
+        a, b = sorted(rng.sample(range(1, self.per_chapter + 2), 2))
+        return self.article(l, t, c, a), self.article(l, t, c, min(b, self.per_chapter))
+
+
+class Generator:
+    def __init__(self, material, codes, params, rng):
+        self.filler, self.templates = material
+        self.codes = codes
+        self.p = params
+        self.rng = rng
+        self.citations = 0
+
+    def cite(self, own=None):
+        # Une phrase de citation à partir d'un modèle, vers le code du fichier ou un autre code
+        rng = self.rng
+        target = own if own is not None and rng.random() < 0.5 else rng.choice(self.codes)
+        out = []
+        for part in rng.choice(self.templates):
+            if isinstance(part, str):
+                out.append(part)
+            elif part[0] == CODE:
+                out.append(f"code des {target.name}")
+            else:
+                seps = part[1]
+                if any(s.strip() in ("à", "au") for s in seps) and len(seps) == 1:
+                    out.append(seps[0].join(target.random_range(rng)))
+                else:
+                    items = [target.random_article(rng, self.p['broken']) for _ in range(len(seps) + 1)]
+                    out.append("".join(x + (seps[i] if i < len(seps) else "") for i, x in enumerate(items)))
+                self.citations += len(seps) + 1
+        return "".join(out)
+
+    def dense_enum(self, target):
+        rng = self.rng
+        n = rng.randint(200, 1000)
+        items = [target.random_article(rng) for _ in range(n)]
+        self.citations += n + 2
+        first, last = target.article(1, 1, 1, 1), target.article(target.livres, target.titres, target.chapitres, target.per_chapter)
+        return (f"Les articles {', '.join(items[:-1])} et {items[-1]} du code des {target.name} sont abrogés, "
+                f"ainsi que les articles {first} à {last} du même code.")
+
+    def count(self, density):
+        # Nombre de citations d'un paragraphe, de moyenne `density`
+        k = int(density)
+        return k + (self.rng.random() < density - k)
+
+    def paragraph(self, own=None, sentences=(1, 3)):
+        rng = self.rng
+        parts = [rng.choice(self.filler) for _ in range(rng.randint(*sentences))]
+        for _ in range(self.count(self.p['density'])):
+            parts.insert(rng.randint(0, len(parts)), self.cite(own))
+        if 'dense-enum' in self.p['adversarial'] and rng.random() < self.p['adversarial_rate']:
+            parts.append(self.dense_enum(own or rng.choice(self.codes)))
+        return " ".join(parts)
+
+
+# Matériau et codes partagés par les processus (créés une fois par worker)
+_WORKER = {}
+
+def init_worker(material, params):
+    _WORKER.update(material=material, params=params,
+                   codes=[SynthCode(i, params['seed'], params['articles']) for i in range(params['codes'])])
+
+def write_code(index, out_dir):
+    params, codes = _WORKER['params'], _WORKER['codes']
+    code = codes[index]
+    gen = Generator(_WORKER['material'], codes, params, random.Random(f"{params['seed']}:code:{index}"))
+    rng = gen.rng
+    path = out_dir / "codes" / f"{code.stem}.md"
+    with open(path, 'w', encoding='utf-8') as fout:
+        fout.write(f"---\ntitle: Code des {code.name}\ndate: 2024-01-15\n---\n## Partie législative\n")
+        for l in range(1, code.livres + 1):
+            fout.write(f"### Livre {l} : {rng.choice(THEMES).upper()}\n")
+            for t in range(1, code.titres + 1):
+                fout.write(f"#### Titre {t} : {rng.choice(THEMES).capitalize()}\n")
+                for c in range(1, code.chapitres + 1):
+                    fout.write(f"##### Chapitre {c} : Dispositions générales\n")
+                    for n in range(1, code.per_chapter + 1):
+                        fout.write(f"**Art. {code.article(l, t, c, n)}**\n")
+                        for _ in range(rng.randint(1, 4)):
+                            fout.write(gen.paragraph(own=code) + "\n")
+    return 'CODE', path.name, path.stat().st_size, gen.citations
+
+def write_jorf(year, out_dir):
+    params = _WORKER['params']
+    gen = Generator(_WORKER['material'], _WORKER['codes'], params, random.Random(f"{params['seed']}:jorf:{year}"))
+    rng = gen.rng
+    path = out_dir / "jorf_2023_1990" / f"jorf_{year}.csv"
+    with open(path, 'w', encoding='utf-8') as fout:
+        for i in range(params['rows']):
+            if 'long-rows' in params['adversarial'] and rng.random() < params['adversarial_rate']:
+                parts, size = [], 0
+                while size < params['long_chars']:
+                    parts.append(gen.paragraph(sentences=(4, 8)))
+                    size += len(parts[-1]) + 1
+                text = " ".join(parts)
+            else:
+                text = gen.paragraph(sentences=(2, 6))
+            date = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            title = f"{rng.choice(NATURES).capitalize()} du {rng.randint(1, 28)} {rng.choice(MONTHS)} {year}"
+            # Le texte ne doit pas contenir le séparateur du csv
+            fout.write(f"{i}|JORFTEXT{year}{i:08d}|{date}|{rng.choice(NATURES)}|{title}|{text.replace('|', ' ')}\n")
+    return 'JORF', path.name, path.stat().st_size, gen.citations
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un corpus synthétique (codes markdown et csv du JORF) pour les tests de charge.")
+    parser.add_argument("--out", type=Path, default=DIR_SYNTH, help="dossier racine (codes/ et jorf_2023_1990/)")
+    parser.add_argument("--codes", type=int, default=65, help="nombre de codes")
+    parser.add_argument("--articles", type=int, default=1000, help="articles par code (environ)")
+    parser.add_argument("--years", type=int, default=34, help="nombre d'années du JORF (à partir de 1990)")
+    parser.add_argument("--rows", type=int, default=5000, help="lignes par fichier du JORF")
+    parser.add_argument("--density", type=float, default=0.3, help="citations par paragraphe, en moyenne")
+    parser.add_argument("--broken", type=float, default=0.02, help="part des citations vers un article inexistant")
+    parser.add_argument("--adversarial", nargs="*", default=[], choices=["long-rows", "dense-enum"], help="modes adverses")
+    parser.add_argument("--adversarial-rate", type=float, default=0.001, help="probabilité d'un cas adverse par paragraphe ou ligne")
+    parser.add_argument("--long-chars", type=int, default=200000, help="longueur des lignes du mode long-rows")
+    parser.add_argument("--harvest-lines", type=int, default=2000, help="lignes lues au début de chaque fichier réel")
+    parser.add_argument("--no-harvest", action="store_true", help="n'utiliser que les modèles intégrés")
+    parser.add_argument("--seed", type=int, default=0, help="graine du générateur")
+    parser.add_argument("--jobs", type=int, default=1, help="nombre de processus (un fichier par tâche)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {'seed': args.seed, 'codes': args.codes, 'articles': args.articles, 'rows': args.rows,
+              'density': args.density, 'broken': args.broken, 'adversarial': sorted(set(args.adversarial)),
+              'adversarial_rate': args.adversarial_rate, 'long_chars': args.long_chars}
+    material = harvest(args.harvest_lines, use_data=not args.no_harvest)
+    print(f"📄 {len(material[0])} phrases de remplissage, {len(material[1])} modèles de citation")
+
+    (args.out / "codes").mkdir(parents=True, exist_ok=True)
+    (args.out / "jorf_2023_1990").mkdir(parents=True, exist_ok=True)
+    tasks = [(write_code, i) for i in range(args.codes)] + [(write_jorf, 1990 + i) for i in range(args.years)]
+    files = {}
+
+    def done(kind, name, size, citations):
+        files[name] = {'type': kind, 'bytes': size, 'citations': citations}
+        print(f"✅ {name} : {size / 2**20:.1f} Mo, {citations} citations")
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=(material, params)) as pool:
+            for fut in as_completed([pool.submit(fn, x, args.out) for fn, x in tasks]):
+                done(*fut.result())
+    else:
+        init_worker(material, params)
+        for fn, x in tasks:
+            done(*fn(x, args.out))
+
+    total = sum(f['bytes'] for f in files.values())
+    with open(args.out / "synth.json", 'w', encoding='utf-8') as fout:
+        json.dump({'params': params, 'bytes': total, 'citations': sum(f['citations'] for f in files.values()),
+                   'files': dict(sorted(files.items()))}, fout, ensure_ascii=False, indent=1)
+    print(f"📦 {len(files)} fichiers, {total / 2**20:.1f} Mo dans {args.out}")
+
+
+if __name__ == "__main__":
+    main()